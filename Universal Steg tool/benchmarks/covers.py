@@ -0,0 +1,122 @@
+# benchmarks/covers.py
+"""Deterministic synthetic cover files for the benchmark suite.
+
+Every generator is seeded, so the same name always produces the same bytes and
+results stay comparable between runs and machines. Images are smooth gradients
+plus sensor-like noise and audio is a mix of tones plus noise, which keeps the
+steganalysis code on realistic paths (pure noise or silence would not).
+"""
+
+from __future__ import annotations
+import os
+import wave
+from dataclasses import dataclass
+from typing import Callable, List
+
+import numpy as np  # pip install numpy
+from PIL import Image  # pip install pillow
+
+SAMPLE_RATE = 44100
+
+
+@dataclass
+class Cover:
+    name: str
+    mimetype: str
+    make: Callable[[str], None]
+
+    def path(self, workdir: str) -> str:
+        return os.path.join(workdir, self.name)
+
+    def ensure(self, workdir: str) -> str:
+        """Path of the cover inside `workdir`, generating it on first use."""
+        path = self.path(workdir)
+        if not os.path.exists(path):
+            tmp = path + ".tmp"
+            self.make(tmp)
+            os.replace(tmp, path)
+        return path
+
+
+def _pixels(width: int, height: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    planes = [
+        128 + 60 * np.sin(x / (37 + 11 * c) + c) + 50 * np.cos(y / (23 + 7 * c))
+        + rng.normal(0, 3, (height, width))
+        for c in range(3)
+    ]
+    return np.stack(planes, axis=-1).clip(0, 255).astype(np.uint8)
+
+
+def _image(width: int, height: int, fmt: str) -> Callable[[str], None]:
+    def make(path: str) -> None:
+        Image.fromarray(_pixels(width, height, seed=width * height)).save(path, format=fmt)
+
+    return make
+
+
+def _samples(frames: int, channels: int, sampwidth: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(frames, dtype=np.float64) / SAMPLE_RATE
+    scale = 2 ** (8 * sampwidth - 1) - 1
+    chans = [
+        0.3 * np.sin(2 * np.pi * 220 * (c + 1) * t) + 0.1 * np.sin(2 * np.pi * 3.7 * t + c)
+        + rng.normal(0, 0.002, frames)
+        for c in range(channels)
+    ]
+    return (np.stack(chans, axis=-1) * scale).round().astype(np.int64)
+
+
+def _wav(seconds: float, sampwidth: int, channels: int = 2) -> Callable[[str], None]:
+    def make(path: str) -> None:
+        frames = int(seconds * SAMPLE_RATE)
+        data = _samples(frames, channels, sampwidth, seed=frames + sampwidth)
+        if sampwidth == 1:
+            raw = (data + 128).astype(np.uint8).tobytes()
+        elif sampwidth == 3:
+            raw = data.astype("<i4").view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+        else:
+            raw = data.astype(f"<i{sampwidth}").tobytes()
+        with wave.open(path, "wb") as w:
+            w.setnchannels(channels)
+            w.setsampwidth(sampwidth)
+            w.setframerate(SAMPLE_RATE)
+            w.writeframes(raw)
+
+    return make
+
+
+def _text(size: int) -> Callable[[str], None]:
+    def make(path: str) -> None:
+        rng = np.random.default_rng(size)
+        words = [w.encode() for w in "the of and a to in is you that it he was for on are as with his".split()]
+        picks = rng.integers(0, len(words), size // 3)
+        lines = []
+        for start in range(0, picks.size, 12):
+            lines.append(b" ".join(words[i] for i in picks[start : start + 12]))
+        with open(path, "wb") as f:
+            f.write(b"\n".join(lines)[:size] + b"\n")
+
+    return make
+
+
+def all_covers(quick: bool = False) -> List[Cover]:
+    covers = [
+        Cover("img-256.png", "image/png", _image(256, 256, "PNG")),
+        Cover("img-1024.png", "image/png", _image(1024, 1024, "PNG")),
+        Cover("img-1024.bmp", "image/bmp", _image(1024, 1024, "BMP")),
+        Cover("wav-8bit-10s.wav", "audio/wav", _wav(10, 1)),
+        Cover("wav-16bit-10s.wav", "audio/wav", _wav(10, 2)),
+        Cover("wav-24bit-10s.wav", "audio/wav", _wav(10, 3)),
+        Cover("text-1mb.txt", "text/plain", _text(1 << 20)),
+    ]
+    if not quick:
+        covers += [
+            Cover("img-2048.png", "image/png", _image(2048, 2048, "PNG")),
+            Cover("img-4096.bmp", "image/bmp", _image(4096, 4096, "BMP")),
+            Cover("wav-16bit-120s.wav", "audio/wav", _wav(120, 2)),
+            Cover("wav-24bit-120s.wav", "audio/wav", _wav(120, 3)),
+            Cover("text-32mb.txt", "text/plain", _text(32 << 20)),
+        ]
+    return covers
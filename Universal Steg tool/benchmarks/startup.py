@@ -0,0 +1,102 @@
+# benchmarks/startup.py
+"""CLI start-up time benchmark.
+
+Runs short unisteg commands in fresh interpreters and reports their wall time,
+plus the heavy modules each one imported. Exits non-zero if a command is slower
+than --max-ms or imports a module it should not.
+
+    python benchmarks/startup.py --runs 20 --max-ms 150
+"""
+
+from __future__ import annotations
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+from typing import Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["numpy", "PIL"]
+
+# Reports sys.modules after the command ran, so imports can be checked too.
+_RUNNER = """
+import sys
+from unisteg.cli import main
+try:
+    main(sys.argv[1:])
+except SystemExit:
+    pass
+print("\\n" + ",".join(m for m in {heavy!r} if m in sys.modules), file=sys.stderr)
+"""
+
+
+def _make_fixtures(tmp: str) -> Dict[str, str]:
+    wav = os.path.join(tmp, "cover.wav")
+    with wave.open(wav, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(8000)
+        w.writeframes(bytes(2 * 8000))
+    txt = os.path.join(tmp, "cover.txt")
+    with open(txt, "w") as f:
+        f.write("hello\n" * 100)
+    return {"wav": wav, "txt": txt, "out": os.path.join(tmp, "out.bin")}
+
+
+def _commands(fx: Dict[str, str]) -> List[Tuple[str, List[str], List[str]]]:
+    """(label, argv, modules that must not be imported)."""
+    return [
+        ("help", ["--help"], HEAVY_MODULES),
+        ("scan text", ["scan", fx["txt"]], HEAVY_MODULES),
+        ("extract text_appended", ["extract", fx["txt"], fx["out"], "--plugin", "text_appended"], HEAVY_MODULES),
+        ("extract audio_lsb", ["extract", fx["wav"], fx["out"], "--plugin", "audio_lsb"], ["PIL"]),
+    ]
+
+
+def _time(cmd: List[str], runs: int) -> Tuple[List[float], List[str]]:
+    """Wall times in ms, and the heavy modules the last run reported as imported."""
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    times = []
+    imported: List[str] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run(cmd, env=env, capture_output=True, text=True)
+        times.append((time.perf_counter() - start) * 1000.0)
+        imported = [m for m in proc.stderr.rstrip("\n").rsplit("\n", 1)[-1].split(",") if m in HEAVY_MODULES]
+    return times, imported
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure unisteg CLI start-up time")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per command")
+    parser.add_argument("--max-ms", type=float, help="Fail if a command's median exceeds this")
+    args = parser.parse_args(argv)
+
+    runner = [sys.executable, "-c", _RUNNER.format(heavy=HEAVY_MODULES)]
+    _time(runner + ["--help"], 1)  # warm the page cache
+
+    bare, _ = _time([sys.executable, "-c", "pass"], args.runs)
+    print(f"{'bare interpreter':24} median {statistics.median(bare):7.1f} ms")
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, cmd, forbidden in _commands(_make_fixtures(tmp)):
+            times, imported = _time(runner + cmd, args.runs)
+            median = statistics.median(times)
+            status = ""
+            bad = [m for m in imported if m in forbidden]
+            if bad:
+                status += f"  imported {', '.join(bad)}!"
+            if args.max_ms is not None and median > args.max_ms:
+                status += f"  over {args.max_ms:g} ms!"
+            failed |= bool(status)
+            print(f"{label:24} median {median:7.1f} ms  min {min(times):7.1f} ms{status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
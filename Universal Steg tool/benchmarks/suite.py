@@ -0,0 +1,239 @@
+# benchmarks/suite.py
+"""Embed, extract and scan benchmarks for every plugin on synthetic covers.
+
+Each case runs in a fresh interpreter so its peak RSS is its own. Results are
+written as JSON and can be compared with a stored baseline; a case whose median
+time or peak RSS grew by more than the tolerance fails the run.
+
+    python benchmarks/suite.py --quick -o results.json
+    python benchmarks/suite.py --baseline baseline.json
+    python benchmarks/suite.py -k audio_lsb --save-baseline baseline.json
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np  # noqa: E402  pip install numpy
+
+from covers import Cover, all_covers  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS figures
+    resource = None  # type: ignore[assignment]
+
+# payload size as a fraction of the cover size, capped by the plugin's capacity for the algo
+PAYLOAD_FRACTION = 1 / 32
+
+
+@dataclass
+class Case:
+    plugin: str  # "detect" for detect_mimetype
+    op: str
+    algo: str
+    cover: str
+
+    @property
+    def id(self) -> str:
+        return "/".join(part for part in (self.plugin, self.op, self.algo, self.cover) if part)
+
+
+def build_cases(covers: List[Cover]) -> List[Case]:
+    import unisteg.plugins  # noqa: F401
+    from unisteg.plugin_base import plugins_for_mimetype
+
+    cases = []
+    for cover in covers:
+        cases.append(Case("detect", "detect", "", cover.name))
+        for plugin in plugins_for_mimetype(cover.mimetype):
+            cases.append(Case(plugin.name, "scan", "", cover.name))
+            # every algo a plugin lists is benchmarked; plugins listing none only scan
+            for algo in plugin.algos:
+                cases.append(Case(plugin.name, "embed", algo, cover.name))
+                cases.append(Case(plugin.name, "extract", algo, cover.name))
+    return cases
+
+
+def _payload(size: int) -> bytes:
+    return np.random.default_rng(size).integers(0, 256, size, dtype=np.uint8).tobytes()
+
+
+def _peak_rss_mb() -> Optional[float]:
+    # ru_maxrss survives fork+exec on Linux, so prefer this process's own high-water mark
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024  # bytes vs KiB
+
+
+def run_case(case: Case, cover_path: str, mimetype: str, workdir: str, repeats: int) -> Dict[str, Any]:
+    """Time one case; runs in its own process."""
+    import unisteg.plugins  # noqa: F401
+    from unisteg.filetype import detect_mimetype
+    from unisteg.plugin_base import FileInfo, get_plugin
+
+    plugin = get_plugin(case.plugin) if case.plugin != "detect" else None
+    size = max(1, int(os.path.getsize(cover_path) * PAYLOAD_FRACTION))
+    stego = os.path.join(workdir, f"stego-{os.getpid()}-{case.cover}")
+    if plugin is not None and case.algo:
+        with FileInfo(path=cover_path, mimetype=mimetype) as info:
+            capacity = plugin.capacity(info, algo=case.algo)
+            payload = _payload(max(1, min(size, capacity)) if capacity is not None else size)
+            if case.op == "extract":
+                plugin.embed_to(info, payload, stego, algo=case.algo)
+    target = stego if case.op == "extract" else cover_path
+
+    def once() -> None:
+        if case.op == "detect":
+            detect_mimetype(target)
+            return
+        with FileInfo(path=target, mimetype=mimetype) as info:
+            if case.op == "scan":
+                plugin.scan(info)
+            elif case.op == "embed":
+                plugin.embed_to(info, payload, stego, algo=case.algo)
+            elif plugin.extract(info, algo=case.algo) != payload:
+                raise ValueError(f"{case.id}: extracted payload does not match")
+
+    try:
+        base_rss = _peak_rss_mb()
+        once()  # warm-up: imports, page cache
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            once()
+            times.append(time.perf_counter() - start)
+    finally:
+        if os.path.exists(stego):
+            os.remove(stego)
+    peak = _peak_rss_mb()
+    return {
+        "times": times,
+        "peak_rss_mb": peak,
+        "rss_growth_mb": None if peak is None or base_rss is None else peak - base_rss,
+    }
+
+
+def summarize(case: Case, size: int, raw: Dict[str, Any]) -> Dict[str, Any]:
+    times = np.asarray(raw["times"])
+    median = float(np.median(times))
+    return {
+        **asdict(case),
+        "cover_bytes": size,
+        "median_s": median,
+        "p50_s": float(np.percentile(times, 50)),
+        "p90_s": float(np.percentile(times, 90)),
+        "p99_s": float(np.percentile(times, 99)),
+        "mb_per_s": size / 1e6 / median if median > 0 else None,
+        "peak_rss_mb": raw["peak_rss_mb"],
+        "rss_growth_mb": raw["rss_growth_mb"],
+        "repeats": len(times),
+    }
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, rss_tolerance: float
+) -> List[str]:
+    """Regression messages for cases slower or bigger than the baseline allows."""
+    failures = []
+    for case_id, now in results.items():
+        then = baseline.get(case_id)
+        if then is None:
+            continue
+        if now["median_s"] > then["median_s"] * (1 + tolerance):
+            failures.append(f"{case_id}: median {now['median_s'] * 1e3:.1f} ms, was {then['median_s'] * 1e3:.1f} ms")
+        rss, old_rss = now["peak_rss_mb"], then.get("peak_rss_mb")
+        if rss and old_rss and rss > old_rss * (1 + rss_tolerance):
+            failures.append(f"{case_id}: peak RSS {rss:.0f} MB, was {old_rss:.0f} MB")
+    return failures
+
+
+def _fmt(value: Optional[float], spec: str) -> str:
+    return format(value, spec) if value is not None else "-"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark unisteg plugins on synthetic covers")
+    parser.add_argument(
+        "-k", "--filter", action="append", default=[],
+        help="Only run cases whose id contains this (all must match)",
+    )
+    parser.add_argument("--quick", action="store_true", help="Small covers only")
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per case")
+    parser.add_argument(
+        "--workdir", default=os.path.join(tempfile.gettempdir(), "unisteg-bench"), help="Where covers are kept"
+    )
+    parser.add_argument("-o", "--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare with this results JSON and fail on regressions")
+    parser.add_argument("--save-baseline", help="Write results JSON here, for later --baseline runs")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed median time growth (15%%)")
+    parser.add_argument("--rss-tolerance", type=float, default=0.25, help="Allowed peak RSS growth (25%%)")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    covers = {c.name: c for c in all_covers(args.quick)}
+    cases = [c for c in build_cases(list(covers.values())) if all(f in c.id for f in args.filter)]
+
+    ctx = multiprocessing.get_context("spawn")
+    results: Dict[str, Any] = {}
+    print(f"{'case':52} {'median ms':>10} {'p90 ms':>9} {'MB/s':>8} {'RSS MB':>7}")
+    for case in cases:
+        cover = covers[case.cover]
+        path = cover.ensure(args.workdir)
+        with ctx.Pool(1) as pool:
+            raw = pool.apply(run_case, (case, path, cover.mimetype, args.workdir, args.repeats))
+        res = results[case.id] = summarize(case, os.path.getsize(path), raw)
+        print(
+            f"{case.id:52} {res['median_s'] * 1e3:10.2f} {res['p90_s'] * 1e3:9.2f} "
+            f"{_fmt(res['mb_per_s'], '8.1f')} {_fmt(res['peak_rss_mb'], '7.0f')}"
+        )
+
+    document = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "numpy": np.__version__,
+            "repeats": args.repeats,
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    for out in filter(None, (args.output, args.save_baseline)):
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        failures = compare(results, baseline, args.tolerance, args.rss_tolerance)
+        for line in failures:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if failures:
+            return 1
+        print(f"No regressions against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,70 @@
+# tests/conftest.py
+"""Small synthetic covers, written to each test's tmp_path."""
+
+from __future__ import annotations
+import wave
+from pathlib import Path
+from typing import Callable
+
+import numpy as np  # pip install numpy
+import pytest
+from PIL import Image  # pip install pillow
+
+SAMPLE_RATE = 8000
+
+
+def write_wav(path: Path, frames: int = 8000, channels: int = 2, sampwidth: int = 2, seed: int = 0) -> Path:
+    """Tones plus a little noise, like real audio; pure noise would hide LSB bugs."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(frames) / SAMPLE_RATE
+    scale = 2 ** (8 * sampwidth - 1) - 1
+    data = np.stack(
+        [0.3 * np.sin(2 * np.pi * 220 * (c + 1) * t) + rng.normal(0, 0.002, frames) for c in range(channels)],
+        axis=-1,
+    )
+    values = (data * scale).round().astype(np.int64)
+    if sampwidth == 1:
+        raw = (values + 128).astype(np.uint8).tobytes()
+    elif sampwidth == 3:
+        raw = values.astype("<i4").view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    else:
+        raw = values.astype(f"<i{sampwidth}").tobytes()
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(sampwidth)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(raw)
+    return path
+
+
+def write_image(path: Path, size: int = 64, mode: str = "RGB", fmt: str = "PNG", seed: int = 0) -> Path:
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, (size, size, 4), dtype=np.uint8)
+    Image.fromarray(pixels, "RGBA").convert(mode).save(path, format=fmt)
+    return path
+
+
+@pytest.fixture
+def wav_cover(tmp_path: Path) -> Callable[..., str]:
+    def make(name: str = "cover.wav", **kwargs) -> str:
+        return str(write_wav(tmp_path / name, **kwargs))
+
+    return make
+
+
+@pytest.fixture
+def image_cover(tmp_path: Path) -> Callable[..., str]:
+    def make(name: str = "cover.png", **kwargs) -> str:
+        return str(write_image(tmp_path / name, **kwargs))
+
+    return make
+
+
+@pytest.fixture
+def text_cover(tmp_path: Path) -> Callable[..., str]:
+    def make(name: str = "cover.txt", lines: int = 200, text: str = "the quick brown fox jumps over it") -> str:
+        path = tmp_path / name
+        path.write_text("\n".join(f"{i} {text}" for i in range(lines)) + "\n", encoding="utf-8")
+        return str(path)
+
+    return make
@@ -0,0 +1,88 @@
+# tests/test_analysis.py
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from unisteg.analysis import SPA_MAX_ERROR, StreamStats, analyze_image, spa_counts, spa_rate
+
+
+def _signal(size: int, noise: float, bits: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    t = np.arange(size) / 44100
+    scale = 2 ** (bits - 1) - 1
+    return ((0.3 * np.sin(2 * np.pi * 220 * t) + rng.normal(0, noise, size)) * scale).round().astype(np.int64)
+
+
+def _embed(values: np.ndarray, rate: float, seed: int = 1) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    out = values.copy()
+    hit = rng.random(out.size) < rate
+    out[hit] = (out[hit] & ~1) | rng.integers(0, 2, int(hit.sum()))
+    return out
+
+
+def test_blocks_and_segments_match_one_pass():
+    values = _signal(100_000, 0.01, 8)
+    whole = StreamStats()
+    whole.update(values)
+
+    total = StreamStats()
+    for start in range(0, values.size, 30_000):
+        segment = StreamStats(last=total.last)
+        for block in np.array_split(values[start : start + 30_000], 7):
+            segment.update(block)
+        total.merge(segment)
+
+    assert total.pairs == whole.pairs == values.size - 1
+    assert np.array_equal(total.counts.sum(axis=0), whole.counts.sum(axis=0))
+    assert np.array_equal(total.hist, whole.hist) and total.hist.sum() == values.size
+    assert total.spa == whole.spa
+    assert total.chi_square == whole.chi_square
+
+
+def test_chi_square_on_low_byte():
+    # 7-bit audio stored in 8 bits: every LSB is 0 until a payload equalises the pairs
+    clean = _signal(100_000, 0.01, 7) * 2
+    stats = StreamStats()
+    stats.update(clean)
+    assert stats.chi_square < 0.01
+    stats = StreamStats()
+    stats.update(_embed(clean, 1.0))
+    assert stats.chi_square > 0.9
+
+
+@pytest.mark.parametrize("rate", [0.0, 0.2, 0.5])
+def test_spa_8bit(rate):
+    values = _embed(_signal(200_000, 0.004, 8), rate)
+    stats = StreamStats()
+    stats.update(values)
+    assert stats.spa == pytest.approx(rate, abs=0.03)
+    assert stats.spa_error < 0.02
+
+
+def test_spa_loud_16bit_cover_is_not_flagged():
+    # 16-bit audio with noise well above the LSB: the LSBs are random with or without a payload
+    for seed in range(3):
+        stats = StreamStats()
+        stats.update(_signal(441_000, 0.002, 16, seed))
+        assert stats.spa_error > SPA_MAX_ERROR or stats.spa < 0.05
+
+
+def test_spa_counts_orientation():
+    counts = spa_counts(np.array([4, 5, 10]), np.array([5, 4, 7])).sum(axis=0)
+    # (4, 5) and (5, 4): C_0 with difference 1; (7, 10): C_2 with difference 3 = 2m-1
+    assert counts[:, 0].tolist() == [0, 2, 0]
+    assert counts[:, 2].tolist() == [0, 0, 1]
+
+
+def test_image_analysis():
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:256, 0:256]
+    plane = (128 + 60 * np.sin(x / 37) + 50 * np.cos(y / 23) + rng.normal(0, 1, x.shape)).round().astype(np.int64)
+    clean = analyze_image(plane.astype(np.uint8))
+    stego = analyze_image(_embed(plane.ravel(), 0.5).reshape(plane.shape).astype(np.uint8))
+    assert not clean.suspicious
+    assert stego.suspicious and stego.estimate == pytest.approx(0.5, abs=0.1)
+    assert spa_rate(plane[:, :-1], plane[:, 1:]) < 0.05
@@ -0,0 +1,59 @@
+# tests/test_audio_lsb.py
+
+from __future__ import annotations
+import os
+
+import pytest
+
+from unisteg.plugin_base import FileInfo
+from unisteg.plugins.audio_lsb import AudioLSBPlugin
+
+
+@pytest.mark.parametrize("sampwidth", [1, 2, 3, 4])
+def test_round_trip_sample_widths(wav_cover, tmp_path, sampwidth):
+    cover = wav_cover(sampwidth=sampwidth)
+    out = str(tmp_path / "out.wav")
+    plugin = AudioLSBPlugin()
+    with FileInfo.detect(cover) as info:
+        plugin.embed_to(info, b"sample width", out, algo="lsb2")
+    with FileInfo.detect(out) as info:
+        assert plugin.extract(info, algo="lsb2") == b"sample width"
+
+
+def test_small_blocks_and_channel_subset(wav_cover, tmp_path):
+    cover = wav_cover()
+    out = str(tmp_path / "out.wav")
+    payload = os.urandom(500)
+    plugin = AudioLSBPlugin()
+    with FileInfo.detect(cover) as info:
+        plugin.embed_to(info, payload, out, channels="1", block_frames=100)
+    with FileInfo.detect(out) as info:
+        assert plugin.extract(info, channels="1", block_frames=77) == payload
+
+
+def test_truncated_data_chunk_raises(wav_cover, tmp_path):
+    cover = wav_cover(frames=8000)
+    with open(cover, "r+b") as f:
+        f.truncate(os.path.getsize(cover) // 2)  # the header still claims 8000 frames
+    with FileInfo.detect(cover) as info:
+        with pytest.raises(ValueError, match="shorter"):
+            AudioLSBPlugin().embed_to(info, os.urandom(1500), str(tmp_path / "out.wav"), block_frames=256)
+
+
+def test_keyed_extract_from_truncated_data_chunk_raises(wav_cover, tmp_path):
+    stego = str(tmp_path / "stego.wav")
+    with FileInfo.detect(wav_cover(frames=8000)) as info:
+        AudioLSBPlugin().embed_to(info, os.urandom(1500), stego, key="k")
+    with open(stego, "r+b") as f:
+        f.truncate(os.path.getsize(stego) // 2)
+    with FileInfo.detect(stego) as info:
+        with pytest.raises(ValueError, match="shorter"):
+            AudioLSBPlugin().extract(info, key="k")
+
+
+def test_scan_does_not_flag_loud_clean_audio(wav_cover):
+    with FileInfo.detect(wav_cover(frames=200_000)) as info:
+        findings = AudioLSBPlugin().scan(info).findings
+    assert not any(f.startswith("Segment") for f in findings)
+    assert all("not measurable" in f or "fraction 0.0" in f for f in findings if f.startswith("Channel"))
+    assert all("(low-byte pairs of values)" in f for f in findings if f.startswith("Channel"))
@@ -0,0 +1,137 @@
+# tests/test_audio_metadata.py
+
+from __future__ import annotations
+import io
+import struct
+import wave
+
+import pytest
+
+from unisteg.containers import id3_frames, id3v2_tag, riff_chunks, syncsafe
+from unisteg.plugin_base import FileInfo
+from unisteg.plugins.audio_metadata import PAYLOAD_CHUNK, AudioMetadataPlugin
+
+PLUGIN = AudioMetadataPlugin()
+
+# an MPEG-1 layer III frame header and silence, standing in for the audio after the tag
+MP3_BODY = b"\xff\xfb\x90\x64" + bytes(413)
+
+
+def _embed(path: str, mimetype: str, payload: bytes) -> str:
+    stego = path + ".stego"
+    with FileInfo(path=path, mimetype=mimetype) as info:
+        PLUGIN.embed_to(info, payload, stego)
+    return stego
+
+
+def _extract(path: str, mimetype: str) -> bytes:
+    with FileInfo(path=path, mimetype=mimetype) as info:
+        return PLUGIN.extract(info)
+
+
+def _scan(path: str, mimetype: str) -> list:
+    with FileInfo(path=path, mimetype=mimetype) as info:
+        return PLUGIN.scan(info).findings
+
+
+def _id3(version: int, frames: bytes, padding: int = 16) -> bytes:
+    return b"ID3" + bytes([version, 0, 0]) + syncsafe(len(frames) + padding) + frames + bytes(padding)
+
+
+def _text_frame(version: int, fid: bytes, text: bytes) -> bytes:
+    body = b"\x03" + text
+    size = syncsafe(len(body)) if version == 4 else struct.pack(">I", len(body))
+    return fid + size + b"\0\0" + body
+
+
+def _add_chunk(path: str, cid: bytes, body: bytes) -> None:
+    with open(path, "r+b") as f:
+        data = bytearray(f.read())
+        data += cid + struct.pack("<I", len(body)) + body + b"\0" * (len(body) & 1)
+        data[4:8] = struct.pack("<I", len(data) - 8)
+        f.seek(0)
+        f.write(data)
+
+
+@pytest.mark.parametrize("size", [0, 1, 1001])
+def test_wav_round_trip(wav_cover, size):
+    cover = wav_cover()
+    payload = (bytes(range(256)) * 4)[:size]
+    stego = _embed(cover, "audio/wav", payload)
+    assert _extract(stego, "audio/wav") == payload
+    with wave.open(cover) as a, wave.open(stego) as b:
+        assert a.getparams() == b.getparams()
+        assert a.readframes(a.getnframes()) == b.readframes(b.getnframes())
+    with open(stego, "rb") as f:
+        data = f.read()
+    assert struct.unpack_from("<I", data, 4)[0] == len(data) - 8
+    assert any(f.startswith(f"Found unisteg payload in {PAYLOAD_CHUNK.decode()}") for f in _scan(stego, "audio/wav"))
+
+
+def test_wav_odd_chunk_and_trailing_data(wav_cover):
+    cover = wav_cover()
+    _add_chunk(cover, b"LIST", b"INFOodd")
+    with open(cover, "ab") as f:
+        f.write(b"appended after the RIFF chunk")
+    stego = _embed(cover, "audio/wav", b"payload")
+    assert _extract(stego, "audio/wav") == b"payload"
+    with open(stego, "rb") as f:
+        chunks = list(riff_chunks(f, f.seek(0, 2)))
+        f.seek(-29, 2)
+        assert f.read() == b"appended after the RIFF chunk"
+    assert [c.id for c in chunks] == [b"fmt ", b"data", b"LIST", PAYLOAD_CHUNK]
+    assert chunks[2].list_type == b"INFO" and chunks[3].offset % 2 == 0
+    assert "RIFF chunk LIST/INFO at offset" in " ".join(_scan(stego, "audio/wav"))
+
+
+def test_wav_without_payload(wav_cover):
+    cover = wav_cover()
+    with pytest.raises(ValueError, match="No unisteg metadata chunk"):
+        _extract(cover, "audio/wav")
+    assert _scan(cover, "audio/wav") == ["No obvious audio metadata markers detected."]
+
+
+@pytest.mark.parametrize("version", [3, 4])
+def test_mp3_existing_tag(tmp_path, version):
+    cover = tmp_path / "song.mp3"
+    cover.write_bytes(_id3(version, _text_frame(version, b"TIT2", b"title")) + MP3_BODY)
+    stego = _embed(str(cover), "audio/mpeg", b"hidden" * 50)
+    assert _extract(stego, "audio/mpeg") == b"hidden" * 50
+    with open(stego, "rb") as f:
+        data = f.read()
+        tag = id3v2_tag(data[:14])
+        assert tag.version == version
+        assert [c.id for c in id3_frames(f, tag)] == [b"TIT2", b"PRIV"]
+    assert data.endswith(bytes(16) + MP3_BODY)
+    findings = " ".join(_scan(stego, "audio/mpeg"))
+    assert "Found unisteg payload in PRIV" in findings and f"ID3v2.{version} frame TIT2" in findings
+
+
+def test_mp3_without_tag(tmp_path):
+    cover = tmp_path / "song.mp3"
+    cover.write_bytes(MP3_BODY)
+    stego = _embed(str(cover), "audio/mpeg", b"payload")
+    assert _extract(stego, "audio/mpeg") == b"payload"
+    with open(stego, "rb") as f:
+        assert f.read().endswith(MP3_BODY)
+
+
+def test_mp3_unsupported_tags(tmp_path):
+    cover = tmp_path / "old.mp3"
+    cover.write_bytes(_id3(2, b"TT2\x00\x00\x06\x00title") + MP3_BODY)
+    with pytest.raises(ValueError, match="ID3v2.2"):
+        _embed(str(cover), "audio/mpeg", b"x")
+    data = bytearray(_id3(3, _text_frame(3, b"TIT2", b"title")) + MP3_BODY)
+    data[5] = 0x80
+    cover.write_bytes(bytes(data))
+    with pytest.raises(ValueError, match="Unsynchronised"):
+        _embed(str(cover), "audio/mpeg", b"x")
+
+
+def test_extended_header_is_skipped():
+    frames = _text_frame(3, b"TIT2", b"title")
+    ext = struct.pack(">I", 6) + bytes(6)
+    data = b"ID3\x03\x00\x40" + syncsafe(len(ext) + len(frames)) + ext + frames
+    tag = id3v2_tag(data[:14])
+    assert tag.frames_offset == 10 + len(ext)
+    assert [c.id for c in id3_frames(io.BytesIO(data), tag)] == [b"TIT2"]
@@ -0,0 +1,83 @@
+# tests/test_cache.py
+
+from __future__ import annotations
+import time
+
+import pytest
+
+from unisteg import cache as cache_mod
+from unisteg.cache import ScanCache
+
+
+def _fill(cache: ScanCache, tmp_path, count: int, finding: str = "finding") -> None:
+    for i in range(count):
+        path = tmp_path / f"f{i}.txt"
+        path.write_text(str(i))
+        cache.put(cache.key(str(path)), "text/plain", {"text_lsb": ("1", [f"{finding} {i}"])})
+        # distinct last-use times, oldest first
+        cache.db.execute("UPDATE files SET used = ? WHERE path = ?", (time.time() - count + i, str(path)))
+
+
+def _kept(cache: ScanCache) -> list:
+    return sorted(int(p.rsplit("f", 1)[1][:-4]) for (p,) in cache.db.execute("SELECT path FROM files"))
+
+
+def test_round_trip(tmp_path):
+    db = str(tmp_path / "scan.sqlite")
+    with ScanCache(db) as cache:
+        _fill(cache, tmp_path, 2)
+    with ScanCache(db) as cache:
+        key = cache.key(str(tmp_path / "f1.txt"))
+        assert cache.mimetype(key) == "text/plain"
+        assert cache.get(key, "text_lsb", "1") == ["finding 1"]
+        assert cache.get(key, "text_lsb", "2") is None
+        (tmp_path / "f1.txt").write_text("changed")
+        assert cache.get(cache.key(str(tmp_path / "f1.txt")), "text_lsb", "1") is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+
+@pytest.mark.parametrize("stored, roll, evicts", [(1, 1, False), (1, 0, True), (3, 1, True)])
+def test_close_evicts_only_after_enough_writes(tmp_path, monkeypatch, stored, roll, evicts):
+    monkeypatch.setattr(cache_mod, "_EVICT_AFTER", 3)
+    monkeypatch.setattr(cache_mod.random, "randrange", lambda n: roll)
+    calls = []
+    cache = ScanCache(str(tmp_path / "scan.sqlite"), max_bytes=1)
+    monkeypatch.setattr(cache, "evict", lambda: calls.append(1) or 0)
+    _fill(cache, tmp_path, stored)
+    cache.close()
+    assert bool(calls) == evicts
+
+
+def test_evict_by_size_keeps_most_recent(tmp_path):
+    db = str(tmp_path / "scan.sqlite")
+    cache = ScanCache(db)
+    _fill(cache, tmp_path, 2000, "x" * 500)
+    cache.db.commit()
+    full = cache.size()
+    cache.max_bytes = full // 3
+    removed = cache.evict()
+    assert cache.size() <= cache.max_bytes
+    assert cache.db.execute("PRAGMA freelist_count").fetchone()[0] == 0  # freed pages went back
+    kept = _kept(cache)
+    assert len(kept) + removed == 2000 and kept == list(range(2000 - len(kept), 2000))
+    assert len(kept) > 2000 // 3 - 200  # not much more than needed was dropped
+    cache.close()
+    with ScanCache(db) as cache:
+        assert cache.size() <= full // 3
+
+
+def test_evict_by_age(tmp_path):
+    with ScanCache(str(tmp_path / "scan.sqlite"), max_age=1000) as cache:
+        _fill(cache, tmp_path, 300)
+        cache.db.execute("UPDATE files SET used = used - 1000 WHERE used < ?", (time.time() - 100.5,))
+        assert cache.evict() == 200
+        assert _kept(cache) == list(range(200, 300))
+
+
+def test_existing_database_is_switched_to_incremental_vacuum(tmp_path):
+    import sqlite3
+
+    db = str(tmp_path / "scan.sqlite")
+    sqlite3.connect(db).executescript(cache_mod._SCHEMA).close()
+    with ScanCache(db) as cache:
+        assert cache.db.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
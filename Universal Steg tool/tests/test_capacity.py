@@ -0,0 +1,55 @@
+# tests/test_capacity.py
+
+from __future__ import annotations
+import json
+
+import pytest
+
+import unisteg.plugins  # noqa: F401
+from unisteg.cli import main
+from unisteg.framing import HEADER_SIZE
+from unisteg.plugin_base import FileInfo, all_plugins
+
+
+def _capacity(tmp_path, *args: str) -> dict:
+    out = tmp_path / "capacity.jsonl"
+    assert main(["capacity", "-o", str(out), "-j", "1", *args]) == 0
+    records = [json.loads(line) for line in out.read_text().splitlines()]
+    return {r["file"].rsplit("/", 1)[-1]: r for r in records}
+
+
+def test_every_algo_of_every_plugin(tmp_path, image_cover, wav_cover, text_cover):
+    image_cover("a.png", size=32)
+    wav_cover("b.wav", frames=1000, channels=2)
+    text_cover("c.txt", lines=10)
+    records = _capacity(tmp_path, str(tmp_path))
+    # 32 * 32 pixels of 3 bands, 1000 frames of 2 channels and 10 lines, less the payload header
+    pixels = {f"lsb{n}": 32 * 32 * 3 * n // 8 - HEADER_SIZE for n in range(1, 5)}
+    assert records["a.png"]["capacity"]["image_lsb"] == pixels
+    assert records["b.wav"]["capacity"]["audio_lsb"]["lsb1"] == 1000 * 2 // 8 - HEADER_SIZE
+    assert records["c.txt"]["capacity"]["text_lsb"] == {"zw": 10 * 16 - HEADER_SIZE, "ws": 10 * 2 - HEADER_SIZE}
+    assert "image_appended" not in records["a.png"]["capacity"]  # no fixed limit
+
+
+def test_plugin_algo_and_channels(tmp_path, image_cover):
+    image_cover("a.png", size=32)
+    path = str(tmp_path / "a.png")
+    records = _capacity(tmp_path, path, "--plugin", "image_lsb", "--algo", "lsb2", "--channels", "R")
+    assert records["a.png"]["capacity"] == {"image_lsb": {"lsb2": 32 * 32 * 2 // 8 - HEADER_SIZE}}
+
+
+def test_unreadable_file_is_reported(tmp_path):
+    (tmp_path / "bad.wav").write_bytes(b"RIFF\x04\x00\x00\x00WAVE")
+    assert "error" in _capacity(tmp_path, str(tmp_path / "bad.wav"))["bad.wav"]
+
+
+@pytest.mark.parametrize("name", ["image_lsb", "audio_lsb", "text_lsb"])
+def test_capacity_fits_exactly(tmp_path, image_cover, wav_cover, text_cover, name):
+    plugin = next(p for p in all_plugins() if p.name == name)
+    cover = {"image_lsb": image_cover, "audio_lsb": wav_cover, "text_lsb": text_cover}[name]()
+    for algo in plugin.algos:
+        with FileInfo.detect(cover) as info:
+            capacity = plugin.capacity(info, algo=algo)
+            plugin.embed_to(info, bytes(capacity), str(tmp_path / "stego"), algo=algo)
+        with FileInfo.detect(str(tmp_path / "stego")) as info:
+            assert plugin.extract(info, algo=algo) == bytes(capacity)
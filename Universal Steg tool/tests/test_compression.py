@@ -0,0 +1,110 @@
+# tests/test_compression.py
+
+from __future__ import annotations
+import os
+
+import pytest
+
+from unisteg import compression
+from unisteg.compression import CODECS, available, compress, compress_chunks, decompress
+from unisteg.cli import main
+from unisteg.framing import parse_header, pack_header, verify
+from unisteg.plugin_base import BasePlugin, FileInfo, ScanResult
+
+TEXT = b"".join(b"line %d of a fairly repetitive payload\n" % i for i in range(5000))
+
+
+@pytest.mark.parametrize("codec", available())
+def test_round_trip(codec, tmp_path):
+    data, flags, used = compress(TEXT, codec)
+    assert used == codec and len(data) < len(TEXT)
+    assert decompress(flags, data) == TEXT
+    path = tmp_path / "payload.txt"
+    path.write_bytes(TEXT)
+    assert compress(str(path), codec) == (data, flags, used)
+
+
+def test_incompressible_payload_is_stored():
+    raw = os.urandom(10_000)
+    assert compress(raw, "auto") == (raw, 0, None)
+    assert compress(raw, "zlib") == (raw, 0, None)
+
+
+def test_verify_decompresses():
+    data, flags, _ = compress(TEXT, "zlib")
+    assert verify(parse_header(pack_header(data, flags)), data) == TEXT
+
+
+@pytest.mark.parametrize("codec", available())
+def test_output_beyond_limit_is_refused(codec):
+    data = b"".join(compress_chunks([bytes(5000)], codec))
+    assert decompress(CODECS[codec], data, 5000) == bytes(5000)
+    with pytest.raises(ValueError, match="more than 4999 bytes"):
+        decompress(CODECS[codec], data, 4999)
+
+
+def test_bomb_is_refused(monkeypatch):
+    monkeypatch.setattr(compression, "MIN_OUTPUT", 1 << 20)
+    bomb = b"".join(compress_chunks([bytes(1 << 20)] * 16, "lzma"))
+    assert 16 << 20 > compression.max_output(len(bomb))
+    with pytest.raises(ValueError, match="decompresses to more than"):
+        decompress(CODECS["lzma"], bomb)
+
+
+def test_extreme_ratios_fall_back_to_zlib(monkeypatch):
+    monkeypatch.setattr(compression, "MIN_OUTPUT", 1 << 20)
+    raw = bytes(2 << 20)
+    data, flags, used = compress(raw, "lzma")
+    assert used == "zlib"
+    assert decompress(flags, data) == raw
+
+
+@pytest.mark.parametrize("codec", available())
+def test_truncated_or_corrupt(codec):
+    data, flags, _ = compress(TEXT, codec)
+    with pytest.raises(ValueError):
+        decompress(flags, data[: len(data) // 2])
+    damaged = bytearray(data)
+    damaged[len(data) // 2] ^= 0xFF
+    with pytest.raises(ValueError):
+        decompress(flags, bytes(damaged))
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError, match="Unknown compression codec"):
+        compress(TEXT, "brotli")
+
+
+class _EmbedOnly(BasePlugin):
+    """A plugin written against the older bytes-returning embed(), without a payload header."""
+
+    name = "embed_only"
+    supported_mimetypes = ["text/plain"]
+
+    def scan(self, info):
+        return ScanResult(file=info.path, findings=[])
+
+    def embed(self, info, payload, **options):
+        return info.read_at(0, info.size) + payload
+
+    def extract(self, info, *, algo="", **options):
+        return b""
+
+
+def test_shims_refuse_flags_a_plugin_cannot_record(text_cover, tmp_path):
+    data, flags, _ = compress(TEXT, "zlib")
+    with FileInfo.detect(text_cover()) as info:
+        _EmbedOnly().embed_to(info, data, str(tmp_path / "plain.txt"))
+        with pytest.raises(ValueError, match="cannot record payload flags"):
+            _EmbedOnly().embed_to(info, data, str(tmp_path / "stego.txt"), flags=flags)
+
+
+def test_embed_compress_needs_a_plugin_that_records_flags(text_cover, tmp_path, capsys):
+    payload = tmp_path / "payload.txt"
+    payload.write_bytes(TEXT)
+    stego = str(tmp_path / "stego.txt")
+    assert main(["embed", text_cover(), str(payload), stego, "--plugin", "text_metadata", "--compress", "zlib"]) == 1
+    assert "cannot record the codec" in capsys.readouterr().err
+    assert main(["embed", text_cover(), str(payload), stego, "--plugin", "text_appended", "--compress", "zlib"]) == 0
+    assert main(["extract", stego, str(tmp_path / "out.txt"), "--plugin", "text_appended"]) == 0
+    assert (tmp_path / "out.txt").read_bytes() == TEXT
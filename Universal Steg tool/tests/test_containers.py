@@ -0,0 +1,94 @@
+# tests/test_containers.py
+
+from __future__ import annotations
+import io
+import os
+
+import pytest
+
+from unisteg.containers import bmp_end, container_end, jpeg_end, png_end
+from unisteg.plugin_base import FileInfo
+from unisteg.plugins.audio_appended import AudioAppendedPlugin
+from unisteg.plugins.image_appended import ImageAppendedPlugin
+from unisteg.plugins.text_appended import MARKER, TextAppendedPlugin
+
+IMAGES = [("cover.png", "PNG"), ("cover.jpg", "JPEG"), ("cover.bmp", "BMP")]
+
+
+def _end(path: str) -> int:
+    with FileInfo.detect(path) as info:
+        return container_end(info)
+
+
+@pytest.mark.parametrize("name, fmt", IMAGES)
+def test_container_end_is_file_end(image_cover, name, fmt):
+    path = image_cover(name, fmt=fmt)
+    assert _end(path) == os.path.getsize(path)
+
+
+@pytest.mark.parametrize("name, fmt", IMAGES)
+def test_raw_trailing_data(image_cover, name, fmt):
+    path = image_cover(name, fmt=fmt)
+    size = os.path.getsize(path)
+    # bytes that look like markers and chunks must not fool the walkers
+    trailing = b"\xff\xd9IEND\xaeB`\x82 raw trailing data"
+    with open(path, "ab") as f:
+        f.write(trailing)
+    assert _end(path) == size
+    plugin = ImageAppendedPlugin()
+    with FileInfo.detect(path) as info:
+        assert plugin.extract(info) == trailing
+        assert f"Detected {len(trailing)} extra bytes" in plugin.scan(info).findings[0]
+
+
+def test_jpeg_restart_markers_and_stuffing():
+    scan = b"\x12\xff\x00\x34\xff\xd0\x56\xff\xff\xd1\x78"
+    data = b"\xff\xd8" + b"\xff\xe0\x00\x04ab" + b"\xff\xda\x00\x02" + scan + b"\xff\xd9"
+    assert jpeg_end(data) == len(data)
+    assert jpeg_end(data[:-2]) is None
+
+
+def test_broken_chains():
+    png = b"\x89PNG\r\n\x1a\n" + b"\x00\x00\x00\x05IHDR"
+    assert png_end(io.BytesIO(png), len(png)) is None
+    assert jpeg_end(b"\xff\xd8\x00\x00") is None
+    assert bmp_end(b"BM\xff\xff\x00\x00", 100) is None
+
+
+@pytest.mark.parametrize(
+    "plugin, make",
+    [
+        (ImageAppendedPlugin(), lambda c: c["image"]()),
+        (AudioAppendedPlugin(), lambda c: c["wav"]()),
+        (TextAppendedPlugin(), lambda c: c["text"]()),
+    ],
+)
+def test_appended_round_trip(image_cover, wav_cover, text_cover, tmp_path, plugin, make):
+    cover = make({"image": image_cover, "wav": wav_cover, "text": text_cover})
+    stego = str(tmp_path / ("stego" + os.path.splitext(cover)[1]))
+    with FileInfo.detect(cover) as info:
+        plugin.embed_to(info, b"appended payload", stego)
+    with open(cover, "rb") as a, open(stego, "rb") as b:
+        assert b.read().startswith(a.read())
+    with FileInfo.detect(stego) as info:
+        assert plugin.extract(info) == b"appended payload"
+        assert plugin.scan(info).findings[0] == "Found unisteg appended payload trailer: 16 bytes."
+
+
+def test_raw_appended_audio_needs_length(wav_cover):
+    path = wav_cover()
+    with open(path, "ab") as f:
+        f.write(b"raw")
+    plugin = AudioAppendedPlugin()
+    with FileInfo.detect(path) as info:
+        with pytest.raises(ValueError, match="pass length"):
+            plugin.extract(info)
+        assert plugin.extract(info, length=3) == b"raw"
+
+
+def test_text_marker_without_trailer(text_cover):
+    path = text_cover()
+    with open(path, "ab") as f:
+        f.write(MARKER + b"legacy payload")
+    with FileInfo.detect(path) as info:
+        assert TextAppendedPlugin().extract(info) == b"legacy payload"
@@ -0,0 +1,41 @@
+# tests/test_fileinfo.py
+
+from __future__ import annotations
+
+from unisteg.plugin_base import FileInfo
+from unisteg.plugins.image_lsb import ImageLSBPlugin
+from unisteg.plugins.image_metadata import ImageMetadataPlugin
+
+
+def test_views(tmp_path):
+    path = tmp_path / "data.bin"
+    data = bytes(range(256)) * 1024
+    path.write_bytes(data)
+    with FileInfo(path=str(path), mimetype="application/octet-stream") as info:
+        assert info.size == len(data)
+        assert info.head(10) == data[:10]
+        assert info.tail(10) == data[-10:]
+        assert info.tail(len(data)) == data
+        assert info.read_at(1000, 5) == data[1000:1005]
+        assert info.buffer()[:4] == data[:4]
+        assert info.stream().read(4) == data[:4]
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty"
+    path.write_bytes(b"")
+    with FileInfo(path=str(path), mimetype="application/octet-stream") as info:
+        assert info.buffer() == b""
+        assert info.stream().read() == b""
+        assert info.head() == info.tail() == b""
+
+
+def test_close_releases_streams(image_cover):
+    info = FileInfo.detect(image_cover())
+    ImageLSBPlugin().scan(info)
+    ImageMetadataPlugin().scan(info)
+    streams = list(info._streams)
+    assert streams and not any(s.closed for s in streams)
+    info.close()
+    assert all(s.closed for s in streams)
+    assert not info._streams
@@ -0,0 +1,62 @@
+# tests/test_filetype.py
+
+from __future__ import annotations
+
+import pytest
+
+from unisteg.filetype import DETECT_SIZE, detect, detect_mimetype
+
+
+@pytest.mark.parametrize(
+    "head, expected",
+    [
+        (b"\x89PNG\r\n\x1a\n" + bytes(8), "image/png"),
+        (b"\xff\xd8\xff\xe0" + bytes(8), "image/jpeg"),
+        (b"GIF89a" + bytes(8), "image/gif"),
+        (b"II*\x00" + bytes(8), "image/tiff"),
+        (b"BM" + bytes(12) + (40).to_bytes(4, "little") + bytes(8), "image/bmp"),
+        (b"RIFF\x00\x00\x00\x00WAVEfmt ", "audio/wav"),
+        (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+        (b"fLaC" + bytes(8), "audio/flac"),
+        (b"OggS" + bytes(8), "audio/ogg"),
+        (b"ID3\x03\x00\x00" + bytes(8), "audio/mpeg"),
+        (b"\xff\xfb\x90\x64" + bytes(8), "audio/mpeg"),
+        (b"\xef\xbb\xbfhello", "text/plain"),
+        (b"\xff\xfeh\x00i\x00", "text/plain"),
+        (b"plain words\nand lines\n", "text/plain"),
+        ("caf\u00e9 au lait\n".encode("utf-8"), "text/plain"),
+        (b"\x00\x01\x02binary", "application/octet-stream"),
+        (b"", "text/plain"),
+    ],
+)
+def test_signatures(tmp_path, head, expected):
+    path = tmp_path / "sample"
+    path.write_bytes(head)
+    assert detect_mimetype(str(path)) == expected
+
+
+def test_bmp_needs_a_known_dib_header(tmp_path):
+    path = tmp_path / "sample"
+    path.write_bytes(b"BM" + bytes(12) + (41).to_bytes(4, "little") + bytes(8))
+    assert detect_mimetype(str(path)) == "application/octet-stream"
+
+
+def test_extension_when_content_is_unknown(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(b"\x00\x00\x00\x18ftypmp42")
+    assert detect_mimetype(str(path)) == "video/mp4"
+
+
+def test_id3v1_tag_at_end(tmp_path):
+    path = tmp_path / "sample"
+    path.write_bytes(b"\x00" * 1000 + b"TAG" + bytes(125))
+    assert detect_mimetype(str(path)) == "audio/mpeg"
+
+
+def test_text_cut_inside_a_character(tmp_path):
+    path = tmp_path / "sample"
+    data = b"a" * (DETECT_SIZE - 1) + "\u00e9".encode("utf-8") + b" more text"
+    path.write_bytes(data)
+    mimetype, head = detect(str(path))
+    assert mimetype == "text/plain"
+    assert head == data[:DETECT_SIZE]
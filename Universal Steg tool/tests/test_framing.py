@@ -0,0 +1,51 @@
+# tests/test_framing.py
+
+from __future__ import annotations
+
+import pytest
+
+from unisteg.framing import HEADER_SIZE, MAGIC, pack_header, parse_header, parse_trailer, trailer_offset, verify
+
+
+def test_header_round_trip():
+    header = parse_header(pack_header(b"payload", flags=0x80))
+    assert header is not None
+    assert (header.length, header.flags) == (7, 0x80)
+    assert verify(header, b"payload") == b"payload"
+
+
+@pytest.mark.parametrize("data", [b"", pack_header(b"x")[:-1], b"XXXX" + pack_header(b"x")[4:]])
+def test_missing_header(data):
+    assert parse_header(data) is None
+
+
+def test_unknown_version_is_not_a_header():
+    data = bytearray(pack_header(b"x"))
+    data[len(MAGIC)] = 99
+    assert parse_header(bytes(data)) is None
+
+
+def test_truncated_payload():
+    header = parse_header(pack_header(b"payload"))
+    with pytest.raises(ValueError, match="Truncated"):
+        verify(header, b"payl")
+
+
+def test_crc_mismatch():
+    header = parse_header(pack_header(b"payload"))
+    with pytest.raises(ValueError, match="checksum"):
+        verify(header, b"paXload")
+
+
+def test_trailer():
+    data = b"cover" + b"payload" + pack_header(b"payload")
+    header = parse_trailer(data[-64:], len(data))
+    assert header is not None
+    start = trailer_offset(header, len(data))
+    assert data[start : start + header.length] == b"payload"
+
+
+def test_trailer_longer_than_file():
+    data = pack_header(b"payload")
+    assert len(data) == HEADER_SIZE
+    assert parse_trailer(data, len(data)) is None
@@ -0,0 +1,95 @@
+# tests/test_image_lsb.py
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from unisteg.plugin_base import FileInfo
+from unisteg.plugins.image_lsb import ImageLSBPlugin
+
+PLUGIN = ImageLSBPlugin()
+
+
+def _embed(cover: str, payload: bytes, **options) -> str:
+    stego = cover + ".stego.png"
+    with FileInfo.detect(cover) as info:
+        PLUGIN.embed_to(info, payload, stego, **options)
+    return stego
+
+
+def _extract(path: str, **options) -> bytes:
+    with FileInfo.detect(path) as info:
+        return PLUGIN.extract(info, **options)
+
+
+def _capacity(path: str, **options) -> int:
+    with FileInfo.detect(path) as info:
+        return PLUGIN.capacity(info, **options)
+
+
+@pytest.mark.parametrize("algo", ["lsb1", "lsb2", "lsb3", "lsb4"])
+@pytest.mark.parametrize("fmt", ["PNG", "BMP"])
+def test_round_trip(image_cover, algo, fmt):
+    cover = image_cover(f"cover.{fmt.lower()}", fmt=fmt)
+    payload = bytes(range(256)) * 2
+    stego = _embed(cover, payload, algo=algo)
+    assert _extract(stego, algo=algo) == payload
+    with FileInfo.detect(stego) as info:
+        assert PLUGIN.scan(info).findings[0].startswith(f"Found unisteg {algo} payload header: 512 bytes")
+
+
+@pytest.mark.parametrize("mode", ["L", "LA", "P", "RGB", "RGBA"])
+def test_native_modes(image_cover, mode):
+    cover = image_cover(mode=mode)
+    stego = _embed(cover, b"native mode payload")
+    assert _extract(stego) == b"native mode payload"
+    with Image.open(cover) as before, Image.open(stego) as after:
+        assert after.mode == mode
+        if mode == "P":
+            assert after.getpalette() == before.getpalette()
+        if "A" in mode:
+            assert np.array_equal(np.asarray(after.getchannel("A")), np.asarray(before.getchannel("A")))
+
+
+def test_sixteen_bit_grayscale(tmp_path):
+    cover = str(tmp_path / "deep.png")
+    pixels = np.random.default_rng(0).integers(0, 1 << 16, (64, 64), dtype=np.uint16)
+    Image.fromarray(pixels).save(cover)  # mode I;16
+    stego = _embed(cover, b"sixteen bits", algo="lsb4")
+    assert _extract(stego, algo="lsb4") == b"sixteen bits"
+    with Image.open(stego) as img:
+        changed = np.asarray(img).astype(np.int64) ^ pixels
+    assert changed.max() < 16
+
+
+@pytest.mark.parametrize("fmt", ["PNG", "BMP"])
+@pytest.mark.parametrize("algo, channels", [("lsb1", None), ("lsb2", "G"), ("lsb3", "R,B")])
+def test_capacity_is_exact(image_cover, fmt, algo, channels):
+    cover = image_cover(f"cover.{fmt.lower()}", size=32, fmt=fmt)
+    capacity = _capacity(cover, algo=algo, channels=channels)
+    payload = bytes(capacity)
+    assert _extract(_embed(cover, payload, algo=algo, channels=channels), algo=algo, channels=channels) == payload
+    with pytest.raises(ValueError, match="too large"):
+        _embed(cover, payload + b"x", algo=algo, channels=channels)
+
+
+def test_channel_subset_leaves_other_bands(image_cover):
+    cover = image_cover()
+    stego = _embed(cover, b"blue only" * 10, channels="B")
+    with Image.open(cover) as before, Image.open(stego) as after:
+        a, b = np.asarray(before), np.asarray(after)
+    assert np.array_equal(a[..., :2], b[..., :2])
+    assert not np.array_equal(a[..., 2], b[..., 2])
+    assert _extract(stego, channels="B") == b"blue only" * 10
+    with pytest.raises(ValueError):
+        _extract(stego)
+
+
+def test_bad_channels_and_missing_header(image_cover):
+    cover = image_cover()
+    with pytest.raises(ValueError, match="Invalid channels"):
+        _embed(cover, b"x", channels="Q")
+    with pytest.raises(ValueError, match="No unisteg payload header"):
+        _extract(cover)
@@ -0,0 +1,63 @@
+# tests/test_permutation.py
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from unisteg.permutation import BATCH, KeyedPermutation
+from unisteg.plugin_base import FileInfo
+from unisteg.plugins.audio_lsb import AudioLSBPlugin
+from unisteg.plugins.image_lsb import ImageLSBPlugin
+
+
+@pytest.mark.parametrize("domain", [1, 2, 3, 1000, 4099, BATCH + 17])
+def test_is_a_permutation(domain):
+    perm = KeyedPermutation("key", domain)
+    positions = perm.positions(0, domain)
+    assert np.array_equal(np.sort(positions), np.arange(domain))
+
+
+def test_depends_on_key_and_domain():
+    a = KeyedPermutation("key", 10_000).positions(0, 100)
+    assert np.array_equal(a, KeyedPermutation(b"key", 10_000).positions(0, 100))
+    assert not np.array_equal(a, KeyedPermutation("other", 10_000).positions(0, 100))
+    assert not np.array_equal(a, KeyedPermutation("key", 10_001).positions(0, 100))
+
+
+def test_positions_are_a_window_of_the_whole():
+    perm = KeyedPermutation("key", 5000)
+    assert np.array_equal(perm.positions(1234, 100), perm.positions(0, 5000)[1234:1334])
+
+
+def test_bounds():
+    with pytest.raises(ValueError):
+        KeyedPermutation("key", 0)
+    with pytest.raises(ValueError, match="capacity"):
+        KeyedPermutation("key", 100).positions(90, 11)
+
+
+@pytest.mark.parametrize("fmt", ["PNG", "BMP"])
+def test_keyed_image_round_trip(image_cover, fmt):
+    plugin = ImageLSBPlugin()
+    cover = image_cover(f"cover.{fmt.lower()}", fmt=fmt)
+    stego = cover + ".stego.png"
+    with FileInfo.detect(cover) as info:
+        plugin.embed_to(info, b"scattered" * 20, stego, algo="lsb2", key="secret")
+    with FileInfo.detect(stego) as info:
+        assert plugin.extract(info, algo="lsb2", key="secret") == b"scattered" * 20
+        with pytest.raises(ValueError, match="check the key"):
+            plugin.extract(info, algo="lsb2", key="wrong")
+        assert not plugin.scan(info).findings[0].startswith("Found unisteg")
+
+
+def test_keyed_audio_round_trip(wav_cover):
+    plugin = AudioLSBPlugin()
+    cover = wav_cover()
+    stego = cover + ".stego.wav"
+    with FileInfo.detect(cover) as info:
+        plugin.embed_to(info, b"scattered" * 20, stego, algo="lsb1", key="secret")
+    with FileInfo.detect(stego) as info:
+        assert plugin.extract(info, algo="lsb1", key="secret") == b"scattered" * 20
+        with pytest.raises(ValueError, match="check the key"):
+            plugin.extract(info, algo="lsb1", key="wrong")
@@ -0,0 +1,116 @@
+# tests/test_plugin_registry.py
+
+from __future__ import annotations
+import importlib.metadata
+import json
+import subprocess
+import sys
+import textwrap
+import warnings
+
+import pytest
+
+from unisteg import plugin_base
+from unisteg.plugin_base import ENTRY_POINT_GROUP, get_plugin, plugin_names, plugins_for_mimetype
+
+_FAKE_MODULE = '''
+from unisteg.plugin_base import BasePlugin, ScanResult
+
+
+class FakePlugin(BasePlugin):
+    name = "fake"
+    supported_mimetypes = ["application/x-fake"]
+
+    def scan(self, info):
+        return ScanResult(file=info.path, findings=["fake"])
+
+    def extract(self, info, *, algo="", **options):
+        return b""
+'''
+
+
+def _loaded_after(code: str) -> dict:
+    """Plugin modules imported by a fresh interpreter at each point the code records."""
+    script = textwrap.dedent("""
+        import json, sys
+        import unisteg.plugins
+        from unisteg.plugin_base import get_plugin, plugin_names, plugins_for_mimetype
+        steps = {}
+        def record(step):
+            steps[step] = sorted(m.rsplit(".", 1)[1] for m in sys.modules if m.startswith("unisteg.plugins."))
+    """) + textwrap.dedent(code) + "\nprint(json.dumps(steps))\n"
+    out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    return json.loads(out)
+
+
+def test_plugins_are_imported_on_demand():
+    steps = _loaded_after("""
+        record("declared")
+        names = plugin_names()
+        record("names")
+        plugins_for_mimetype("text/plain")
+        record("text/plain")
+        get_plugin("audio_lsb")
+        record("audio_lsb")
+    """)
+    assert steps["declared"] == steps["names"] == []
+    assert steps["text/plain"] == ["text_appended", "text_lsb", "text_metadata"]
+    assert steps["audio_lsb"] == ["audio_lsb", "text_appended", "text_lsb", "text_metadata"]
+
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path):
+    """A private copy of the registry, with entry points listed by `entry_points`."""
+    import unisteg.plugins  # noqa: F401
+
+    monkeypatch.setattr(plugin_base, "_PLUGIN_SPECS", dict(plugin_base._PLUGIN_SPECS))
+    monkeypatch.setattr(plugin_base, "_PLUGIN_REGISTRY", dict(plugin_base._PLUGIN_REGISTRY))
+    monkeypatch.setattr(plugin_base, "_entry_points_loaded", False)
+    (tmp_path / "fake_unisteg_plugin.py").write_text(_FAKE_MODULE)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.delitem(sys.modules, "fake_unisteg_plugin", raising=False)
+    entry_points = []
+
+    def fake_entry_points(group: str):
+        return [ep for ep in entry_points if ep.group == group]
+
+    monkeypatch.setattr(importlib.metadata, "entry_points", fake_entry_points)
+    return entry_points
+
+
+def _entry_point(name: str, value: str) -> importlib.metadata.EntryPoint:
+    return importlib.metadata.EntryPoint(name=name, value=value, group=ENTRY_POINT_GROUP)
+
+
+def test_entry_point_plugin_is_discovered(registry):
+    registry.append(_entry_point("fake", "fake_unisteg_plugin:FakePlugin"))
+    assert "fake" in plugin_names()
+    assert "fake_unisteg_plugin" not in sys.modules
+    plugins = plugins_for_mimetype("application/x-fake")
+    assert [p.name for p in plugins] == ["fake"]
+    assert get_plugin("fake") is plugins[0]
+    # once imported, its mimetypes are known and other lookups skip it
+    assert plugin_base._PLUGIN_SPECS["fake"].mimetypes == ["application/x-fake"]
+    assert "fake" not in [p.name for p in plugins_for_mimetype("text/plain")]
+
+
+@pytest.mark.parametrize("target", ["no_such_module:Plugin", "fake_unisteg_plugin:Missing", "json:JSONDecoder"])
+def test_unloadable_entry_point_plugin(registry, target):
+    registry.append(_entry_point("broken", target))
+    with pytest.warns(RuntimeWarning, match="Plugin broken .* cannot be loaded"):
+        plugins = plugins_for_mimetype("text/plain")
+    assert "text_lsb" in [p.name for p in plugins] and "broken" not in [p.name for p in plugins]
+    with pytest.raises(ValueError, match="cannot be loaded"):
+        get_plugin("broken")
+    # the failure is remembered: no second import attempt and no repeated warning
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        plugins_for_mimetype("text/plain")
+
+
+def test_unloadable_plugin_on_the_command_line(registry, capsys):
+    from unisteg.cli import main
+
+    registry.append(_entry_point("broken", "no_such_module:Plugin"))
+    assert main(["extract", "stego.png", "payload.bin", "--plugin", "broken"]) == 1
+    assert "Plugin broken (no_such_module:Plugin) cannot be loaded: ModuleNotFoundError" in capsys.readouterr().err
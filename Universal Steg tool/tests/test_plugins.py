@@ -0,0 +1,75 @@
+# tests/test_plugins.py
+"""Every plugin that embeds, with every algo it lists, through each embedding entry point."""
+
+from __future__ import annotations
+import io
+
+import pytest
+
+import unisteg.plugins  # noqa: F401
+from unisteg.compression import compress
+from unisteg.plugin_base import FileInfo, all_plugins
+
+COVERS = {
+    "image/png": lambda covers: covers["image"]("cover.png"),
+    "image/bmp": lambda covers: covers["image"]("cover.bmp", fmt="BMP"),
+    "image/jpeg": lambda covers: covers["image"]("cover.jpg", fmt="JPEG"),
+    "audio/wav": lambda covers: covers["wav"]("cover.wav"),
+    "text/plain": lambda covers: covers["text"]("cover.txt"),
+}
+
+CASES = [
+    (plugin.name, algo, mimetype)
+    for plugin in all_plugins()
+    for algo in plugin.algos
+    for mimetype in plugin.supported_mimetypes
+    if mimetype in COVERS
+]
+
+PAYLOAD = b"round trip " * 40
+
+
+@pytest.fixture
+def cover(image_cover, wav_cover, text_cover):
+    def make(mimetype: str) -> str:
+        return COVERS[mimetype]({"image": image_cover, "wav": wav_cover, "text": text_cover})
+
+    return make
+
+
+def _plugin(name: str):
+    return next(p for p in all_plugins() if p.name == name)
+
+
+@pytest.mark.parametrize("name, algo, mimetype", CASES)
+def test_entry_points_agree(cover, tmp_path, name, algo, mimetype):
+    plugin = _plugin(name)
+    path = cover(mimetype)
+    stego = str(tmp_path / ("stego" + plugin.output_suffix(FileInfo(path=path, mimetype=mimetype))))
+    with FileInfo.detect(path) as info:
+        assert info.mimetype == mimetype
+        plugin.embed_to(info, PAYLOAD, stego, algo=algo)
+        buffer = io.BytesIO()
+        plugin.embed_to(info, PAYLOAD, buffer, algo=algo)
+        data = plugin.embed(info, PAYLOAD, algo=algo)
+    with open(stego, "rb") as f:
+        assert f.read() == buffer.getvalue() == data
+    with FileInfo.detect(stego) as info:
+        assert plugin.extract(info, algo=algo) == PAYLOAD
+        assert plugin.scan(info).findings
+
+
+@pytest.mark.parametrize("name, algo, mimetype", CASES)
+def test_compressed_round_trip(cover, tmp_path, name, algo, mimetype):
+    plugin = _plugin(name)
+    data, flags, codec = compress(PAYLOAD, "zlib")
+    assert codec == "zlib"
+    stego = str(tmp_path / "stego")
+    with FileInfo.detect(cover(mimetype)) as info:
+        plugin.embed_to(info, data, stego, algo=algo, flags=flags)
+    with FileInfo.detect(stego) as info:
+        assert plugin.extract(info, algo=algo) == PAYLOAD
+
+
+def test_every_embedding_plugin_is_covered():
+    assert {name for name, _, _ in CASES} == {p.name for p in all_plugins() if p.algos}
@@ -0,0 +1,148 @@
+# tests/test_pngstream.py
+
+from __future__ import annotations
+import struct
+import tracemalloc
+import zlib
+
+import numpy as np
+import pytest
+from PIL import Image, PngImagePlugin
+
+from unisteg import pngstream
+from unisteg.plugin_base import FileInfo
+from unisteg.plugins.image_lsb import ImageLSBPlugin
+
+PLUGIN = ImageLSBPlugin()
+PAYLOAD = bytes(range(256)) * 3
+
+
+@pytest.fixture(autouse=True)
+def small_strips(monkeypatch):
+    # a few rows per strip, so payloads span strips and end inside one
+    monkeypatch.setattr(pngstream, "STRIP_BYTES", 500)
+
+
+def _in_memory(monkeypatch):
+    monkeypatch.setattr(ImageLSBPlugin, "_png_header", lambda self, info: None)
+
+
+def _embed(cover: str, payload: bytes, stego: str, **options) -> None:
+    with FileInfo.detect(cover) as info:
+        PLUGIN.embed_to(info, payload, stego, **options)
+
+
+def _extract(path: str, **options) -> bytes:
+    with FileInfo.detect(path) as info:
+        return PLUGIN.extract(info, **options)
+
+
+def _pixels(path: str) -> np.ndarray:
+    with Image.open(path) as img:
+        return np.asarray(img).astype(np.int64)
+
+
+@pytest.mark.parametrize("mode", ["L", "LA", "P", "RGB", "RGBA"])
+@pytest.mark.parametrize("options", [{"algo": "lsb1"}, {"algo": "lsb3", "channels": "0"}, {"algo": "lsb2", "key": "k"}])
+def test_matches_in_memory_path(image_cover, tmp_path, monkeypatch, mode, options):
+    cover = image_cover(mode=mode, size=96)
+    with FileInfo.detect(cover) as info:
+        assert PLUGIN._png_header(info) is not None
+    _embed(cover, PAYLOAD, str(tmp_path / "streamed.png"), **options)
+    assert _extract(str(tmp_path / "streamed.png"), **options) == PAYLOAD
+
+    _in_memory(monkeypatch)
+    _embed(cover, PAYLOAD, str(tmp_path / "decoded.png"), **options)
+    assert np.array_equal(_pixels(str(tmp_path / "streamed.png")), _pixels(str(tmp_path / "decoded.png")))
+    assert _extract(str(tmp_path / "streamed.png"), **options) == PAYLOAD
+
+
+def test_sixteen_bit(tmp_path):
+    cover = str(tmp_path / "deep.png")
+    Image.fromarray(np.random.default_rng(1).integers(0, 1 << 16, (80, 80), dtype=np.uint16)).save(cover)
+    stego = str(tmp_path / "stego.png")
+    _embed(cover, PAYLOAD, stego, algo="lsb4")
+    assert _extract(stego, algo="lsb4") == PAYLOAD
+    assert (np.abs(_pixels(stego) - _pixels(cover)) < 16).all()
+
+
+def test_rows_after_payload_are_untouched(image_cover, tmp_path):
+    cover = image_cover(size=128)
+    stego = str(tmp_path / "stego.png")
+    _embed(cover, b"short", stego)
+    before, after = _pixels(cover), _pixels(stego)
+    assert not np.array_equal(before[0], after[0])
+    assert np.array_equal(before[2:], after[2:])
+
+
+def test_ancillary_chunks_are_kept(image_cover, tmp_path):
+    cover = str(tmp_path / "text.png")
+    with Image.open(image_cover(size=64)) as img:
+        meta = PngImagePlugin.PngInfo()
+        meta.add_text("Comment", "kept")
+        img.save(cover, pnginfo=meta)
+    stego = str(tmp_path / "stego.png")
+    _embed(cover, PAYLOAD, stego)
+    with Image.open(stego) as img:
+        img.load()
+        assert img.text == {"Comment": "kept"}
+
+
+def test_other_bit_depths_use_decoded_path(tmp_path):
+    cover = str(tmp_path / "bilevel.png")
+    Image.fromarray(np.random.default_rng(2).integers(0, 2, (64, 64), dtype=bool)).save(cover)
+    with FileInfo.detect(cover) as info:
+        assert PLUGIN._png_header(info) is None
+    stego = str(tmp_path / "stego.png")
+    _embed(cover, PAYLOAD, stego, algo="lsb2")
+    assert _extract(stego, algo="lsb2") == PAYLOAD
+
+
+def test_payload_too_large(image_cover, tmp_path):
+    cover = image_cover(size=16)
+    with pytest.raises(ValueError, match="too large"):
+        _embed(cover, bytes(1000), str(tmp_path / "stego.png"))
+
+
+def _single_idat(path: str, pixels: np.ndarray) -> str:
+    """A grayscale PNG whose image data is all in one IDAT chunk, as some encoders write it."""
+    def chunk(ctype: bytes, data: bytes) -> bytes:
+        return struct.pack(">I4s", len(data), ctype) + data + struct.pack(">I", zlib.crc32(data, zlib.crc32(ctype)))
+
+    height, width = pixels.shape
+    filtered = np.zeros((height, width + 1), dtype=np.uint8)
+    filtered[:, 1:] = pixels
+    with open(path, "wb") as f:
+        f.write(pngstream.PNG_SIGNATURE)
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(filtered.tobytes())))
+        f.write(chunk(b"IEND", b""))
+    return path
+
+
+def test_single_idat_round_trip(tmp_path, monkeypatch):
+    monkeypatch.setattr(pngstream, "READ_SIZE", 100)
+    pixels = np.random.default_rng(3).integers(0, 256, (120, 90), dtype=np.uint8)
+    cover = _single_idat(str(tmp_path / "cover.png"), pixels)
+    stego = str(tmp_path / "stego.png")
+    _embed(cover, PAYLOAD, stego, key="k")
+    assert _extract(stego, key="k") == PAYLOAD
+    assert (np.abs(_pixels(stego) - pixels) <= 1).all()
+
+
+def test_single_idat_memory_is_bounded(tmp_path):
+    # 36 MB of pixels in a single IDAT chunk of a few KB
+    path = _single_idat(str(tmp_path / "big.png"), np.zeros((6000, 6000), dtype=np.uint8))
+    with open(path, "rb") as f:
+        tracemalloc.start()
+        try:
+            reader = pngstream._Reader(f)
+            step = pngstream._strip_rows(reader.header)
+            for _ in range(0, reader.header.height, step):
+                reader.rows(step)
+            reader.finish()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    assert reader.trailing == [(b"IEND", b"")]
+    assert peak < 4 * 1024 * 1024
@@ -0,0 +1,132 @@
+# tests/test_profiling.py
+
+from __future__ import annotations
+import time
+import tracemalloc
+
+import pytest
+
+from unisteg import profiling
+from unisteg.cli import main
+from unisteg.profiling import PhaseMetrics, Recorder, phase
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def recorder():
+    recorder = Recorder()
+    profiling.add_hook(recorder)
+    yield recorder
+    profiling.remove_hook(recorder)
+
+
+@pytest.fixture
+def traced():
+    tracemalloc.start()
+    yield
+    tracemalloc.stop()
+
+
+def _by_phase(recorder: Recorder) -> dict:
+    return {m.phase: m for m in recorder.metrics}
+
+
+def test_no_hook_measures_nothing():
+    assert not profiling.enabled()
+    with phase("idle") as metrics:
+        time.sleep(0.01)
+    assert metrics.wall == 0.0 and metrics.peak_memory is None
+
+
+def test_hooks_get_every_phase(recorder):
+    seen = []
+    profiling.add_hook(seen.append)
+    try:
+        with phase("work", "plugin", "file.png"):
+            time.sleep(0.01)
+    finally:
+        profiling.remove_hook(seen.append)
+    with phase("after"):
+        pass
+    assert [m.phase for m in seen] == ["work"]
+    assert [m.phase for m in recorder.metrics] == ["work", "after"]
+    work = recorder.metrics[0]
+    assert (work.plugin, work.path) == ("plugin", "file.png")
+    assert work.wall >= 0.01
+
+
+def test_nested_phases(recorder, traced):
+    with phase("outer"):
+        with phase("inner"):
+            block = bytearray(8 * MB)
+            del block
+        with phase("small"):
+            block = bytearray(MB // 4)
+            del block
+    assert [m.phase for m in recorder.metrics] == ["inner", "small", "outer"]
+    metrics = _by_phase(recorder)
+    assert metrics["outer"].wall >= metrics["inner"].wall + metrics["small"].wall
+    # each phase sees its own peak; the outer one gets the inner peaks handed back
+    assert 8 * MB <= metrics["inner"].peak_memory < 9 * MB
+    assert MB // 4 <= metrics["small"].peak_memory < MB
+    assert metrics["outer"].peak_memory >= metrics["inner"].peak_memory
+
+
+def test_peak_before_phase_is_not_counted(recorder, traced):
+    with phase("outer"):
+        block = bytearray(8 * MB)
+        del block
+        with phase("inner"):
+            pass
+    metrics = _by_phase(recorder)
+    assert metrics["inner"].peak_memory < MB
+    assert metrics["outer"].peak_memory >= 8 * MB
+
+
+@pytest.mark.skipif(profiling._rss() is None, reason="needs /proc/self/status")
+def test_rss_high_water_mark_is_left_alone(recorder):
+    assert not tracemalloc.is_tracing()
+    current, high = profiling._rss()
+    size = high - current + 64 * MB  # enough to raise the high-water mark left by earlier tests
+    with phase("big"):
+        block = bytearray(size)
+        block[::4096] = b"x" * len(block[::4096])  # touch every page
+        del block
+    high = profiling._rss()[1]
+    with phase("small"):
+        pass
+    metrics = _by_phase(recorder)
+    assert metrics["big"].peak_memory >= size - 16 * MB
+    assert metrics["small"].peak_memory < 16 * MB
+    assert profiling._rss()[1] >= high
+
+
+def test_recorder_totals():
+    recorder = Recorder()
+    for wall, peak in ((1.0, 10), (2.0, 30)):
+        recorder(PhaseMetrics("scan", "image_lsb", wall=wall, bytes_read=5, peak_memory=peak))
+    recorder(PhaseMetrics("detect"))
+    totals = recorder.totals()
+    scan = totals["scan", "image_lsb"]
+    assert (scan.count, scan.wall, scan.bytes_read, scan.peak_memory) == (2, 3.0, 10, 30)
+    assert totals["detect", None].bytes_read is None
+    table = recorder.format_table().splitlines()
+    assert table[1].split()[:3] == ["scan", "image_lsb", "2"]
+    assert len(recorder.drain()) == 3 and recorder.metrics == []
+
+
+def test_scan_dir_profile_merges_worker_phases(tmp_path, tmp_path_factory, image_cover, wav_cover, capsys):
+    image_cover("a.png")
+    image_cover("b.png", seed=1)
+    wav_cover("c.wav")
+    out = tmp_path_factory.mktemp("out") / "scan.jsonl"
+    assert main(["--profile", "scan-dir", str(tmp_path), "-o", str(out), "--no-cache", "-j", "2"]) == 0
+    assert not profiling.enabled()
+    table = capsys.readouterr().err.split("\nphase ", 1)[1].splitlines()[1:]
+    rows = {tuple(line.split()[:2]): int(line.split()[2]) for line in table}
+    # scanning only happens in the workers, so these rows come from their merged metrics
+    assert rows["scan", "image_lsb"] == 2
+    assert rows["scan", "audio_lsb"] == 1
+    assert rows["detect", "-"] == 3
+    assert rows["total", "-"] == 1
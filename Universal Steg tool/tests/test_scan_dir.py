@@ -0,0 +1,52 @@
+# tests/test_scan_dir.py
+
+from __future__ import annotations
+import json
+
+import pytest
+
+from unisteg.cli import main
+
+
+@pytest.fixture
+def tree(tmp_path, image_cover, wav_cover, text_cover):
+    image_cover("a.png")
+    wav_cover("b.wav")
+    (tmp_path / "notes").mkdir()
+    text_cover("notes/c.txt")
+    (tmp_path / "notes" / "broken.png").write_bytes(b"\x89PNG\r\n\x1a\nnot really")
+    return tmp_path
+
+
+def _scan_dir(tree, tmp_path_factory, *args: str) -> dict:
+    out = tmp_path_factory.mktemp("out") / "scan.jsonl"
+    assert main(["scan-dir", str(tree), "-o", str(out), "--no-cache", *args]) == 0
+    records = [json.loads(line) for line in out.read_text().splitlines()]
+    return {r["file"].rsplit("/", 1)[-1]: r for r in records}
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_every_file_gets_a_record(tree, tmp_path_factory, workers):
+    records = _scan_dir(tree, tmp_path_factory, "-j", workers)
+    assert set(records) == {"a.png", "b.wav", "c.txt", "broken.png"}
+    assert records["a.png"]["mimetype"] == "image/png"
+    assert set(records["a.png"]["results"]) == {"image_lsb", "image_metadata", "image_appended"}
+    assert "audio_lsb" in records["b.wav"]["results"]
+    assert "text_lsb" in records["c.txt"]["results"]
+    assert "error" in records["broken.png"] or records["broken.png"]["results"]
+
+
+def test_filters(tree, tmp_path_factory):
+    assert set(_scan_dir(tree, tmp_path_factory, "-j", "1", "--include", "*.png")) == {"a.png", "broken.png"}
+    assert set(_scan_dir(tree, tmp_path_factory, "-j", "1", "--exclude", "notes")) == {"a.png", "b.wav"}
+    assert set(_scan_dir(tree, tmp_path_factory, "-j", "1", "--max-size", "2000")) == {"broken.png"}
+
+
+def test_cache_answers_the_second_run(tree, tmp_path_factory, capsys):
+    db = str(tmp_path_factory.mktemp("cache") / "scan.sqlite")
+    out = str(tmp_path_factory.mktemp("out") / "scan.jsonl")
+    main(["scan-dir", str(tree), "-o", out, "-j", "1", "--cache", db])
+    capsys.readouterr()
+    main(["scan-dir", str(tree), "-o", out, "-j", "1", "--cache", db])
+    # broken.png fails to scan, so it is never stored and misses again
+    assert "Cache: 9 hits, 1 misses" in capsys.readouterr().err
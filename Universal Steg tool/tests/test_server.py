@@ -0,0 +1,145 @@
+# tests/test_server.py
+
+from __future__ import annotations
+import asyncio
+import json
+import os
+
+import pytest
+
+from unisteg.server import Server, _confine, _is_loopback, serve
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = Server(1)
+    yield server
+    server.close()
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.data = b""
+
+    def write(self, data: bytes) -> None:
+        self.data += data
+
+    async def drain(self) -> None:
+        pass
+
+
+def _serve(server: Server, serve_name: str, data: bytes) -> bytes:
+    async def run() -> bytes:
+        server._slots = asyncio.Semaphore(4)
+        server._queue = asyncio.Queue()
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        writer = _Writer()
+        dispatcher = asyncio.create_task(server._dispatch())
+        try:
+            await getattr(server, serve_name)(await reader.readline(), reader, writer)
+        finally:
+            dispatcher.cancel()
+        return writer.data
+
+    return asyncio.run(run())
+
+
+def _serve_lines(server: Server, lines: bytes) -> list:
+    return [json.loads(line) for line in _serve(server, "_serve_lines", lines).splitlines()]
+
+
+def _post(server: Server, body: bytes, **headers: str) -> tuple:
+    # header names are given with "_" for "-"; an empty value leaves the header out
+    fields = {"Host": "127.0.0.1:8000", "Content_Type": "application/json", "Content_Length": str(len(body)), **headers}
+    head = "POST / HTTP/1.1\r\n" + "".join(f"{k.replace('_', '-')}: {v}\r\n" for k, v in fields.items() if v)
+    reply = _serve(server, "_serve_http", head.encode() + b"Connection: close\r\n\r\n" + body)
+    status, _, rest = reply.partition(b"\r\n")
+    return status.decode(), json.loads(rest.partition(b"\r\n\r\n")[2])
+
+
+@pytest.mark.parametrize("host, loopback", [("127.0.0.1", True), ("::1", True), ("localhost", True),
+                                            ("0.0.0.0", False), ("192.168.1.5", False), ("example.com", False)])
+def test_is_loopback(host, loopback):
+    assert _is_loopback(host) == loopback
+
+
+def test_serve_refuses_public_address():
+    with pytest.raises(ValueError, match="non-loopback"):
+        serve(1, host="0.0.0.0", port=0)
+
+
+def test_confine(tmp_path):
+    root = os.path.realpath(tmp_path)
+    job = _confine({"op": "embed", "path": "a.png", "output": os.path.join(root, "b.png"), "payload": "x"}, root)
+    assert job["path"] == os.path.join(root, "a.png")
+    assert job["output"] == os.path.join(root, "b.png")
+    for path in ("../a.png", "/etc/passwd", os.path.join(root, "..", "x")):
+        with pytest.raises(ValueError, match="outside the server root"):
+            _confine({"path": path}, root)
+    os.symlink("/", tmp_path / "escape")
+    with pytest.raises(ValueError):
+        _confine({"output": "escape/tmp/x"}, root)
+
+
+def test_bad_jobs_get_error_records(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "root", os.path.realpath(tmp_path))
+    lines = b"\n".join([
+        b"not json",
+        json.dumps({"id": 1, "op": "extract", "path": "/etc/passwd"}).encode(),
+        json.dumps({"id": 2, "op": "scan", "path": "x", "timeout": "soon"}).encode(),
+        json.dumps({"id": 3, "op": "stats"}).encode(),
+        json.dumps({"id": 4, "op": "scan", "path": "cover.txt", "timeout": None}).encode(),
+    ]) + b"\n"
+    (tmp_path / "cover.txt").write_text("plain text\n")
+    responses = _serve_lines(server, lines)
+    assert len(responses) == 5
+    by_id = {r.get("id"): r for r in responses}
+    assert "Invalid JSON" in by_id[None]["error"]
+    assert "outside the server root" in by_id[1]["error"]
+    assert by_id[2]["ok"] is False
+    assert by_id[3]["ok"] is True
+    assert by_id[4]["ok"] is True and by_id[4]["mimetype"] == "text/plain"
+
+
+def test_unexpected_exception_is_answered(server, monkeypatch):
+    async def broken(job):
+        raise TypeError("boom")
+
+    monkeypatch.setattr(server, "handle", broken)
+    responses = _serve_lines(server, b'{"op": "scan"}\n{"op": "scan"}\n')
+    assert responses == [{"ok": False, "error": "TypeError: boom"}] * 2
+
+
+def test_http_job_is_answered(server):
+    status, response = _post(server, b'{"op": "stats", "id": 1}')
+    assert status == "HTTP/1.1 200 OK" and response["id"] == 1
+    assert _post(server, b'{"op": "stats"}', Host="[::1]:8000")[0] == "HTTP/1.1 200 OK"
+    assert _post(server, b'{"op": "stats"}', Host="localhost")[0] == "HTTP/1.1 200 OK"
+
+
+@pytest.mark.parametrize("headers, status", [
+    ({"Content_Type": "text/plain"}, "415 Unsupported Media Type"),
+    ({"Content_Type": ""}, "415 Unsupported Media Type"),
+    ({"Origin": "http://example.com"}, "403 Forbidden"),
+    ({"Host": "rebind.example.com:8000"}, "403 Forbidden"),
+    ({"Content_Length": "nope"}, "400 Bad Request"),
+    ({"Content_Length": "-5"}, "400 Bad Request"),
+    ({"Content_Length": str(10 ** 12)}, "413 Payload Too Large"),
+])
+def test_http_rejections(server, headers, status):
+    reply_status, response = _post(server, b'{"op": "stats"}', **headers)
+    assert reply_status == f"HTTP/1.1 {status}"
+    assert response["ok"] is False
+
+
+def test_root_defaults_to_cwd(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    server = Server(1)
+    try:
+        assert server.root == os.path.realpath(tmp_path)
+        responses = _serve_lines(server, b'{"id": 1, "op": "scan", "path": "/etc/passwd"}\n')
+        assert "outside the server root" in responses[0]["error"]
+    finally:
+        server.close()
@@ -0,0 +1,112 @@
+# tests/test_sharding.py
+
+from __future__ import annotations
+import os
+import random
+
+import pytest
+
+import unisteg.plugins  # noqa: F401
+from unisteg.cli import main
+from unisteg.compression import compress
+from unisteg.sharding import SHARD_HEADER_SIZE, embed_multi, extract_multi, join, parse_shards, split
+
+
+def _payload(size: int) -> bytes:
+    return random.Random(size).randbytes(size)
+
+
+def _shards(parts):
+    return [shard for part in parts for shard in parse_shards(part)]
+
+
+@pytest.mark.parametrize("size", [1, 5000, 100_000])
+def test_split_join(size):
+    payload = _payload(size)
+    parts = split(payload, [200_000, 50_000, 100_000])
+    assert sum(map(len, parts)) >= size
+    shards = _shards(parts)
+    random.Random(0).shuffle(shards)
+    assert join(shards) == payload
+
+
+def test_split_follows_capacity():
+    parts = split(_payload(60_000), [300_000, 100_000])
+    assert len(parts[0]) > 2 * len(parts[1])
+
+
+@pytest.mark.parametrize("lost", [0, 1, 2, 3])
+def test_parity_survives_losing_one_cover(lost):
+    payload = _payload(70_000)
+    parts = split(payload, [100_000] * 4, parity=True)
+    assert join(_shards(parts[:lost] + parts[lost + 1 :])) == payload
+
+
+def test_losing_two_covers_is_an_error():
+    parts = split(_payload(70_000), [100_000] * 4, parity=True)
+    with pytest.raises(ValueError, match="missing"):
+        join(_shards(parts[2:]))
+
+
+def test_without_parity_any_loss_is_an_error():
+    parts = split(_payload(70_000), [100_000] * 3)
+    with pytest.raises(ValueError, match="missing"):
+        join(_shards(parts[1:]))
+
+
+def test_corrupted_shard_is_detected():
+    parts = split(_payload(10_000), [100_000])
+    damaged = bytearray(parts[0])
+    damaged[SHARD_HEADER_SIZE + 10] ^= 1
+    with pytest.raises(ValueError, match="checksum"):
+        join(parse_shards(bytes(damaged)))
+
+
+def test_too_small_covers():
+    with pytest.raises(ValueError, match="too large"):
+        split(_payload(50_000), [10_000, 10_000])
+    with pytest.raises(ValueError, match="two covers"):
+        split(b"x", [1000], parity=True)
+
+
+def test_embed_multi_names_outputs_by_written_format(image_cover, tmp_path):
+    covers = [image_cover("a.png", size=256), image_cover("b.bmp", size=256, fmt="BMP")]
+    covers.append(image_cover("c.BMP", size=256, fmt="BMP"))
+    payload = _payload(20_000)
+    written = embed_multi(payload, covers, str(tmp_path / "out"), parity=True)
+    outputs = sorted(os.path.basename(output) for _, output, _ in written)
+    assert outputs == ["a.png", "b.png", "c.png"]
+    files = sorted(str(tmp_path / "out" / name) for name in outputs)
+    for path in files:
+        with open(path, "rb") as f:
+            assert f.read(8) == b"\x89PNG\r\n\x1a\n"
+    data, errors = extract_multi(files)
+    assert data == payload and not errors
+    data, errors = extract_multi(files[1:])
+    assert data == payload and not errors
+
+
+def test_embed_multi_refuses_clashing_outputs(image_cover, tmp_path):
+    covers = [image_cover("a.png"), image_cover("a.bmp", fmt="BMP")]
+    with pytest.raises(ValueError, match="distinct"):
+        embed_multi(b"x", covers, str(tmp_path / "out"))
+
+
+def test_compressed_payload_is_decompressed_on_join():
+    text = b"".join(b"row %d of a repetitive payload\n" % i for i in range(5000))
+    data, flags, _ = compress(text, "zlib")
+    shards = _shards(split(data, [20_000, 20_000], parity=True, flags=flags))
+    assert {shard.flags for shard in shards} == {flags}
+    assert join(shards) == text
+
+
+def test_embed_multi_compress(image_cover, wav_cover, tmp_path, capsys):
+    payload = tmp_path / "payload.txt"
+    payload.write_bytes(b"".join(b"row %d of a repetitive payload\n" % i for i in range(3000)))
+    covers = [image_cover("a.png", size=256), wav_cover("b.wav", frames=40_000)]
+    out = tmp_path / "out"
+    assert main(["embed-multi", str(payload), str(out), *covers, "--compress", "zlib"]) == 0
+    assert "Compressed payload with zlib" in capsys.readouterr().out
+    files = [str(out / name) for name in sorted(os.listdir(out))]
+    assert main(["extract-multi", str(tmp_path / "extracted.txt"), *files]) == 0
+    assert (tmp_path / "extracted.txt").read_bytes() == payload.read_bytes()
@@ -0,0 +1,69 @@
+# tests/test_text_lsb.py
+
+from __future__ import annotations
+
+import pytest
+
+from unisteg.plugin_base import FileInfo
+from unisteg.plugins.text_lsb import TextLSBPlugin
+
+PLUGIN = TextLSBPlugin()
+
+
+def _embed(cover: str, payload: bytes, **options) -> str:
+    stego = cover + ".stego.txt"
+    with FileInfo(path=cover, mimetype="text/plain") as info:
+        PLUGIN.embed_to(info, payload, stego, **options)
+    return stego
+
+
+def _extract(path: str, **options) -> bytes:
+    with FileInfo(path=path, mimetype="text/plain") as info:
+        return PLUGIN.extract(info, **options)
+
+
+@pytest.mark.parametrize("algo", ["zw", "ws"])
+@pytest.mark.parametrize("size", [0, 1, 100])
+def test_round_trip(text_cover, algo, size):
+    payload = bytes(range(256))[:size] * (1 + size // 256)
+    stego = _embed(text_cover(), payload, algo=algo)
+    assert _extract(stego, algo=algo) == payload
+    with FileInfo(path=stego, mimetype="text/plain") as info:
+        assert f"Found unisteg {algo} payload header: {len(payload)} bytes." in PLUGIN.scan(info).findings
+
+
+@pytest.mark.parametrize("algo", ["zw", "ws"])
+def test_payload_larger_than_cover_goes_on_last_line(text_cover, algo):
+    payload = b"x" * 500
+    stego = _embed(text_cover(lines=3), payload, algo=algo)
+    assert _extract(stego, algo=algo) == payload
+
+
+def test_crlf_cover(tmp_path):
+    cover = tmp_path / "crlf.txt"
+    cover.write_bytes(b"".join(b"line %d\r\n" % i for i in range(50)))
+    stego = _embed(str(cover), b"hello", algo="ws")
+    assert _extract(stego, algo="ws") == b"hello"
+    assert open(stego, "rb").read().count(b"\r\n") == 50
+
+
+@pytest.mark.parametrize("stray", ["\u200c", "\u200d", "\u200b\u200c\u200d"])
+def test_stray_zero_width_run_is_not_a_payload(tmp_path, stray):
+    cover = tmp_path / "stray.txt"
+    cover.write_text(f"word{stray}\nsecond line\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        _extract(str(cover), algo="zw")
+    with FileInfo(path=str(cover), mimetype="text/plain") as info:
+        assert not any("payload header" in f for f in PLUGIN.scan(info).findings)
+
+
+def test_embed_replaces_stray_zero_width_run(tmp_path):
+    cover = tmp_path / "stray.txt"
+    cover.write_text("".join(f"line {i}\u200d\n" for i in range(40)), encoding="utf-8")
+    stego = _embed(str(cover), b"payload", algo="zw")
+    assert _extract(stego, algo="zw") == b"payload"
+
+
+def test_unknown_algo(text_cover):
+    with pytest.raises(ValueError):
+        _embed(text_cover(), b"x", algo="nope")
@@ -0,0 +1,379 @@
+# unisteg/analysis.py
+
+from __future__ import annotations
+import math
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np  # pip install numpy
+
+# estimated embedding rate above which a channel is reported as suspicious
+DETECTION_THRESHOLD = 0.05
+
+# RS analysis works on horizontal groups of this many values with mask 0110
+RS_GROUP = 4
+
+# default pixel budget for analyze_image(); larger images are tile-sampled
+MAX_SAMPLE = 1 << 18
+
+# SPA uses the trace sets C_0 .. C_{SPA_TRACE_SETS-1}; pairs further apart carry little
+SPA_TRACE_SETS = 1024
+# sample pairs are dealt round robin into this many groups to estimate the SPA error (a power of two)
+SPA_GROUPS = 8
+# standard error above which an SPA estimate says nothing, e.g. when the LSBs are noise anyway
+SPA_MAX_ERROR = 0.1
+# embedding rates the SPA fit is evaluated at before refining the best one; the fit is
+# unconstrained, so the jackknife sees the spread of estimates that fall outside [0, 1]
+_SPA_GRID = np.linspace(-1.0, 2.0, 61)
+
+
+def chi2_sf(x: float, df: int) -> float:
+    """Chi-square survival function (Wilson-Hilferty normal approximation)."""
+    if df <= 0:
+        return 1.0
+    if x <= 0:
+        return 1.0
+    h = 2.0 / (9.0 * df)
+    z = ((x / df) ** (1.0 / 3.0) - (1.0 - h)) / math.sqrt(h)
+    return 0.5 * math.erfc(z / math.sqrt(2.0))
+
+
+def chi_square_pov(hist: np.ndarray) -> float:
+    """Westfeld-Pfitzmann pairs-of-values attack on a value histogram.
+
+    LSB replacement equalises the counts of each pair (2k, 2k+1). Returns the
+    probability of embedding, i.e. how well the histogram fits "equalised pairs".
+    """
+    hist = hist[: hist.size // 2 * 2].astype(np.float64)
+    even, odd = hist[0::2], hist[1::2]
+    expected = (even + odd) / 2.0
+    used = expected > 4  # the test is meaningless for nearly empty bins
+    if used.sum() < 2:
+        return 0.0
+    chi2 = float((((even[used] - expected[used]) ** 2) / expected[used]).sum())
+    return chi2_sf(chi2, int(used.sum()) - 1)
+
+
+def spa_counts(u: np.ndarray, v: np.ndarray, start: int = 0) -> np.ndarray:
+    """Additive sample-pair counts, shape (SPA_GROUPS, 3, SPA_TRACE_SETS); see spa_from_counts().
+
+    Each pair is ordered by value and goes to trace set C_m, m = v//2 - u//2,
+    which LSB embedding never changes. Per trace set the counts are:
+      [0] pairs with difference 2m
+      [1] pairs with difference 2m+1 (for m == 0: difference 1)
+      [2] pairs with difference 2m-1
+    Pair i is dealt to group (start + i) % SPA_GROUPS, for the jackknife error.
+    """
+    u, v = u.ravel(), v.ravel()
+    lo, hi = np.minimum(u, v), np.maximum(u, v)
+    m = (hi >> 1) - (lo >> 1)
+    kind = (hi - lo - 2 * m) % 3  # difference 2m, 2m+1, 2m-1 -> 0, 1, 2
+    start %= SPA_GROUPS
+    group = np.arange(start, start + u.size, dtype=np.int32) & (SPA_GROUPS - 1)
+    # pairs in further trace sets land in one extra column per row, dropped below
+    width = SPA_TRACE_SETS + 1
+    index = (group * 3 + kind) * width + np.minimum(m, SPA_TRACE_SETS)
+    counts = np.bincount(index, minlength=SPA_GROUPS * 3 * width).reshape(SPA_GROUPS, 3, width)
+    return counts[:, :, :SPA_TRACE_SETS]
+
+
+def _spa_terms(counts: np.ndarray) -> np.ndarray:
+    """Coefficients of the per-trace-set equations, shape (8, sets - 1); see spa_from_counts()."""
+    used = np.flatnonzero(counts.sum(axis=0))
+    sets = int(used[-1]) + 2 if used.size else 2  # up to the first empty set after the last used one
+    even, odd_up, odd_down = np.pad(counts, ((0, 0), (0, 1)))[:, :sets].astype(np.float64)
+    e0, e1 = even[:-1], even[1:]
+    u0, u1, d0, d1 = odd_up[:-1], odd_up[1:], odd_down[:-1], odd_down[1:]
+    zero = np.zeros_like(e0)
+    # value coefficients of A = y^2-1, B = (y+1)^2, D = (y-1)^2, P = y^2+1, then their variances
+    terms = np.stack([e0 - e1, u0 - d1, d0 - u1, zero, e0 + e1, u0 + d1, d0 + u1, zero])
+    # C_0 is unordered: all of its odd pairs stand against those of C_1 with difference 1
+    terms[:, 0] = [2 * e0[0] - e1[0], -d1[0], -u1[0], 2 * u0[0], 4 * e0[0] + e1[0], d1[0], u1[0], 4 * u0[0]]
+    # a count of zero still has some variance; without this, equations of sparse
+    # trace sets would drop out exactly at p = 0 and pull the fit there
+    terms[4:7] += 1.0
+    terms[7, 0] += 1.0
+    return terms
+
+
+def _spa_chi2(terms: np.ndarray, rates: np.ndarray) -> np.ndarray:
+    """Variance-weighted sum of squares of the trace-set equations at each rate in `rates`."""
+    y = 1.0 - rates[:, None]
+    basis = np.hstack([y * y - 1.0, (y + 1.0) ** 2, (y - 1.0) ** 2, y * y + 1.0])
+    value = basis @ terms[:4]
+    variance = (basis * basis) @ terms[4:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(variance > 0, value * value / variance, 0.0).sum(axis=1)
+
+
+def _first_minimum(chi2: np.ndarray) -> int:
+    """Index of the first interior local minimum, or 0 if there is none."""
+    minima = np.flatnonzero((chi2[1:-1] <= chi2[:-2]) & (chi2[1:-1] <= chi2[2:])) + 1
+    return int(minima[0]) if minima.size else 0
+
+
+def _spa_fit(terms: np.ndarray) -> float:
+    """The rate p that best satisfies the trace-set equations; NaN if the fit has no minimum.
+
+    Like the smaller root in the original SPA, this is the first local minimum, not
+    the global one: p near 1 also fits once the LSBs are well mixed.
+    """
+    best = _first_minimum(_spa_chi2(terms, _SPA_GRID))
+    if not best:
+        return math.nan
+    step = _SPA_GRID[1] - _SPA_GRID[0]
+    fine = np.linspace(_SPA_GRID[best] - step, _SPA_GRID[best] + step, 21)
+    chi2 = _spa_chi2(terms, fine)
+    best = _first_minimum(chi2) or int(np.argmin(chi2))
+    if 0 < best < fine.size - 1:
+        # vertex of the parabola through the minimum and its neighbours
+        left, mid, right = chi2[best - 1 : best + 2]
+        curve = left - 2 * mid + right
+        if curve > 0:
+            return float(fine[best] + 0.5 * (fine[1] - fine[0]) * (left - right) / curve)
+    return float(fine[best])
+
+
+def spa_from_counts(counts: np.ndarray) -> float:
+    """Embedding rate p from summed spa_counts() of shape (3, SPA_TRACE_SETS).
+
+    In a cover, the pairs with an odd difference 2m+1 are assumed to split evenly
+    between those whose smaller value is even (in C_m) and odd (in C_m+1)
+    (Dumitrescu, Wu & Wang). Embedding at rate p mixes the pairs within each
+    trace set in a known way, so every m gives one equation in p; the estimate
+    fits all of them, each weighted by its sampling variance (least squares
+    SPA, after Ker). When the fit has no minimum the estimate is 0.
+    """
+    if not counts.any():
+        return 0.0
+    rate = _spa_fit(_spa_terms(counts))
+    return 0.0 if math.isnan(rate) else _clip(rate)
+
+
+def spa_error(counts: np.ndarray) -> float:
+    """Jackknife standard error of spa_from_counts() over per-group spa_counts(); inf if unknown.
+
+    Where the LSBs are noise in the cover already (loud 16-bit audio), embedding
+    leaves the pair statistics as they were and the error is large.
+    """
+    total = counts.sum(axis=0)
+    if not counts.any(axis=(1, 2)).all():
+        return math.inf
+    fits = np.array([_spa_fit(_spa_terms(total - group)) for group in counts])
+    if np.isnan(fits).any():
+        return math.inf
+    return math.sqrt((SPA_GROUPS - 1) / SPA_GROUPS * float(((fits - fits.mean()) ** 2).sum()))
+
+
+def spa_rate(u: np.ndarray, v: np.ndarray) -> float:
+    """Sample pair analysis embedding-rate estimate.
+
+    `u` and `v` are the first and second values of each sample pair.
+    """
+    return spa_from_counts(spa_counts(u, v).sum(axis=0))
+
+
+def _flip_pos(g: np.ndarray) -> np.ndarray:
+    return g ^ 1
+
+
+def _flip_neg(g: np.ndarray) -> np.ndarray:
+    return ((g + 1) ^ 1) - 1
+
+
+def _rs_counts(g0: np.ndarray, g1: np.ndarray, g2: np.ndarray, g3: np.ndarray) -> tuple:
+    """(R_M - S_M, R_-M - S_-M) as fractions, for mask 0110 and its negation."""
+    outer = np.abs(g1 - g0) + np.abs(g3 - g2)
+    base = outer + np.abs(g2 - g1)
+    result = []
+    for flip in (_flip_pos, _flip_neg):
+        h1, h2 = flip(g1), flip(g2)
+        flipped = np.abs(h1 - g0) + np.abs(h2 - h1) + np.abs(g3 - h2)
+        result.append(int(np.sign(flipped - base).sum()) / g0.size)
+    return tuple(result)
+
+
+def rs_rate(rows: np.ndarray) -> float:
+    """RS analysis (Fridrich, Goljan & Du) embedding-rate estimate.
+
+    `rows` is a 2-D array; groups are formed from horizontally adjacent values.
+    """
+    width = rows.shape[-1] // RS_GROUP * RS_GROUP
+    groups = rows[..., :width].reshape(-1, RS_GROUP)
+    if groups.shape[0] == 0:
+        return 0.0
+    cols = [groups[:, i] for i in range(RS_GROUP)]
+    d0, n0 = _rs_counts(*cols)
+    d1, n1 = _rs_counts(*(c ^ 1 for c in cols))
+    a = 2.0 * (d1 + d0)
+    b = n0 - n1 - d1 - 3.0 * d0
+    c = d0 - n0
+    z = _smaller_root(a, b, c)
+    if z == 0.5:
+        return 1.0
+    return _clip(z / (z - 0.5))
+
+
+def _smaller_root(a: float, b: float, c: float) -> float:
+    if abs(a) < 1e-12:
+        return -c / b if abs(b) > 1e-12 else 0.0
+    disc = b * b - 4.0 * a * c
+    if disc < 0:
+        return -b / (2.0 * a)
+    sq = math.sqrt(disc)
+    roots = ((-b + sq) / (2.0 * a), (-b - sq) / (2.0 * a))
+    return min(roots, key=abs)
+
+
+def _clip(value: float) -> float:
+    return float(min(max(value, 0.0), 1.0))
+
+
+def sample_tiles(pixels: np.ndarray, max_values: int, tile: int = 64, seed: int = 0) -> np.ndarray:
+    """Random subset of `tile`-sized blocks covering about `max_values` pixels.
+
+    Returns a (rows, cols[, channels]) array; small images are returned as-is.
+    Tiles are stacked vertically, so horizontal neighbours stay within a tile.
+    """
+    height, width = pixels.shape[:2]
+    if height * width <= max_values or height < tile or width < tile:
+        return pixels
+    grid_h, grid_w = height // tile, width // tile
+    count = min(grid_h * grid_w, max(1, max_values // (tile * tile)))
+    picks = np.random.default_rng(seed).choice(grid_h * grid_w, size=count, replace=False)
+    blocks = pixels[: grid_h * tile, : grid_w * tile].reshape(
+        grid_h, tile, grid_w, tile, *pixels.shape[2:]
+    )
+    chosen = blocks[picks // grid_w, :, picks % grid_w]  # (count, tile, tile[, c])
+    return chosen.reshape(count * tile, tile, *pixels.shape[2:])
+
+
+@dataclass
+class ChannelReport:
+    name: str
+    chi_square: float
+    rs: float
+    spa: float
+
+    @property
+    def rate(self) -> float:
+        return (self.rs + self.spa) / 2.0
+
+
+@dataclass
+class LSBReport:
+    channels: List[ChannelReport]
+    sampled_fraction: float
+    estimate: float = 0.0
+    confidence: float = 0.0
+
+    def __post_init__(self) -> None:
+        rates = [r for ch in self.channels for r in (ch.rs, ch.spa)]
+        if rates:
+            self.estimate = float(np.median(rates))
+            # share of estimators that agree with the overall verdict
+            verdict = self.estimate > DETECTION_THRESHOLD
+            agree = sum((r > DETECTION_THRESHOLD) == verdict for r in rates)
+            self.confidence = agree / len(rates)
+
+    @property
+    def suspicious(self) -> bool:
+        return self.estimate > DETECTION_THRESHOLD
+
+
+def pov_histogram(values: np.ndarray) -> np.ndarray:
+    """Histogram whose bin 0 holds an even value, as chi_square_pov() expects."""
+    if values.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    base = int(values.min()) & ~1
+    return np.bincount((values - base).ravel())
+
+
+def analyze_plane(name: str, plane: np.ndarray) -> ChannelReport:
+    """Run all three detectors on one 2-D channel plane."""
+    # int32 leaves headroom for the +-1 flips and differences of 8/16-bit values
+    values = plane.astype(np.int32)
+    return ChannelReport(
+        name=name,
+        chi_square=chi_square_pov(pov_histogram(values)),
+        rs=rs_rate(values),
+        spa=spa_rate(values[:, :-1], values[:, 1:]),
+    )
+
+
+def analyze_image(
+    pixels: np.ndarray,
+    channel_names: Optional[List[str]] = None,
+    max_values: int = MAX_SAMPLE,
+    seed: int = 0,
+) -> LSBReport:
+    """Chi-square, RS and SPA analysis of every channel of an image array."""
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None]
+    sample = sample_tiles(pixels, max_values, seed=seed)
+    fraction = sample.shape[0] * sample.shape[1] / max(1, pixels.shape[0] * pixels.shape[1])
+    names = channel_names or [str(i) for i in range(pixels.shape[2])]
+    reports = [analyze_plane(names[c], sample[:, :, c]) for c in range(sample.shape[2])]
+    return LSBReport(channels=reports, sampled_fraction=min(1.0, fraction))
+
+
+def binary_entropy(p: float) -> float:
+    if p <= 0.0 or p >= 1.0:
+        return 0.0
+    return -(p * math.log2(p) + (1.0 - p) * math.log2(1.0 - p))
+
+
+@dataclass
+class StreamStats:
+    """Additive LSB statistics for one channel of a sample stream.
+
+    Blocks are fed through update() one at a time, so arbitrarily long streams
+    are analysed in constant memory; merge() combines segments into totals.
+    `hist` counts the low byte of each sample (the whole sample for 8-bit
+    audio) for the pairs-of-values chi-square.
+    The last sample of a block pairs with the first of the next, and a segment
+    started with `last` set to the previous segment's picks up the pair that
+    straddles them, so merged totals match a single pass over the stream.
+    """
+
+    pairs: int = 0
+    ones: int = 0
+    count: int = 0
+    last: Optional[int] = None
+    counts: np.ndarray = field(default_factory=lambda: np.zeros((SPA_GROUPS, 3, SPA_TRACE_SETS), dtype=np.int64))
+    hist: np.ndarray = field(default_factory=lambda: np.zeros(256, dtype=np.int64))
+
+    def update(self, values: np.ndarray) -> None:
+        if values.size == 0:
+            return
+        stream = values if self.last is None else np.concatenate([[self.last], values])
+        self.counts += spa_counts(stream[:-1], stream[1:], self.pairs)
+        self.pairs += stream.size - 1
+        self.hist += np.bincount((values & 0xFF).ravel(), minlength=256)
+        self.ones += int(np.count_nonzero(values & 1))
+        self.count += values.size
+        self.last = int(values[-1])
+
+    def merge(self, other: "StreamStats") -> None:
+        self.counts += other.counts
+        self.hist += other.hist
+        self.pairs += other.pairs
+        self.ones += other.ones
+        self.count += other.count
+        self.last = other.last
+
+    @property
+    def spa(self) -> float:
+        return spa_from_counts(self.counts.sum(axis=0))
+
+    @property
+    def spa_error(self) -> float:
+        return spa_error(self.counts)
+
+    @property
+    def chi_square(self) -> float:
+        return chi_square_pov(self.hist)
+
+    @property
+    def lsb_entropy(self) -> float:
+        return binary_entropy(self.ones / self.count) if self.count else 0.0
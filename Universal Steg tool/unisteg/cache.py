@@ -0,0 +1,267 @@
+# unisteg/cache.py
+
+from __future__ import annotations
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from .filetype import DETECTOR_VERSION
+
+# evict entries not used for this long, and the least recently used while the database is larger than this
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# size eviction deletes rows in proportion to the excess; pages that deleted rows leave
+# partly filled can take a few more rounds
+_EVICT_ROUNDS = 4
+
+# last-use times are only rewritten when older than this, so hits stay read-only
+_TOUCH_INTERVAL = 24 * 3600
+
+# pending writes are committed in batches of this many files
+_COMMIT_EVERY = 1000
+
+# close() evicts once this many files were stored, and otherwise on about one close in _EVICT_ONE_IN,
+# so short read-mostly runs skip the eviction queries and the vacuum
+_EVICT_AFTER = 1000
+_EVICT_ONE_IN = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER, digest TEXT,
+    mimetype TEXT NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_used ON files (used);
+CREATE TABLE IF NOT EXISTS results (
+    path TEXT NOT NULL REFERENCES files (path) ON DELETE CASCADE,
+    plugin TEXT NOT NULL,
+    version TEXT NOT NULL,
+    findings TEXT NOT NULL,
+    PRIMARY KEY (path, plugin)
+);
+"""
+
+
+def default_cache_path() -> str:
+    if os.environ.get("UNISTEG_CACHE"):
+        return os.environ["UNISTEG_CACHE"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "unisteg", "scan.sqlite")
+
+
+def file_digest(path: str) -> str:
+    h = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@dataclass
+class FileKey:
+    """Identity of a file's contents as far as the cache is concerned."""
+
+    path: str
+    dev: int
+    ino: int
+    size: int
+    mtime_ns: int
+    digest: Optional[str] = None
+
+    @classmethod
+    def of(cls, path: str, hash_content: bool = False) -> "FileKey":
+        st = os.stat(path)
+        return cls(
+            path=os.path.abspath(path),
+            dev=st.st_dev,
+            ino=st.st_ino,
+            size=st.st_size,
+            mtime_ns=st.st_mtime_ns,
+            digest=file_digest(path) if hash_content else None,
+        )
+
+
+class ScanCache:
+    """On-disk cache of plugin scan findings, backed by SQLite.
+
+    An entry is valid while the file's device, inode, size and mtime (and content
+    digest, if hashing is enabled) are unchanged and the plugin's `version` matches.
+    With `refresh`, existing entries are ignored but still overwritten.
+    With `readonly`, nothing is written; scan-dir workers use this and leave
+    storing to the parent process.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        *,
+        refresh: bool = False,
+        readonly: bool = False,
+        hash_content: bool = False,
+        max_age: float = DEFAULT_MAX_AGE,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.path = path or default_cache_path()
+        self.refresh = refresh
+        self.readonly = readonly
+        self.hash_content = hash_content
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+        self._stored = 0
+        self._db: Optional[sqlite3.Connection] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            if self.readonly:
+                uri = "file:" + quote(os.path.abspath(self.path)) + "?mode=ro"
+                self._db = sqlite3.connect(uri, uri=True, timeout=30)
+            else:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._db = sqlite3.connect(self.path, timeout=30)
+            self._db.execute("PRAGMA foreign_keys = ON")
+            if not self.readonly:
+                # lets evict() give freed pages back; databases created without it need one VACUUM
+                if self._db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                    self._db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                    self._db.execute("VACUUM")
+                # WAL lets read-only workers look entries up while the parent writes
+                self._db.execute("PRAGMA journal_mode = WAL")
+                self._db.execute("PRAGMA synchronous = NORMAL")
+                self._db.executescript(_SCHEMA)
+                # cached mimetypes are only as good as the detector that produced them
+                if self._db.execute("PRAGMA user_version").fetchone()[0] != DETECTOR_VERSION:
+                    with self._db:
+                        self._db.execute("DELETE FROM files")
+                        self._db.execute(f"PRAGMA user_version = {DETECTOR_VERSION}")
+        return self._db
+
+    def key(self, path: str) -> FileKey:
+        return FileKey.of(path, self.hash_content)
+
+    def mimetype(self, key: FileKey) -> Optional[str]:
+        """Cached mimetype of the file, or None if it is unknown or has changed."""
+        if self.refresh:
+            return None
+        try:
+            row = self.db.execute(
+                "SELECT dev, ino, size, mtime_ns, digest, mimetype, used FROM files WHERE path = ?",
+                (key.path,),
+            ).fetchone()
+        except sqlite3.OperationalError:  # read-only and not created yet
+            return None
+        if row is None or tuple(row[:4]) != (key.dev, key.ino, key.size, key.mtime_ns):
+            return None
+        if key.digest is not None and row[4] != key.digest:
+            return None
+        if not self.readonly and row[6] < time.time() - _TOUCH_INTERVAL:
+            self.db.execute("UPDATE files SET used = ? WHERE path = ?", (time.time(), key.path))
+            self._written()
+        return row[5]
+
+    def get(self, key: FileKey, name: str, version: str) -> Optional[List[str]]:
+        """Cached findings of one plugin for an unchanged file, counted as a hit or miss."""
+        row = None
+        if not self.refresh:
+            try:
+                row = self.db.execute(
+                    "SELECT findings FROM results JOIN files USING (path)"
+                    " WHERE path = ? AND plugin = ? AND version = ?"
+                    " AND dev = ? AND ino = ? AND size = ? AND mtime_ns = ? AND (? IS NULL OR digest = ?)",
+                    (key.path, name, version, key.dev, key.ino, key.size, key.mtime_ns, key.digest, key.digest),
+                ).fetchone()
+            except sqlite3.OperationalError:
+                pass
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: FileKey, mimetype: str, results: Dict[str, Tuple[str, List[str]]]) -> None:
+        """Store the findings of a file, `results` mapping plugin name to (version, findings).
+
+        Entries of plugins missing from `results` are kept if the file is unchanged.
+        """
+        if self.readonly:
+            return
+        db = self.db
+        row = db.execute(
+            "SELECT dev, ino, size, mtime_ns FROM files WHERE path = ?", (key.path,)
+        ).fetchone()
+        if row is not None and tuple(row) != (key.dev, key.ino, key.size, key.mtime_ns):
+            db.execute("DELETE FROM results WHERE path = ?", (key.path,))
+        db.execute(
+            "INSERT INTO files (path, dev, ino, size, mtime_ns, digest, mimetype, used)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (path) DO UPDATE SET dev = excluded.dev, ino = excluded.ino,"
+            " size = excluded.size, mtime_ns = excluded.mtime_ns, digest = excluded.digest,"
+            " mimetype = excluded.mimetype, used = excluded.used",
+            (key.path, key.dev, key.ino, key.size, key.mtime_ns, key.digest, mimetype, time.time()),
+        )
+        db.executemany(
+            "INSERT OR REPLACE INTO results (path, plugin, version, findings) VALUES (?, ?, ?, ?)",
+            [(key.path, name, version, json.dumps(findings)) for name, (version, findings) in results.items()],
+        )
+        self._stored += 1
+        self._written()
+
+    def _written(self) -> None:
+        self._pending += 1
+        if self._pending >= _COMMIT_EVERY:
+            self.db.commit()
+            self._pending = 0
+
+    def size(self) -> int:
+        """Bytes of database pages in use; free pages waiting to be vacuumed are not counted."""
+        db = self.db
+        pages = db.execute("PRAGMA page_count").fetchone()[0] - db.execute("PRAGMA freelist_count").fetchone()[0]
+        return pages * db.execute("PRAGMA page_size").fetchone()[0]
+
+    def evict(self) -> int:
+        """Drop entries unused for `max_age` seconds, then the least recently used until `max_bytes` is met."""
+        db = self.db
+        removed = db.execute("DELETE FROM files WHERE used < ?", (time.time() - self.max_age,)).rowcount
+        for _ in range(_EVICT_ROUNDS):
+            size = self.size()
+            if size <= self.max_bytes:
+                break
+            (count,) = db.execute("SELECT COUNT(*) FROM files").fetchone()
+            if count == 0:
+                break
+            drop = max(1, -(-(size - self.max_bytes) * count // size))
+            removed += db.execute(
+                "DELETE FROM files WHERE path IN (SELECT path FROM files ORDER BY used LIMIT ?)", (drop,)
+            ).rowcount
+        db.commit()
+        # frees a page per step, and execute() would only take the first
+        db.executescript("PRAGMA incremental_vacuum")
+        return removed
+
+    def close(self) -> None:
+        if self._db is None:
+            return
+        if not self.readonly:
+            if self._stored >= _EVICT_AFTER or random.randrange(_EVICT_ONE_IN) == 0:
+                self.evict()
+            else:
+                self._db.commit()
+        self._db.close()
+        self._db = None
+
+    def __enter__(self) -> "ScanCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -2,99 +2,612 @@
 
 from __future__ import annotations
 import argparse
+import json
+import os
 import sys
+import time
+from fnmatch import fnmatch
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
 
-from .filetype import detect_mimetype
-from .plugin_base import FileInfo, plugins_for_mimetype, get_plugin
+from . import profiling
+from .plugin_base import BasePlugin, FileInfo, plugins_for_mimetype, get_plugin
+from .profiling import phase
 
-# import plugins for side-effect registration
+if TYPE_CHECKING:
+    from .cache import FileKey, ScanCache
+
+# declares the built-in plugins; their modules are imported on first use
 from . import plugins  # noqa: F401
 
 
+def _open_cache(args: argparse.Namespace) -> Optional["ScanCache"]:
+    if args.no_cache:
+        return None
+    from .cache import ScanCache  # sqlite3 is only needed by the scan commands
+
+    return ScanCache(args.cache, refresh=args.refresh, hash_content=args.hash)
+
+
+def _scan_plugins(
+    path: str, cache: Optional["ScanCache"], key: Optional["FileKey"]
+) -> Tuple[str, List[Tuple[BasePlugin, List[str]]], Optional[Dict[str, Tuple[str, List[str]]]]]:
+    """Run every plugin matching `path`, answering from `cache` where it can.
+
+    Returns the mimetype, (plugin, findings) pairs and, if the cache entry for
+    `key` is out of date, the freshly computed {plugin: (version, findings)}.
+    """
+    mtype = None
+    if cache is not None:
+        with phase("cache", path=path):
+            mtype = cache.mimetype(key)
+    stale = mtype is None
+    if mtype is None:
+        with phase("detect", path=path):
+            info = FileInfo.detect(path)
+        mtype = info.mimetype
+    else:
+        info = FileInfo(path=path, mimetype=mtype)
+    results: List[Tuple[BasePlugin, List[str]]] = []
+    fresh: Dict[str, Tuple[str, List[str]]] = {}
+    with info:
+        for plugin in plugins_for_mimetype(mtype):
+            findings = None
+            if cache is not None:
+                with phase("cache", plugin.name, path):
+                    findings = cache.get(key, plugin.name, plugin.version)
+            if findings is None:
+                with phase("scan", plugin.name, path):
+                    findings = plugin.scan(info).findings
+                fresh[plugin.name] = (plugin.version, findings)
+            results.append((plugin, findings))
+    return mtype, results, fresh if cache is not None and (stale or fresh) else None
+
+
 def cmd_scan(args: argparse.Namespace) -> int:
     path = args.file
-    mtype = detect_mimetype(path)
-    info = FileInfo(path=path, mimetype=mtype)
+    cache = _open_cache(args)
+    try:
+        key = cache.key(path) if cache is not None else None
+        mtype, results, fresh = _scan_plugins(path, cache, key)
+        if fresh is not None:
+            cache.put(key, mtype, fresh)
+    finally:
+        if cache is not None:
+            cache.close()
 
     print(f"Detected type: {mtype}")
-    matched = False
-    for plugin in plugins_for_mimetype(info.mimetype):
-        matched = True
-        result = plugin.scan(info)
-        print(f"[{plugin.name}] findings for {result.file}:")
-        for f in result.findings:
+    for plugin, findings in results:
+        print(f"[{plugin.name}] findings for {path}:")
+        for f in findings:
             print(f"  - {f}")
-    if not matched:
+    if not results:
         print("No plugins support this mimetype.")
     return 0
 
 
+def _matches(rel: str, globs: List[str]) -> bool:
+    name = os.path.basename(rel)
+    return any(fnmatch(rel, g) or fnmatch(name, g) for g in globs)
+
+
+def _iter_files(
+    root: str, include: List[str], exclude: List[str], max_size: Optional[int]
+) -> Iterator[str]:
+    for dirpath, dirnames, filenames in os.walk(root):
+        if exclude:
+            dirnames[:] = [
+                d for d in dirnames if not _matches(os.path.relpath(os.path.join(dirpath, d), root), exclude)
+            ]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            rel = os.path.relpath(path, root)
+            if include and not _matches(rel, include):
+                continue
+            if exclude and _matches(rel, exclude):
+                continue
+            if max_size is not None:
+                try:
+                    if os.stat(path).st_size > max_size:
+                        continue
+                except OSError:
+                    continue
+            yield path
+
+
+# read-only cache and profiling recorder of a scan-dir worker process
+_worker_cache: Optional["ScanCache"] = None
+_worker_recorder: Optional[profiling.Recorder] = None
+
+
+def _init_worker(cache_options: Optional[Dict[str, Any]], profile: bool = False) -> None:
+    global _worker_cache, _worker_recorder
+    if profile:
+        _worker_recorder = profiling.Recorder()
+        profiling.add_hook(_worker_recorder)
+    if cache_options is not None:
+        from .cache import ScanCache
+
+        _worker_cache = ScanCache(readonly=True, **cache_options)
+
+
+def _scan_file(path: str, cache: Optional["ScanCache"] = None) -> Tuple[Dict[str, Any], Any, List[Any]]:
+    """Scan one file with every matching plugin; runs inside pool workers.
+
+    Returns the JSONL record, the (key, mimetype, fresh results) for the parent
+    process to store when the cache needs updating, and the profiling metrics
+    recorded in a worker.
+    """
+    cache = cache if cache is not None else _worker_cache
+    record: Dict[str, Any] = {"file": path}
+    update = None
+    try:
+        key = cache.key(path) if cache is not None else None
+        record["size"] = key.size if key is not None else os.stat(path).st_size
+        mtype, results, fresh = _scan_plugins(path, cache, key)
+        record["mimetype"] = mtype
+        record["results"] = {plugin.name: findings for plugin, findings in results}
+        if cache is not None:
+            record["cached"] = fresh is None
+            if fresh is not None:
+                update = (key, mtype, fresh)
+    except Exception as exc:  # one bad file must not stop the sweep
+        record["error"] = f"{type(exc).__name__}: {exc}"
+    metrics = _worker_recorder.drain() if _worker_recorder is not None else []
+    return record, update, metrics
+
+
+def cmd_scan_dir(args: argparse.Namespace) -> int:
+    import multiprocessing
+
+    files = _iter_files(args.directory, args.include, args.exclude, args.max_size)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    cache = _open_cache(args)
+
+    count = errors = total_bytes = 0
+    start = last_report = time.monotonic()
+    pool = None
+    try:
+        if args.workers > 1:
+            cache_options = None
+            if cache is not None:
+                cache.db.commit()  # creates the database before read-only workers open it
+                cache_options = {"path": cache.path, "refresh": cache.refresh, "hash_content": cache.hash_content}
+            pool = multiprocessing.Pool(
+                args.workers, initializer=_init_worker, initargs=(cache_options, profiling.enabled())
+            )
+            results = pool.imap_unordered(_scan_file, files, chunksize=args.chunksize)
+        else:
+            results = (_scan_file(path, cache) for path in files)
+        for record, update, metrics in results:
+            for m in metrics:
+                profiling.emit(m)
+            if cache is not None:
+                if update is not None:
+                    cache.put(*update)
+                if pool is not None:  # workers count lookups in their own copy
+                    fresh = len(update[2]) if update is not None else 0
+                    cache.hits += len(record.get("results", ())) - fresh
+                    cache.misses += fresh
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            count += 1
+            errors += "error" in record
+            total_bytes += record.get("size", 0)
+            now = time.monotonic()
+            if args.progress and now - last_report >= 5:
+                last_report = now
+                print(f"... {count} files, {count / (now - start):.1f} files/s", file=sys.stderr)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if cache is not None:
+            cache.close()
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = max(time.monotonic() - start, 1e-9)
+    print(
+        f"Scanned {count} files ({errors} errors, {total_bytes / 1e6:.1f} MB) in {elapsed:.2f}s: "
+        f"{count / elapsed:.1f} files/s, {total_bytes / 1e6 / elapsed:.1f} MB/s",
+        file=sys.stderr,
+    )
+    if cache is not None:
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses ({cache.path})", file=sys.stderr)
+    return 0
+
+
+def _capacity_file(
+    path: str, plugin: Optional[str] = None, algo: Optional[str] = None, options: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Capacity of one cover per plugin and algo, as a JSONL record; runs inside pool workers."""
+    record: Dict[str, Any] = {"file": path}
+    try:
+        record["size"] = os.stat(path).st_size
+        info = FileInfo.detect(path)
+        mtype = record["mimetype"] = info.mimetype
+        if plugin is not None:
+            chosen = get_plugin(plugin)
+            if chosen is None:
+                raise ValueError(f"Unknown plugin: {plugin}")
+            candidates = [chosen] if mtype in chosen.supported_mimetypes else []
+        else:
+            candidates = plugins_for_mimetype(mtype)
+        capacity: Dict[str, Dict[str, int]] = {}
+        with info:
+            for p in candidates:
+                if algo is None:
+                    algos: List[Optional[str]] = list(p.algos) or [None]  # None: the plugin's default
+                else:
+                    algos = [algo] if not p.algos or algo in p.algos else []
+                for a in algos:
+                    with phase("capacity", p.name, path):
+                        size = p.capacity(info, **({"algo": a} if a is not None else {}), **(options or {}))
+                    if size is None:  # no fixed limit, whatever the algo
+                        break
+                    capacity.setdefault(p.name, {})[a or "default"] = size
+        record["capacity"] = capacity
+    except Exception as exc:  # one bad file must not stop the sweep
+        record["error"] = f"{type(exc).__name__}: {exc}"
+    return record
+
+
+def cmd_capacity(args: argparse.Namespace) -> int:
+    import functools
+    import multiprocessing
+
+    def files() -> Iterator[str]:
+        for path in args.paths:
+            if os.path.isdir(path):
+                yield from _iter_files(path, args.include, args.exclude, None)
+            else:
+                yield path
+
+    options = {"channels": args.channels} if args.channels is not None else {}
+    task = functools.partial(_capacity_file, plugin=args.plugin, algo=args.algo, options=options)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    count = errors = 0
+    start = time.monotonic()
+    pool = None
+    try:
+        if args.workers > 1:
+            pool = multiprocessing.Pool(args.workers)
+            results = pool.imap_unordered(task, files(), chunksize=args.chunksize)
+        else:
+            results = map(task, files())
+        for record in results:
+            out.write(json.dumps(record) + "\n")
+            count += 1
+            errors += "error" in record
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = max(time.monotonic() - start, 1e-9)
+    print(f"Sized {count} files ({errors} errors) in {elapsed:.2f}s: {count / elapsed:.1f} files/s", file=sys.stderr)
+    return 0
+
+
+def _named_plugin(name: str) -> Optional[BasePlugin]:
+    """The plugin called `name`, or None after saying on stderr why there is none."""
+    try:
+        plugin = get_plugin(name)
+    except ValueError as exc:  # declared, but its module cannot be imported
+        print(exc, file=sys.stderr)
+        return None
+    if plugin is None:
+        print(f"Unknown plugin: {name}", file=sys.stderr)
+    return plugin
+
+
 def cmd_embed(args: argparse.Namespace) -> int:
-    plugin = get_plugin(args.plugin)
+    plugin = _named_plugin(args.plugin)
     if plugin is None:
-        print(f"Unknown plugin: {args.plugin}", file=sys.stderr)
         return 1
 
-    mtype = detect_mimetype(args.file)
-    info = FileInfo(path=args.file, mimetype=mtype)
-    payload = Path(args.payload).read_bytes()
+    with phase("detect", path=args.file):
+        info = FileInfo.detect(args.file)
+
+    kwargs = {}
+    if args.compress is not None:
+        from .compression import compress
+
+        if not plugin.records_flags:
+            print(f"Plugin {plugin.name} cannot record the codec of a compressed payload", file=sys.stderr)
+            return 1
+        with phase("compress", path=args.payload):
+            payload, flags, codec = compress(args.payload, args.compress)
+        if codec is not None:
+            kwargs["flags"] = flags
+            print(f"Compressed payload with {codec}: {os.path.getsize(args.payload)} -> {len(payload)} bytes")
+        else:
+            print("Payload does not compress; embedding it as is")
+    else:
+        payload = Path(args.payload).read_bytes()
+    if args.algo is not None:
+        kwargs["algo"] = args.algo
+    if args.channels is not None:
+        kwargs["channels"] = args.channels
+    if args.key is not None:
+        kwargs["key"] = args.key
+    if args.png_level is not None:
+        kwargs["compress_level"] = args.png_level
 
-    out_bytes = plugin.embed(info, payload, algo=args.algo)
-    Path(args.output).write_bytes(out_bytes)
+    with phase("embed", plugin.name, args.file):
+        plugin.embed_to(info, payload, args.output, **kwargs)
     print(f"Wrote stego file to {args.output}")
     return 0
 
 
 def cmd_extract(args: argparse.Namespace) -> int:
-    plugin = get_plugin(args.plugin)
+    plugin = _named_plugin(args.plugin)
     if plugin is None:
-        print(f"Unknown plugin: {args.plugin}", file=sys.stderr)
         return 1
 
-    mtype = detect_mimetype(args.file)
-    info = FileInfo(path=args.file, mimetype=mtype)
+    with phase("detect", path=args.file):
+        info = FileInfo.detect(args.file)
 
     kwargs = {}
+    if args.algo is not None:
+        kwargs["algo"] = args.algo
     if args.length is not None:
         kwargs["length"] = args.length
+    if args.channels is not None:
+        kwargs["channels"] = args.channels
+    if args.key is not None:
+        kwargs["key"] = args.key
+
+    with phase("extract", plugin.name, args.file):
+        data = plugin.extract(info, **kwargs)
+    Path(args.output).write_bytes(data)
+    print(f"Wrote extracted payload to {args.output}")
+    return 0
+
+
+def _lsb_options(args: argparse.Namespace) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {}
+    if args.algo is not None:
+        kwargs["algo"] = args.algo
+    if args.channels is not None:
+        kwargs["channels"] = args.channels
+    if args.key is not None:
+        kwargs["key"] = args.key
+    return kwargs
+
+
+def cmd_embed_multi(args: argparse.Namespace) -> int:
+    from .sharding import embed_multi
+
+    flags = 0
+    if args.compress is not None:
+        from .compression import compress
+
+        with phase("compress", path=args.payload):
+            payload, flags, codec = compress(args.payload, args.compress)
+        if codec is not None:
+            print(f"Compressed payload with {codec}: {os.path.getsize(args.payload)} -> {len(payload)} bytes")
+        else:
+            print("Payload does not compress; embedding it as is")
+    else:
+        payload = Path(args.payload).read_bytes()
+    kwargs = _lsb_options(args)
+    if args.png_level is not None:
+        kwargs["compress_level"] = args.png_level
+
+    with phase("embed"):
+        written = embed_multi(
+            payload,
+            args.covers,
+            args.outdir,
+            plugin=args.plugin,
+            parity=args.parity,
+            workers=args.workers,
+            flags=flags,
+            **kwargs,
+        )
+    for cover, output, size in written:
+        print(f"Wrote {size} shard bytes from {cover} to {output}")
+    print(f"Spread {len(payload)} bytes over {len(written)} of {len(args.covers)} covers")
+    return 0
 
-    data = plugin.extract(info, algo=args.algo, **kwargs)
+
+def cmd_extract_multi(args: argparse.Namespace) -> int:
+    from .sharding import extract_multi
+
+    with phase("extract"):
+        data, errors = extract_multi(args.files, plugin=args.plugin, workers=args.workers, **_lsb_options(args))
+    for path, error in errors.items():
+        print(f"No shards from {path}: {error}", file=sys.stderr)
     Path(args.output).write_bytes(data)
     print(f"Wrote extracted payload to {args.output}")
     return 0
 
 
+def cmd_serve(args: argparse.Namespace) -> int:
+    from .server import serve
+
+    try:
+        serve(
+            args.workers,
+            socket_path=args.socket,
+            host=args.host,
+            port=args.port,
+            queue_size=args.queue_size,
+            batch_size=args.batch_size,
+            timeout=args.timeout,
+            cache=_open_cache(args),
+            root=args.root,
+        )
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+    return 0
+
+
+def _add_cache_args(p: argparse.ArgumentParser) -> None:
+    p.add_argument("--cache", help="Scan cache database (default: $UNISTEG_CACHE or ~/.cache/unisteg)")
+    p.add_argument("--no-cache", action="store_true", help="Neither read nor write the scan cache")
+    p.add_argument("--refresh", action="store_true", help="Ignore cached findings but store new ones")
+    p.add_argument("--hash", action="store_true", help="Also require an unchanged content hash for cache hits")
+
+
 def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(prog="unisteg", description="Universal Steganography CLI")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print wall/CPU time, bytes read and peak memory per phase and plugin on stderr",
+    )
+    parser.add_argument("--pstats", metavar="FILE", help="Also write cProfile statistics to FILE")
     sub = parser.add_subparsers(dest="command", required=True)
 
     p_scan = sub.add_parser("scan", help="Scan a file for steganography indicators")
     p_scan.add_argument("file")
+    _add_cache_args(p_scan)
     p_scan.set_defaults(func=cmd_scan)
 
+    p_scan_dir = sub.add_parser("scan-dir", help="Recursively scan a directory tree, emitting JSONL")
+    p_scan_dir.add_argument("directory")
+    p_scan_dir.add_argument("-o", "--output", help="Write JSONL here instead of stdout")
+    p_scan_dir.add_argument(
+        "-j", "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: all cores)"
+    )
+    p_scan_dir.add_argument("--include", action="append", default=[], help="Only scan matching paths")
+    p_scan_dir.add_argument("--exclude", action="append", default=[], help="Skip matching paths")
+    p_scan_dir.add_argument("--max-size", type=int, help="Skip files larger than this many bytes")
+    p_scan_dir.add_argument("--chunksize", type=int, default=16, help="Files handed to a worker at a time")
+    p_scan_dir.add_argument("--progress", action="store_true", help="Report progress on stderr")
+    _add_cache_args(p_scan_dir)
+    p_scan_dir.set_defaults(func=cmd_scan_dir)
+
+    p_capacity = sub.add_parser("capacity", help="Report cover capacity per plugin and algo as JSONL, from headers")
+    p_capacity.add_argument("paths", nargs="+", help="Cover files or directories to walk")
+    p_capacity.add_argument("-o", "--output", help="Write JSONL here instead of stdout")
+    p_capacity.add_argument("--plugin", help="Only this plugin (default: all that know their capacity)")
+    p_capacity.add_argument("--algo", help="Only this algorithm (default: every algorithm of each plugin)")
+    p_capacity.add_argument("--channels", help="Comma-separated carrier channels")
+    p_capacity.add_argument(
+        "-j", "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: all cores)"
+    )
+    p_capacity.add_argument("--include", action="append", default=[], help="Only size matching paths")
+    p_capacity.add_argument("--exclude", action="append", default=[], help="Skip matching paths")
+    p_capacity.add_argument("--chunksize", type=int, default=64, help="Files handed to a worker at a time")
+    p_capacity.set_defaults(func=cmd_capacity)
+
     p_embed = sub.add_parser("embed", help="Embed payload into cover file")
     p_embed.add_argument("file", help="Cover file path")
     p_embed.add_argument("payload", help="Payload file path")
     p_embed.add_argument("output", help="Output stego file path")
     p_embed.add_argument("--plugin", default="image_lsb", help="Plugin name (e.g. image_lsb, audio_lsb)")
-    p_embed.add_argument("--algo", default="lsb1", help="Algorithm inside plugin")
+    p_embed.add_argument("--algo", help="Algorithm inside plugin (default: the plugin's own)")
+    p_embed.add_argument(
+        "--channels", help="Comma-separated carrier channels (e.g. 0,1 for audio_lsb, R,G,B,A for image_lsb)"
+    )
+    p_embed.add_argument(
+        "--png-level", type=int, choices=range(10), metavar="0-9", help="zlib level of PNG outputs (1 is fastest)"
+    )
+    p_embed.add_argument("--key", help="Scatter the payload over key-derived positions (LSB plugins)")
+    p_embed.add_argument(
+        "--compress",
+        choices=["auto", "zlib", "lzma", "zstd"],
+        help="Compress the payload first; auto samples it to pick a codec (extract undoes it)",
+    )
     p_embed.set_defaults(func=cmd_embed)
 
     p_extract = sub.add_parser("extract", help="Extract payload from stego file")
     p_extract.add_argument("file", help="Stego file path")
     p_extract.add_argument("output", help="Output payload file path")
     p_extract.add_argument("--plugin", default="image_lsb", help="Plugin name")
-    p_extract.add_argument("--algo", default="lsb1", help="Algorithm inside plugin")
-    p_extract.add_argument("--length", type=int, help="Payload length in bytes (for LSB/append demos)")
+    p_extract.add_argument("--algo", help="Algorithm inside plugin (default: the plugin's own)")
+    p_extract.add_argument("--channels", help="Comma-separated carrier channels used at embed time")
+    p_extract.add_argument("--key", help="Key used at embed time")
+    p_extract.add_argument("--length", type=int, help="Raw payload length in bytes (only for headerless payloads)")
     p_extract.set_defaults(func=cmd_extract)
 
+    p_embed_multi = sub.add_parser("embed-multi", help="Spread a payload's shards over several covers")
+    p_embed_multi.add_argument("payload", help="Payload file path")
+    p_embed_multi.add_argument(
+        "outdir", help="Directory for the stego files (named like their covers, with the output format's extension)"
+    )
+    p_embed_multi.add_argument("covers", nargs="+", help="Cover file paths")
+    p_embed_multi.add_argument("--plugin", help="Plugin for every cover (default: by file type)")
+    p_embed_multi.add_argument("--algo", help="Algorithm inside plugin (default: the plugin's own)")
+    p_embed_multi.add_argument("--channels", help="Comma-separated carrier channels")
+    p_embed_multi.add_argument(
+        "--png-level", type=int, choices=range(10), metavar="0-9", help="zlib level of PNG outputs (1 is fastest)"
+    )
+    p_embed_multi.add_argument("--key", help="Scatter each shard set over key-derived positions")
+    p_embed_multi.add_argument(
+        "--parity", action="store_true", help="Add XOR parity shards so any one cover can be lost"
+    )
+    p_embed_multi.add_argument(
+        "--compress",
+        choices=["auto", "zlib", "lzma", "zstd"],
+        help="Compress the payload before splitting it; auto samples it to pick a codec (extract-multi undoes it)",
+    )
+    p_embed_multi.add_argument(
+        "-j", "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: all cores)"
+    )
+    p_embed_multi.set_defaults(func=cmd_embed_multi)
+
+    p_extract_multi = sub.add_parser("extract-multi", help="Reassemble a payload from shards in several files")
+    p_extract_multi.add_argument("output", help="Output payload file path")
+    p_extract_multi.add_argument("files", nargs="+", help="Stego file paths, in any order")
+    p_extract_multi.add_argument("--plugin", help="Plugin for every file (default: try those for the file type)")
+    p_extract_multi.add_argument("--algo", help="Algorithm inside plugin (default: the plugin's own)")
+    p_extract_multi.add_argument("--channels", help="Comma-separated carrier channels used at embed time")
+    p_extract_multi.add_argument("--key", help="Key used at embed time")
+    p_extract_multi.add_argument(
+        "-j", "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: all cores)"
+    )
+    p_extract_multi.set_defaults(func=cmd_extract_multi)
+
+    p_serve = sub.add_parser("serve", help="Answer scan/embed/extract jobs over a socket with warm workers")
+    p_serve.add_argument("--socket", help="Listen on this Unix socket instead of TCP")
+    p_serve.add_argument(
+        "--host", default="127.0.0.1", help="TCP address to listen on, loopback only (default: 127.0.0.1)"
+    )
+    p_serve.add_argument("--port", type=int, default=8765, help="TCP port to listen on (default: 8765)")
+    p_serve.add_argument(
+        "-j", "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes (default: all cores)"
+    )
+    p_serve.add_argument("--queue-size", type=int, default=256, help="Jobs queued or running before reads stop")
+    p_serve.add_argument("--batch-size", type=int, default=8, help="Queued jobs handed to a worker at a time")
+    p_serve.add_argument("--timeout", type=float, default=60.0, help="Default per-job timeout in seconds")
+    p_serve.add_argument(
+        "--root", default=os.getcwd(), help="Only read and write job files inside this directory (default: cwd)"
+    )
+    _add_cache_args(p_serve)
+    p_serve.set_defaults(func=cmd_serve)
+
     return parser
 
 
+def _run_profiled(args: argparse.Namespace) -> int:
+    recorder = profiling.Recorder()
+    profiling.add_hook(recorder)
+    profiler = None
+    if args.pstats:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    try:
+        with phase("total"):
+            return profiler.runcall(args.func, args) if profiler is not None else args.func(args)
+    finally:
+        profiling.remove_hook(recorder)
+        if profiler is not None:
+            profiler.dump_stats(args.pstats)
+        print(recorder.format_table(), file=sys.stderr)
+
+
 def main(argv: list[str] | None = None) -> int:
     parser = build_parser()
     args = parser.parse_args(argv)
+    if args.profile or args.pstats:
+        return _run_profiled(args)
     return args.func(args)
 
 
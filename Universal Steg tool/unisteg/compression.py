@@ -0,0 +1,217 @@
+# unisteg/compression.py
+"""Optional compression of payloads before they are embedded.
+
+The codec goes into the low bits of the payload header flags
+(framing.FLAG_CODEC_MASK), so extraction undoes it without being told. Data
+passes through the codecs CHUNK bytes at a time, and a payload file is read
+the same way, so it is never held in memory both raw and compressed.
+Extraction refuses to inflate a payload past max_output() of its embedded
+size, so a crafted one cannot exhaust memory.
+"""
+
+from __future__ import annotations
+import zlib
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from .framing import FLAG_CODEC_MASK
+
+# codec name -> id stored in the header flags
+CODECS: Dict[str, int] = {"zlib": 1, "lzma": 2, "zstd": 3}
+
+CHUNK = 1 << 20
+
+# "auto" compresses this much from the start, middle and end of the payload with each codec
+SAMPLE_SIZE = 64 * 1024
+# and keeps the payload as is unless the best codec gets the samples below this ratio
+AUTO_MAX_RATIO = 0.9
+# otherwise it takes the fastest codec whose output is within this factor of the smallest
+AUTO_SLACK = 1.1
+# fastest first
+_SPEED_ORDER = ("zstd", "zlib", "lzma")
+
+# payloads decompress to at most this many times their embedded size (deflate cannot
+# exceed about 1032), or MIN_OUTPUT bytes for small ones
+MAX_RATIO = 1032
+MIN_OUTPUT = 64 << 20
+
+# input fed at a time to decompressors without a max_length argument (zstandard's)
+_UNBOUNDED_INPUT = 1024
+
+
+def _zstd() -> Optional[Tuple[Callable[[], Any], Callable[[], Any]]]:
+    """(compressor, decompressor) factories from whichever zstd module is installed, if any."""
+    try:
+        from compression import zstd  # Python 3.14+
+
+        return zstd.ZstdCompressor, zstd.ZstdDecompressor
+    except ImportError:
+        pass
+    try:
+        import zstandard  # pip install zstandard
+    except ImportError:
+        return None
+    return zstandard.ZstdCompressor().compressobj, zstandard.ZstdDecompressor().decompressobj
+
+
+def available() -> List[str]:
+    return [name for name in CODECS if name != "zstd" or _zstd() is not None]
+
+
+def _codec(name: str) -> Tuple[Callable[[], Any], Callable[[], Any]]:
+    if name == "zlib":
+        return zlib.compressobj, zlib.decompressobj
+    if name == "lzma":
+        import lzma
+
+        return lzma.LZMACompressor, lzma.LZMADecompressor
+    if name == "zstd":
+        factories = _zstd()
+        if factories is None:
+            raise ValueError("zstd needs Python 3.14 or the zstandard package (pip install zstandard)")
+        return factories
+    raise ValueError(f"Unknown compression codec: {name} (expected one of auto, {', '.join(CODECS)})")
+
+
+def compress_chunks(chunks: Iterable[bytes], name: str) -> Iterator[bytes]:
+    compressor = _codec(name)[0]()
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+def max_output(length: int) -> int:
+    """Largest decompressed size accepted for a payload embedded as `length` bytes."""
+    return max(MIN_OUTPUT, MAX_RATIO * length)
+
+
+def _pieces(decompressor: Any, chunk: bytes, size: int) -> Iterator[bytes]:
+    """Output of `decompressor` for `chunk`, at most `size` bytes at a time."""
+    if hasattr(decompressor, "unconsumed_tail"):  # zlib
+        while True:
+            out = decompressor.decompress(chunk, size)
+            yield out
+            chunk = decompressor.unconsumed_tail
+            if decompressor.eof or (not chunk and len(out) < size):
+                return
+    if hasattr(decompressor, "needs_input"):  # lzma, compression.zstd
+        while True:
+            out = decompressor.decompress(chunk, size)
+            yield out
+            chunk = b""
+            if decompressor.eof or (decompressor.needs_input and len(out) < size):
+                return
+    view = memoryview(chunk)
+    for start in range(0, len(view), _UNBOUNDED_INPUT):
+        yield decompressor.decompress(view[start : start + _UNBOUNDED_INPUT])
+
+
+def decompress_chunks(chunks: Iterable[bytes], name: str, limit: Optional[int] = None) -> Iterator[bytes]:
+    """Decompressed data in pieces; ValueError once it would grow past `limit` bytes."""
+    decompressor = _codec(name)[1]()
+    total = 0
+    for chunk in chunks:
+        # one byte past the limit is enough to tell it was exceeded
+        size = CHUNK if limit is None else min(CHUNK, limit - total + 1)
+        for out in _pieces(decompressor, chunk, size):
+            total += len(out)
+            if limit is not None and total > limit:
+                raise ValueError(f"{name} payload decompresses to more than {limit} bytes")
+            if out:
+                yield out
+    flush = getattr(decompressor, "flush", None)  # only zlib buffers output until the end
+    if flush is not None:
+        out = flush()
+        if limit is not None and total + len(out) > limit:
+            raise ValueError(f"{name} payload decompresses to more than {limit} bytes")
+        yield out
+    if not getattr(decompressor, "eof", True):
+        raise ValueError(f"Truncated {name} payload")
+
+
+def _chunks(source: Union[str, bytes]) -> Iterator[bytes]:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for start in range(0, len(view), CHUNK):
+            yield view[start : start + CHUNK]
+        return
+    with open(source, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK)
+            if not chunk:
+                return
+            yield chunk
+
+
+def _sample(source: Union[str, bytes]) -> bytes:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        if len(view) <= 3 * SAMPLE_SIZE:
+            return bytes(view)
+        middle = (len(view) - SAMPLE_SIZE) // 2
+        return b"".join([view[:SAMPLE_SIZE], view[middle : middle + SAMPLE_SIZE], view[-SAMPLE_SIZE:]])
+    with open(source, "rb") as f:
+        size = f.seek(0, 2)
+        if size <= 3 * SAMPLE_SIZE:
+            f.seek(0)
+            return f.read()
+        parts = []
+        for offset in (0, (size - SAMPLE_SIZE) // 2, size - SAMPLE_SIZE):
+            f.seek(offset)
+            parts.append(f.read(SAMPLE_SIZE))
+        return b"".join(parts)
+
+
+def choose(sample: bytes) -> Optional[str]:
+    """Codec "auto" picks for a payload that `sample` represents, or None to store it as is."""
+    if not sample:
+        return None
+    sizes = {name: sum(map(len, compress_chunks([sample], name))) for name in available()}
+    smallest = min(sizes.values())
+    if smallest > AUTO_MAX_RATIO * len(sample):
+        return None
+    return next(name for name in _SPEED_ORDER if name in sizes and sizes[name] <= AUTO_SLACK * smallest)
+
+
+def compress(source: Union[str, bytes], codec: str) -> Tuple[bytes, int, Optional[str]]:
+    """Payload bytes to embed, header flags and the codec used, for a payload file path or bytes.
+
+    `codec` is "auto" or a CODECS name. The payload is kept as is (flags 0,
+    codec None) when compression would not make it smaller.
+    """
+    name = choose(_sample(source)) if codec == "auto" else codec
+    if name is not None:
+        data = b"".join(compress_chunks(_chunks(source), name))
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            raw_size = len(source)
+        else:
+            with open(source, "rb") as f:
+                raw_size = f.seek(0, 2)
+        if raw_size > max_output(len(data)):
+            # extraction would refuse this ratio; deflate stays within it
+            name = "zlib"
+            data = b"".join(compress_chunks(_chunks(source), name))
+        if len(data) < raw_size:
+            return data, CODECS[name], name
+    return b"".join(_chunks(source)), 0, None
+
+
+def codec_name(flags: int) -> Optional[str]:
+    codec = flags & FLAG_CODEC_MASK
+    if not codec:
+        return None
+    return next(name for name, value in CODECS.items() if value == codec)
+
+
+def decompress(flags: int, data: bytes, limit: Optional[int] = None) -> bytes:
+    """Undo the compression recorded in header `flags`, refusing output beyond `limit` (default: max_output())."""
+    name = codec_name(flags)
+    if name is None:
+        return data
+    try:
+        return b"".join(decompress_chunks(_chunks(data), name, max_output(len(data)) if limit is None else limit))
+    except ValueError:
+        raise
+    except Exception as exc:  # zlib.error, lzma.LZMAError, ZstdError
+        raise ValueError(f"Corrupt {name} payload: {exc}") from None
@@ -0,0 +1,228 @@
+# unisteg/containers.py
+
+from __future__ import annotations
+import mmap
+import re
+import struct
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, BinaryIO, Iterator, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from .plugin_base import FileInfo
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# a JPEG marker inside entropy-coded data: 0xFF not followed by stuffing (0x00),
+# a restart marker (0xD0-0xD7) or another fill byte
+_JPEG_MARKER = re.compile(rb"\xff[^\x00\xd0-\xd7\xff]")
+_JPEG_STANDALONE = {0x01, *range(0xD0, 0xD8)}
+
+
+def png_end(f: BinaryIO, size: int) -> Optional[int]:
+    """Offset just past the IEND chunk, found by seeking over chunk lengths.
+
+    Returns None if the chunk chain is broken before IEND.
+    """
+    pos = len(PNG_SIGNATURE)
+    while pos + 12 <= size:
+        f.seek(pos)
+        length, ctype = struct.unpack(">I4s", f.read(8))
+        pos += 12 + length  # length, type, data, crc
+        if ctype == b"IEND":
+            return pos if pos <= size else None
+    return None
+
+
+def jpeg_end(data: Union[bytes, mmap.mmap]) -> Optional[int]:
+    """Offset just past the EOI marker, walking segments and entropy-coded scans.
+
+    Segment bodies are skipped by their length fields; only scan data is searched,
+    and only for the next real marker.
+    """
+    size = len(data)
+    pos = 2
+    while pos + 2 <= size:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0xD9:
+            return pos + 2
+        if marker in _JPEG_STANDALONE:
+            pos += 2
+            continue
+        if pos + 4 > size:
+            return None
+        (length,) = struct.unpack(">H", data[pos + 2 : pos + 4])
+        pos += 2 + length
+        if marker == 0xDA:  # start of scan: entropy-coded data runs to the next marker
+            match = _JPEG_MARKER.search(data, pos)
+            if match is None:
+                return None
+            pos = match.start()
+    return None
+
+
+def bmp_end(head: bytes, size: int) -> Optional[int]:
+    """File size declared in the BMP header, if it is plausible."""
+    if len(head) < 6 or head[:2] != b"BM":
+        return None
+    (declared,) = struct.unpack("<I", head[2:6])
+    return declared if 14 <= declared <= size else None
+
+
+# file header and the smallest DIB header (BITMAPINFOHEADER) Windows writes
+BMP_HEADER_SIZE = 54
+
+
+def bmp_header(head: bytes) -> Optional[Tuple[int, int, int, int]]:
+    """(width, height, bits per pixel, compression) from the BMP file and DIB headers."""
+    if len(head) < 26 or head[:2] != b"BM":
+        return None
+    (dib_size,) = struct.unpack_from("<I", head, 14)
+    if dib_size == 12:  # OS/2 BITMAPCOREHEADER
+        width, height, _, bits = struct.unpack_from("<HHHH", head, 18)
+        return width, height, bits, 0
+    if dib_size < 40 or len(head) < 34:
+        return None
+    width, height, _, bits, compression = struct.unpack_from("<iiHHI", head, 18)
+    return width, abs(height), bits, compression  # negative height: rows stored top down
+
+
+@dataclass
+class Chunk:
+    """A RIFF chunk or ID3v2 frame: where its header starts and how big its body is."""
+
+    id: bytes
+    offset: int
+    size: int
+    header_size: int
+    # form type of RIFF LIST chunks (b"INFO", b"adtl", ...)
+    list_type: Optional[bytes] = None
+
+    @property
+    def body(self) -> int:
+        return self.offset + self.header_size
+
+    @property
+    def end(self) -> int:
+        return self.body + self.size
+
+
+def riff_end(head: bytes, size: int) -> int:
+    """Offset where the RIFF chunk ends, by its declared size if that is plausible."""
+    (declared,) = struct.unpack_from("<I", head, 4)
+    return 8 + declared if 4 <= declared <= size - 8 else size
+
+
+def riff_chunks(f: BinaryIO, size: int) -> Iterator[Chunk]:
+    """Top-level chunks of a RIFF file, found by seeking over their headers.
+
+    Bodies are not read; a truncated last chunk is clipped to the end of the file.
+    """
+    f.seek(0)
+    head = f.read(12)
+    if len(head) < 12 or head[:4] != b"RIFF":
+        return
+    pos, end = 12, riff_end(head, size)
+    while pos + 8 <= end:
+        f.seek(pos)
+        cid, length = struct.unpack("<4sI", f.read(8))
+        length = min(length, end - pos - 8)
+        list_type = f.read(4) if cid == b"LIST" and length >= 4 else None
+        yield Chunk(cid, pos, length, 8, list_type)
+        pos += 8 + length + (length & 1)  # chunk bodies are word aligned
+
+
+def riff_chunk(info: "FileInfo", fourcc: bytes) -> Optional[Tuple[int, int]]:
+    """(offset, size) of the body of the first top-level RIFF chunk `fourcc`."""
+    if info.head(4) != b"RIFF":
+        return None
+    with open(info.path, "rb") as f:
+        for chunk in riff_chunks(f, info.size):
+            if chunk.id == fourcc:
+                return chunk.body, chunk.size
+    return None
+
+
+ID3_HEADER_SIZE = 10
+# tag header flags
+ID3_UNSYNCHRONISED = 0x80
+ID3_EXTENDED_HEADER = 0x40
+ID3_FOOTER = 0x10
+
+_ID3_FRAME_ID = re.compile(rb"[A-Z0-9]+")
+
+
+@dataclass
+class ID3Tag:
+    version: int  # major version: 2, 3 or 4
+    flags: int
+    size: int  # of everything after the 10-byte header: frames, padding, extended header
+    frames_offset: int  # where the first frame starts
+
+    @property
+    def end(self) -> int:
+        return ID3_HEADER_SIZE + self.size
+
+
+def syncsafe(value: int) -> bytes:
+    """`value` (< 2**28) as four bytes of 7 bits each, as ID3v2 sizes are stored."""
+    return bytes((value >> shift) & 0x7F for shift in (21, 14, 7, 0))
+
+
+def _from_syncsafe(data: bytes) -> int:
+    return (data[0] & 0x7F) << 21 | (data[1] & 0x7F) << 14 | (data[2] & 0x7F) << 7 | (data[3] & 0x7F)
+
+
+def id3v2_tag(head: bytes) -> Optional[ID3Tag]:
+    """The ID3v2 tag at the start of a file, from its first ID3_HEADER_SIZE + 4 bytes."""
+    if len(head) < ID3_HEADER_SIZE or head[:3] != b"ID3" or head[3] not in (2, 3, 4):
+        return None
+    if any(b & 0x80 for b in head[6:10]):
+        return None
+    version, flags = head[3], head[5]
+    tag = ID3Tag(version, flags, _from_syncsafe(head[6:10]), ID3_HEADER_SIZE)
+    if flags & ID3_EXTENDED_HEADER and version > 2 and len(head) >= ID3_HEADER_SIZE + 4:
+        ext = head[ID3_HEADER_SIZE : ID3_HEADER_SIZE + 4]
+        # v2.3 counts the size field out, v2.4 counts it in
+        tag.frames_offset += _from_syncsafe(ext) if version == 4 else 4 + struct.unpack(">I", ext)[0]
+    return tag
+
+
+def id3_frames(f: BinaryIO, tag: ID3Tag) -> Iterator[Chunk]:
+    """Frames of an ID3v2 tag, read header by header up to the padding."""
+    id_size, header_size = (3, 6) if tag.version == 2 else (4, 10)
+    pos = tag.frames_offset
+    while pos + header_size <= tag.end:
+        f.seek(pos)
+        header = f.read(header_size)
+        fid = header[:id_size]
+        if len(header) < header_size or not _ID3_FRAME_ID.fullmatch(fid):
+            return  # padding, or not a frame
+        if tag.version == 2:
+            size = int.from_bytes(header[3:6], "big")
+        elif tag.version == 3:
+            size = struct.unpack(">I", header[4:8])[0]
+        else:
+            size = _from_syncsafe(header[4:8])
+        if pos + header_size + size > tag.end:
+            return
+        yield Chunk(fid, pos, size, header_size)
+        pos += header_size + size
+
+
+def container_end(info: "FileInfo") -> Optional[int]:
+    """Offset where the image container ends; anything after it is trailing data."""
+    if info.mimetype == "image/png":
+        if info.head(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+            return None
+        with open(info.path, "rb") as f:
+            return png_end(f, info.size)
+    if info.mimetype == "image/jpeg":
+        return jpeg_end(info.buffer())
+    if info.mimetype == "image/bmp":
+        return bmp_end(info.head(6), info.size)
+    return None
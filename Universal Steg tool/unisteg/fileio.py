@@ -0,0 +1,74 @@
+# unisteg/fileio.py
+
+from __future__ import annotations
+import io
+import os
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Union
+
+# Where embed_to() writes its output: a path or an open binary file object.
+Sink = Union[str, "os.PathLike[str]", BinaryIO]
+
+# user-space copy chunk when the kernel cannot copy between the two files
+COPY_CHUNK = 1024 * 1024
+
+
+@contextmanager
+def open_sink(dest: Sink) -> Iterator[BinaryIO]:
+    """Yield a writable binary file for `dest`, closing it only if we opened it."""
+    if hasattr(dest, "write"):
+        yield dest  # type: ignore[misc]
+        return
+    with open(dest, "wb") as f:
+        yield f
+
+
+def _kernel_copy(in_fd: int, out_fd: int, offset: int, count: int) -> int:
+    """Copy with copy_file_range/sendfile; returns how many bytes were copied."""
+    copied = 0
+    for copy in (_copy_file_range, _sendfile):
+        try:
+            while copied < count:
+                n = copy(in_fd, out_fd, offset + copied, count - copied)
+                if n == 0:
+                    return copied
+                copied += n
+            return copied
+        except (AttributeError, OSError):
+            continue  # not available here, or not between these two files
+    return copied
+
+
+def _copy_file_range(in_fd: int, out_fd: int, offset: int, count: int) -> int:
+    return os.copy_file_range(in_fd, out_fd, count, offset_src=offset)  # type: ignore[attr-defined]
+
+
+def _sendfile(in_fd: int, out_fd: int, offset: int, count: int) -> int:
+    return os.sendfile(out_fd, in_fd, offset, count)
+
+
+def copy_into(src: str, dst: BinaryIO, offset: int = 0, count: Optional[int] = None) -> None:
+    """Write `count` bytes of `src` starting at `offset` (default: to EOF) to `dst`.
+
+    When `dst` is a real file the data never enters user space.
+    """
+    with open(src, "rb") as f:
+        if count is None:
+            count = os.fstat(f.fileno()).st_size - offset
+        try:
+            out_fd = dst.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            out_fd = None
+        if out_fd is not None:
+            dst.flush()
+            copied = _kernel_copy(f.fileno(), out_fd, offset, count)
+            offset += copied
+            count -= copied
+
+        f.seek(offset)
+        while count > 0:
+            chunk = f.read(min(COPY_CHUNK, count))
+            if not chunk:
+                break
+            dst.write(chunk)
+            count -= len(chunk)
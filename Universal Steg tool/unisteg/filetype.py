@@ -2,40 +2,117 @@
 
 from __future__ import annotations
 import mimetypes
+import re
+import struct
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
+# bump when detection results change; the scan cache then drops its entries
+DETECTOR_VERSION = 2
 
-_MAGIC_MAP = {
-    b"\x89PNG\r\n\x1a\n": "image/png",
-    b"\xff\xd8\xff": "image/jpeg",
-    b"BM": "image/bmp",
-    b"RIFF": "audio/wav",
-}
+# bytes read from the start of a file; signatures and the text sniff look only at these
+DETECT_SIZE = 4096
+# size of the ID3v1 tag peeked at the end of files nothing else identifies
+ID3V1_SIZE = 128
 
+_RIFF_TYPES = {b"WAVE": "audio/wav", b"WEBP": "image/webp", b"AVI ": "video/x-msvideo"}
 
-def _magic_guess(path: Path) -> Optional[str]:
-    with path.open("rb") as f:
-        header = f.read(16)
-    for magic, mtype in _MAGIC_MAP.items():
-        if header.startswith(magic):
-            return mtype
+# DIB header sizes: OS/2 core, BITMAPINFOHEADER, V2, V3, OS/2 2.x, V4, V5
+_BMP_DIB_SIZES = {12, 40, 52, 56, 64, 108, 124}
+
+# control characters other than tab, line feed, form feed and carriage return
+_CONTROL = re.compile(rb"[\x00-\x08\x0b\x0e-\x1f\x7f]")
+
+
+def _riff(head: bytes) -> Optional[str]:
+    return _RIFF_TYPES.get(head[8:12])
+
+
+def _bmp(head: bytes) -> Optional[str]:
+    if len(head) < 18 or struct.unpack_from("<I", head, 14)[0] not in _BMP_DIB_SIZES:
+        return None
+    return "image/bmp"
+
+
+def _mpeg_frame(head: bytes) -> Optional[str]:
+    """MPEG audio frame sync: 11 set bits, then a valid version and layer."""
+    if len(head) < 2 or head[1] & 0xE0 != 0xE0:
+        return None
+    version, layer = (head[1] >> 3) & 3, (head[1] >> 1) & 3
+    return "audio/mpeg" if version != 1 and layer != 0 else None
+
+
+Resolver = Union[str, Callable[[bytes], Optional[str]]]
+
+# leading bytes -> mimetype, or a function of the header that decides (None: no match);
+# entries sharing a first byte are tried in this order
+_SIGNATURES: List[Tuple[bytes, Resolver]] = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+    (b"BM", _bmp),
+    (b"RIFF", _riff),
+    (b"fLaC", "audio/flac"),
+    (b"OggS", "audio/ogg"),
+    (b"ID3", "audio/mpeg"),
+    (b"\xef\xbb\xbf", "text/plain"),  # UTF-8 byte order mark
+    (b"\xff\xfe", "text/plain"),  # UTF-16 LE
+    (b"\xfe\xff", "text/plain"),  # UTF-16 BE
+    (b"\xff", _mpeg_frame),  # after JPEG and the BOM that also start with 0xFF
+]
+
+_BY_FIRST_BYTE: Dict[int, List[Tuple[bytes, Resolver]]] = {}
+for _signature in _SIGNATURES:
+    _BY_FIRST_BYTE.setdefault(_signature[0][0], []).append(_signature)
+
+
+def _magic_guess(head: bytes) -> Optional[str]:
+    for signature, resolver in _BY_FIRST_BYTE.get(head[0], ()) if head else ():
+        if head.startswith(signature):
+            mtype = resolver if isinstance(resolver, str) else resolver(head)
+            if mtype is not None:
+                return mtype
     return None
 
 
-def detect_mimetype(path_str: str) -> str:
-    path = Path(path_str)
-    mt = _magic_guess(path)
-    if mt:
-        return mt
-    guess, _ = mimetypes.guess_type(path.name)
-    if guess:
-        return guess
-    # very rough text guess
+def _looks_like_text(head: bytes, complete: bool) -> bool:
+    """UTF-8 without control characters; `complete` if `head` is the whole file."""
+    if _CONTROL.search(head):
+        return False
     try:
-        data = path.read_bytes()
-        if all(32 <= b < 127 or b in (9, 10, 13) for b in data[:1024]):
-            return "text/plain"
-    except OSError:
-        pass
-    return "application/octet-stream"
+        head.decode("utf-8")
+    except UnicodeDecodeError as exc:
+        # a character cut off by the end of the buffer does not count against it
+        return not complete and exc.start >= len(head) - 3 and exc.end == len(head)
+    return True
+
+
+def detect(path_str: str) -> Tuple[str, bytes]:
+    """Mimetype of a file and its first DETECT_SIZE bytes (the whole file if shorter).
+
+    At most DETECT_SIZE bytes are read from the start, plus ID3V1_SIZE from the
+    end of files neither their content nor their name identifies.
+    """
+    path = Path(path_str)
+    with path.open("rb") as f:
+        head = f.read(DETECT_SIZE)
+        mt = _magic_guess(head)
+        if mt:
+            return mt, head
+        guess, _ = mimetypes.guess_type(path.name)
+        if guess:
+            return guess, head
+        if _looks_like_text(head, len(head) < DETECT_SIZE):
+            return "text/plain", head
+        if len(head) >= ID3V1_SIZE:
+            f.seek(-ID3V1_SIZE, 2)
+            if f.read(3) == b"TAG":
+                return "audio/mpeg", head
+    return "application/octet-stream", head
+
+
+def detect_mimetype(path_str: str) -> str:
+    return detect(path_str)[0]
@@ -0,0 +1,71 @@
+# unisteg/framing.py
+
+from __future__ import annotations
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+MAGIC = b"USTG"
+VERSION = 1
+
+# magic, version, flags, payload length, crc32 of payload
+_HEADER = struct.Struct(">4sBBQI")
+HEADER_SIZE = _HEADER.size
+
+# low bits of the flags: codec the payload is compressed with (see compression.py)
+FLAG_CODEC_MASK = 0x03
+
+
+@dataclass
+class Header:
+    version: int
+    flags: int
+    length: int
+    crc: int
+
+
+def pack_header(payload: bytes, flags: int = 0) -> bytes:
+    return _HEADER.pack(MAGIC, VERSION, flags, len(payload), zlib.crc32(payload))
+
+
+def parse_header(data: bytes) -> Optional[Header]:
+    """Decode a header from the first HEADER_SIZE bytes, or None if absent."""
+    if len(data) < HEADER_SIZE:
+        return None
+    magic, version, flags, length, crc = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return Header(version=version, flags=flags, length=length, crc=crc)
+
+
+def verify(header: Header, payload: bytes) -> bytes:
+    """Check the embedded bytes against `header` and return the payload, decompressed if need be."""
+    if len(payload) != header.length:
+        raise ValueError(
+            f"Truncated payload: expected {header.length} bytes, got {len(payload)}"
+        )
+    if zlib.crc32(payload) != header.crc:
+        raise ValueError("Payload checksum mismatch; data is corrupted or not a unisteg payload")
+    if header.flags & FLAG_CODEC_MASK:
+        from .compression import decompress
+
+        return decompress(header.flags, payload)
+    return payload
+
+
+def parse_trailer(tail: bytes, total_size: int) -> Optional[Header]:
+    """Decode a header appended as `payload + header` at the end of a file.
+
+    `tail` holds the last bytes of the file and `total_size` is the file size.
+    The payload occupies the `header.length` bytes before the header.
+    """
+    header = parse_header(tail[-HEADER_SIZE:])
+    if header is None or header.length > total_size - HEADER_SIZE:
+        return None
+    return header
+
+
+def trailer_offset(header: Header, total_size: int) -> int:
+    """File offset where a trailer-framed payload starts."""
+    return total_size - HEADER_SIZE - header.length
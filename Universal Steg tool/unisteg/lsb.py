@@ -0,0 +1,109 @@
+# unisteg/lsb.py
+
+from __future__ import annotations
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import numpy as np  # pip install numpy
+
+from .framing import HEADER_SIZE, Header, pack_header, parse_header
+
+if TYPE_CHECKING:
+    from .permutation import KeyedPermutation
+
+
+# algo name -> number of low bits used per carrier value
+LSB_ALGOS: Dict[str, int] = {"lsb1": 1, "lsb2": 2, "lsb3": 3, "lsb4": 4}
+
+
+def bits_for_algo(plugin: str, algo: str) -> int:
+    try:
+        return LSB_ALGOS[algo]
+    except KeyError:
+        raise ValueError(f"Unknown algo for {plugin}: {algo}") from None
+
+
+def symbols_needed(length: int, nbits: int) -> int:
+    """Number of carrier values needed to hold `length` payload bytes."""
+    return -(-length * 8 // nbits)
+
+
+def payload_to_symbols(payload: bytes, nbits: int) -> np.ndarray:
+    """Split payload into MSB-first groups of `nbits` bits (zero padded)."""
+    bits = np.unpackbits(np.frombuffer(payload, dtype=np.uint8))
+    if nbits == 1:
+        return bits
+    pad = -bits.size % nbits
+    if pad:
+        bits = np.concatenate([bits, np.zeros(pad, dtype=np.uint8)])
+    return np.packbits(bits.reshape(-1, nbits), axis=1)[:, 0] >> (8 - nbits)
+
+
+def symbols_to_payload(symbols: np.ndarray, nbits: int, length: int) -> bytes:
+    """Inverse of payload_to_symbols, trimmed to `length` bytes."""
+    if nbits == 1:
+        bits = symbols
+    else:
+        shifted = (symbols.astype(np.uint8) << (8 - nbits))[:, None]
+        bits = np.unpackbits(shifted, axis=1)[:, :nbits].reshape(-1)
+    return np.packbits(bits[: length * 8]).tobytes()
+
+
+def embed_symbols(
+    carrier: np.ndarray, symbols: np.ndarray, nbits: int, positions: Optional[np.ndarray] = None
+) -> None:
+    """Overwrite the low `nbits` of the leading carrier values (or those at `positions`) in place."""
+    keep = np.invert(np.asarray((1 << nbits) - 1, dtype=carrier.dtype))
+    if positions is not None:
+        carrier[positions] = (carrier[positions] & keep) | symbols.astype(carrier.dtype)
+        return
+    n = symbols.size
+    carrier[:n] &= keep
+    carrier[:n] |= symbols.astype(carrier.dtype)
+
+
+def extract_symbols(carrier: np.ndarray, count: int, nbits: int) -> np.ndarray:
+    mask = (1 << nbits) - 1
+    return (carrier[:count] & mask).astype(np.uint8)
+
+
+def extract_bytes(
+    carrier: np.ndarray, nbits: int, length: int, start: int = 0, perm: Optional["KeyedPermutation"] = None
+) -> bytes:
+    """Decode `length` bytes from the carrier, starting at symbol index `start`.
+
+    With `perm`, symbol i is read from carrier value perm.positions(i) instead of i.
+    """
+    count = symbols_needed(length, nbits)
+    if start + count > carrier.size:
+        raise ValueError("Requested length exceeds carrier capacity")
+    if perm is not None:
+        symbols = (carrier[perm.positions(start, count)] & ((1 << nbits) - 1)).astype(np.uint8)
+    else:
+        symbols = extract_symbols(carrier[start:], count, nbits)
+    return symbols_to_payload(symbols, nbits, length)
+
+
+def header_symbols(nbits: int) -> int:
+    return symbols_needed(HEADER_SIZE, nbits)
+
+
+def payload_capacity(carrier_size: int, nbits: int) -> int:
+    """Largest payload, in bytes, that fits with its header in `carrier_size` values."""
+    return max(0, (carrier_size - header_symbols(nbits)) * nbits // 8)
+
+
+def framed_symbols(payload: bytes, nbits: int, flags: int = 0) -> np.ndarray:
+    """Header and payload symbols; the payload starts on its own symbol boundary."""
+    header = payload_to_symbols(pack_header(payload, flags), nbits)
+    return np.concatenate([header, payload_to_symbols(payload, nbits)])
+
+
+def find_header(carrier: np.ndarray) -> Optional[Tuple[str, Header]]:
+    """Probe the leading carrier values for a unisteg header at every LSB depth."""
+    for algo, nbits in LSB_ALGOS.items():
+        if header_symbols(nbits) > carrier.size:
+            continue
+        header = parse_header(extract_bytes(carrier, nbits, HEADER_SIZE))
+        if header is not None:
+            return algo, header
+    return None
@@ -0,0 +1,71 @@
+# unisteg/permutation.py
+
+from __future__ import annotations
+import hashlib
+from typing import Union
+
+import numpy as np  # pip install numpy
+
+# Feistel rounds; the round function is a cheap multiply-shift hash, so use
+# more than the 4 rounds Luby-Rackoff needs for an ideal one
+ROUNDS = 6
+
+# indices are permuted this many at a time to bound temporary memory
+BATCH = 1 << 16
+
+_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+class KeyedPermutation:
+    """Keyed bijection of [0, domain), evaluated only at the indices asked for.
+
+    A balanced Feistel network permutes [0, 4**half) with 4**half >= domain, and
+    cycle walking maps values that land outside the domain back into it. Index i
+    of a payload goes to position permute(i), so embedding n symbols costs O(n)
+    time and memory whatever the size of the cover.
+    """
+
+    def __init__(self, key: Union[str, bytes], domain: int) -> None:
+        if domain <= 0:
+            raise ValueError("Permutation domain must be positive")
+        if isinstance(key, str):
+            key = key.encode("utf-8")
+        self.domain = domain
+        self.half = max(1, ((domain - 1).bit_length() + 1) // 2)
+        self._mask = np.uint64((1 << self.half) - 1)
+        seed = hashlib.blake2b(
+            key + domain.to_bytes(8, "little"), digest_size=8 * ROUNDS, person=b"unisteg-perm"
+        ).digest()
+        self._round_keys = np.frombuffer(seed, dtype="<u8").astype(np.uint64)
+
+    def _feistel(self, x: np.ndarray) -> np.ndarray:
+        half = np.uint64(self.half)
+        shift = np.uint64(64 - self.half)
+        left, right = x >> half, x & self._mask
+        for k in self._round_keys:
+            # round function: top `half` bits of (right ^ k) * odd constant (mod 2**64)
+            f = right ^ k
+            f *= _MULTIPLIER
+            f >>= shift
+            f ^= left
+            left, right = right, f
+        return (left << half) | right
+
+    def permute(self, indices: np.ndarray) -> np.ndarray:
+        """Positions of `indices` (each in [0, domain)) as an int64 array."""
+        out = np.empty(indices.size, dtype=np.int64)
+        limit = np.uint64(self.domain)
+        for start in range(0, indices.size, BATCH):
+            y = self._feistel(indices[start : start + BATCH].astype(np.uint64))
+            outside = np.flatnonzero(y >= limit)
+            while outside.size:  # expected under 4 steps; the range is < 4 * domain
+                y[outside] = self._feistel(y[outside])
+                outside = outside[y[outside] >= limit]
+            out[start : start + BATCH] = y
+        return out
+
+    def positions(self, start: int, count: int) -> np.ndarray:
+        """Positions of payload indices start .. start + count - 1."""
+        if start < 0 or start + count > self.domain:
+            raise ValueError("Requested symbols exceed the cover capacity")
+        return self.permute(np.arange(start, start + count, dtype=np.uint64))
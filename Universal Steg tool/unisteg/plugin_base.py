@@ -1,17 +1,135 @@
 # unisteg/plugin_base.py
 
 from __future__ import annotations
+import importlib
+import io
+import mmap
+import os
+import warnings
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Dict, List, Any
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Dict, List, Optional, Union
 
+from .fileio import Sink, open_sink
+from .filetype import detect
+from .profiling import phase
+
+# entry point group third-party packages use to provide plugins
+ENTRY_POINT_GROUP = "unisteg.plugins"
+
+
+@dataclass
+class PluginSpec:
+    """A plugin that can be imported on demand.
+
+    `target` is "package.module:ClassName". `mimetypes` is None when it is not
+    known without importing the plugin (entry points only name the class).
+    `error` says why the plugin could not be loaded, once that was tried.
+    """
+
+    name: str
+    target: str
+    mimetypes: Optional[List[str]] = None
+    error: Optional[str] = None
+
+
+_PLUGIN_SPECS: Dict[str, PluginSpec] = {}
 _PLUGIN_REGISTRY: Dict[str, "BasePlugin"] = {}
+_entry_points_loaded = False
+
+# size of the cached head()/tail() views shared by all plugins
+VIEW_SIZE = 64 * 1024
 
 
 @dataclass
 class FileInfo:
     path: str
     mimetype: str
+    _buffer: Optional[Union[mmap.mmap, bytes]] = field(default=None, init=False, repr=False, compare=False)
+    _head: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    _tail: Optional[bytes] = field(default=None, init=False, repr=False, compare=False)
+    _size: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+    _streams: List[mmap.mmap] = field(default_factory=list, init=False, repr=False, compare=False)
+
+    @classmethod
+    def detect(cls, path: str) -> "FileInfo":
+        """FileInfo with the mimetype detected; the bytes read for that answer small head() calls."""
+        mimetype, head = detect(path)
+        info = cls(path=path, mimetype=mimetype)
+        info._head = head
+        return info
+
+    def buffer(self) -> Union[mmap.mmap, bytes]:
+        """Read-only mapping of the whole file, created on first use and shared by plugins.
+
+        Slicing it only touches the pages covered by the slice. Note that `x in buffer`
+        does not do substring search on an mmap; use buffer.find().
+        """
+        if self._buffer is None:
+            with open(self.path, "rb") as f:
+                try:
+                    self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:  # empty files cannot be mapped
+                    self._buffer = b""
+        return self._buffer
+
+    @property
+    def size(self) -> int:
+        if self._size is None:
+            self._size = len(self._buffer) if self._buffer is not None else os.stat(self.path).st_size
+        return self._size
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """Read a byte range: a slice of the mapping if one exists, else a seek and read."""
+        if self._buffer is not None:
+            return self._buffer[offset : offset + size]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+    def head(self, size: int = VIEW_SIZE) -> bytes:
+        if size > VIEW_SIZE:
+            return self.read_at(0, size)
+        # a head from detect() is shorter than the view unless the file is
+        if self._head is None or (len(self._head) < size and len(self._head) < self.size):
+            self._head = self.read_at(0, VIEW_SIZE)
+        return self._head[:size]
+
+    def tail(self, size: int = VIEW_SIZE) -> bytes:
+        if size <= 0:
+            return b""
+        if size > VIEW_SIZE:
+            return self.read_at(max(0, self.size - size), size)
+        if self._tail is None:
+            self._tail = self.read_at(max(0, self.size - VIEW_SIZE), VIEW_SIZE)
+        return self._tail[-size:]
+
+    def stream(self) -> BinaryIO:
+        """File-like view of the file for libraries that want read/seek.
+
+        This is a separate mapping of the same pages: reading from it must not move
+        the position of buffer(), which mmap.find()/rfind() use as their start.
+        It stays open until close().
+        """
+        if not isinstance(self.buffer(), mmap.mmap):
+            return io.BytesIO(b"")
+        with open(self.path, "rb") as f:
+            self._streams.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return self._streams[-1]  # type: ignore[return-value]
+
+    def close(self) -> None:
+        for stream in self._streams:
+            stream.close()
+        self._streams.clear()
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._buffer = self._head = self._tail = self._size = None
+
+    def __enter__(self) -> "FileInfo":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
 
 
 @dataclass
@@ -23,21 +141,62 @@ class ScanResult:
 class BasePlugin(ABC):
     name: str
     supported_mimetypes: List[str]
+    # values the `algo` option accepts, the default first
+    algos: List[str] = []
+    # embed_to() stores its `flags` option in the payload header, so extract() can undo compression
+    records_flags: bool = False
+    # bump when scan() output changes, so cached findings are recomputed
+    version: str = "1"
+
+    def phase(self, name: str, info: Optional[FileInfo] = None) -> phase:
+        """Measure a step of this plugin (e.g. "decode") for profiling hooks."""
+        return phase(name, plugin=self.name, path=info.path if info is not None else None)
 
     @abstractmethod
     def scan(self, info: FileInfo) -> ScanResult:
         ...
 
-    @abstractmethod
-    def embed(
-        self,
-        info: FileInfo,
-        payload: bytes,
-        *,
-        algo: str,
-        **options: Any,
-    ) -> bytes:
-        ...
+    def capacity(self, info: FileInfo, **options: Any) -> Optional[int]:
+        """Largest payload in bytes embed_to() can hide in this cover with `algo` and other `options`.
+
+        Plugins should answer from container headers, without decoding the cover.
+        None if the plugin does not know, or has no fixed limit (appended data).
+        """
+        return None
+
+    def output_suffix(self, info: FileInfo) -> str:
+        """File extension for stego files embed_to() writes from this cover; the cover's own by default."""
+        return os.path.splitext(info.path)[1]
+
+    def check_flags(self, options: Dict[str, Any]) -> None:
+        """ValueError if `options` carry payload flags this plugin would drop, e.g. compression's codec."""
+        if options.get("flags") and not self.records_flags:
+            raise ValueError(f"Plugin {self.name} cannot record payload flags, so it cannot embed compressed payloads")
+
+    def embed_to(self, info: FileInfo, payload: bytes, dest: Sink, **options: Any) -> None:
+        """Write the stego file to `dest`, a path or a binary file object, in one pass.
+
+        Plugins should override this. The default wraps a plugin that only
+        implements the older bytes-returning embed(). Plugins that write a payload
+        header take a `flags` option for it (e.g. the codec of a compressed payload,
+        see compression.py), which framing.verify() undoes on extraction, and set
+        `records_flags`.
+        """
+        if type(self).embed is BasePlugin.embed:
+            raise NotImplementedError(f"Plugin {self.name} does not support embedding")
+        self.check_flags(options)
+        data = self.embed(info, payload, **options)
+        with open_sink(dest) as out:
+            out.write(data)
+
+    def embed(self, info: FileInfo, payload: bytes, **options: Any) -> bytes:
+        """The stego file as bytes, for callers that want it in memory; see embed_to()."""
+        if type(self).embed_to is BasePlugin.embed_to:
+            raise NotImplementedError(f"Plugin {self.name} does not support embedding")
+        self.check_flags(options)
+        out = io.BytesIO()
+        self.embed_to(info, payload, out, **options)
+        return out.getvalue()
 
     @abstractmethod
     def extract(
@@ -50,17 +209,91 @@ class BasePlugin(ABC):
         ...
 
 
+def declare_plugin(name: str, target: str, mimetypes: Optional[List[str]] = None) -> None:
+    """Make a plugin available by name without importing its module."""
+    _PLUGIN_SPECS[name] = PluginSpec(name=name, target=target, mimetypes=mimetypes)
+
+
 def register_plugin(plugin: BasePlugin) -> None:
     _PLUGIN_REGISTRY[plugin.name] = plugin
+    if plugin.name not in _PLUGIN_SPECS:
+        cls = type(plugin)
+        declare_plugin(plugin.name, f"{cls.__module__}:{cls.__qualname__}", list(plugin.supported_mimetypes))
+
+
+def _load_entry_points() -> None:
+    """Declare third-party plugins; only their metadata is read, not their code."""
+    global _entry_points_loaded
+    if _entry_points_loaded:
+        return
+    _entry_points_loaded = True
+    from importlib.metadata import entry_points
+
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        if ep.name not in _PLUGIN_SPECS:
+            declare_plugin(ep.name, ep.value)
+
+
+def _load(spec: PluginSpec) -> BasePlugin:
+    """The plugin of `spec`, imported on first use; ValueError if it cannot be loaded."""
+    plugin = _PLUGIN_REGISTRY.get(spec.name)
+    if plugin is None:
+        if spec.error is not None:
+            raise ValueError(spec.error)
+        module_name, _, class_name = spec.target.partition(":")
+        try:
+            with phase("import", spec.name):
+                cls = getattr(importlib.import_module(module_name), class_name)
+                plugin = cls()
+            if plugin.name != spec.name:
+                raise ValueError(f"it is named {plugin.name!r}")
+        except Exception as exc:  # third-party code can fail in any way
+            spec.error = f"Plugin {spec.name} ({spec.target}) cannot be loaded: {type(exc).__name__}: {exc}"
+            raise ValueError(spec.error) from exc
+        register_plugin(plugin)
+    if spec.mimetypes is None:
+        spec.mimetypes = list(plugin.supported_mimetypes)
+    return plugin
+
+
+def _load_all(specs: List[PluginSpec]) -> List[BasePlugin]:
+    """Plugins of `specs`, leaving out those that cannot be loaded (with a warning the first time)."""
+    plugins = []
+    for spec in specs:
+        tried = spec.error is not None
+        try:
+            plugins.append(_load(spec))
+        except ValueError as exc:
+            if not tried:
+                warnings.warn(str(exc), RuntimeWarning, stacklevel=3)
+    return plugins
+
+
+def _specs() -> List[PluginSpec]:
+    _load_entry_points()
+    return list(_PLUGIN_SPECS.values())
+
+
+def plugin_names() -> List[str]:
+    """Names of every declared plugin, without importing any of them."""
+    return [spec.name for spec in _specs()]
 
 
 def get_plugin(name: str) -> BasePlugin | None:
-    return _PLUGIN_REGISTRY.get(name)
+    """The plugin called `name`, or None if none is declared; ValueError if it cannot be loaded."""
+    if name in _PLUGIN_REGISTRY:
+        return _PLUGIN_REGISTRY[name]
+    if name not in _PLUGIN_SPECS:
+        _load_entry_points()
+    spec = _PLUGIN_SPECS.get(name)
+    return _load(spec) if spec is not None else None
 
 
 def all_plugins() -> List[BasePlugin]:
-    return list(_PLUGIN_REGISTRY.values())
+    return _load_all(_specs())
 
 
 def plugins_for_mimetype(mimetype: str) -> List[BasePlugin]:
-    return [p for p in all_plugins() if mimetype in p.supported_mimetypes]
+    """Plugins supporting `mimetype`; only those (and undescribed ones) are imported."""
+    candidates = _load_all([s for s in _specs() if s.mimetypes is None or mimetype in s.mimetypes])
+    return [p for p in candidates if mimetype in p.supported_mimetypes]
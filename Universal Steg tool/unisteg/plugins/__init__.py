@@ -1,29 +1,19 @@
 # unisteg/plugins/__init__.py
 
-from ..plugin_base import register_plugin
-
-from .image_lsb import ImageLSBPlugin
-from .image_metadata import ImageMetadataPlugin
-from .image_appended import ImageAppendedPlugin
-
-from .audio_lsb import AudioLSBPlugin
-from .audio_metadata import AudioMetadataPlugin
-from .audio_appended import AudioAppendedPlugin
-
-from .text_lsb import TextLSBPlugin
-from .text_metadata import TextMetadataPlugin
-from .text_appended import TextAppendedPlugin
-
-
-# Register all plugins at import time
-register_plugin(ImageLSBPlugin())
-register_plugin(ImageMetadataPlugin())
-register_plugin(ImageAppendedPlugin())
-
-register_plugin(AudioLSBPlugin())
-register_plugin(AudioMetadataPlugin())
-register_plugin(AudioAppendedPlugin())
-
-register_plugin(TextLSBPlugin())
-register_plugin(TextMetadataPlugin())
-register_plugin(TextAppendedPlugin())
+from ..plugin_base import declare_plugin
+
+# Plugins are declared here and imported on first use, so commands that need
+# one plugin do not pay for the dependencies (numpy, Pillow) of all the others.
+declare_plugin("image_lsb", "unisteg.plugins.image_lsb:ImageLSBPlugin", ["image/png", "image/bmp"])
+declare_plugin("image_metadata", "unisteg.plugins.image_metadata:ImageMetadataPlugin", ["image/jpeg", "image/png"])
+declare_plugin(
+    "image_appended", "unisteg.plugins.image_appended:ImageAppendedPlugin", ["image/png", "image/jpeg", "image/bmp"]
+)
+
+declare_plugin("audio_lsb", "unisteg.plugins.audio_lsb:AudioLSBPlugin", ["audio/wav"])
+declare_plugin("audio_metadata", "unisteg.plugins.audio_metadata:AudioMetadataPlugin", ["audio/wav", "audio/mpeg"])
+declare_plugin("audio_appended", "unisteg.plugins.audio_appended:AudioAppendedPlugin", ["audio/wav", "audio/mpeg"])
+
+declare_plugin("text_lsb", "unisteg.plugins.text_lsb:TextLSBPlugin", ["text/plain"])
+declare_plugin("text_metadata", "unisteg.plugins.text_metadata:TextMetadataPlugin", ["text/plain"])
+declare_plugin("text_appended", "unisteg.plugins.text_appended:TextAppendedPlugin", ["text/plain"])
@@ -3,20 +3,26 @@
 from __future__ import annotations
 from typing import List
 
+from ..fileio import Sink, copy_into, open_sink
+from ..framing import HEADER_SIZE, pack_header, parse_trailer, trailer_offset, verify
 from ..plugin_base import BasePlugin, FileInfo, ScanResult
 
 
 class AudioAppendedPlugin(BasePlugin):
     name = "audio_appended"
     supported_mimetypes = ["audio/wav", "audio/mpeg"]
+    algos = ["append"]
+    records_flags = True
 
     def scan(self, info: FileInfo) -> ScanResult:
         findings: List[str] = []
-        with open(info.path, "rb") as f:
-            data = f.read()
+        header = parse_trailer(info.tail(HEADER_SIZE), info.size)
+        if header is not None:
+            findings.append(f"Found unisteg appended payload trailer: {header.length} bytes.")
+            return ScanResult(file=info.path, findings=findings)
 
-        tail = data[-4096:] if len(data) > 4096 else data
-        if any(b != 0x00 for b in tail):
+        tail = info.tail(4096)
+        if tail.count(0) < len(tail):
             findings.append(
                 "Non-zero tail data detected; may indicate appended payload beyond normal audio frames."
             )
@@ -24,18 +30,19 @@ class AudioAppendedPlugin(BasePlugin):
             findings.append("Tail mostly zero; no obvious appended data.")
         return ScanResult(file=info.path, findings=findings)
 
-    def embed(self, info: FileInfo, payload: bytes, *, algo: str = "append", **_) -> bytes:
-        with open(info.path, "rb") as f:
-            original = f.read()
-        out_data = original + payload
-        out_path = info.path + ".aapp"
-        with open(out_path, "wb") as f:
-            f.write(out_data)
-        return out_data
+    def embed_to(
+        self, info: FileInfo, payload: bytes, dest: Sink, *, algo: str = "append", flags: int = 0, **_
+    ) -> None:
+        with open_sink(dest) as out:
+            copy_into(info.path, out)
+            out.write(payload)
+            out.write(pack_header(payload, flags))
 
     def extract(self, info: FileInfo, *, algo: str = "append", length: int | None = None, **_) -> bytes:
-        if length is None:
-            raise ValueError("Pass payload length (bytes) for audio appended extract")
-        with open(info.path, "rb") as f:
-            data = f.read()
-        return data[-length:]
+        # an explicit length means a raw payload without a unisteg trailer
+        if length is not None:
+            return info.tail(length)
+        header = parse_trailer(info.tail(HEADER_SIZE), info.size)
+        if header is None:
+            raise ValueError("No unisteg payload trailer found; pass length for raw appended data")
+        return verify(header, info.read_at(trailer_offset(header, info.size), header.length))
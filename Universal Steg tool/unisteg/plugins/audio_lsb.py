@@ -2,52 +2,305 @@
 
 from __future__ import annotations
 import wave
-from pathlib import Path
-from typing import Any, List
+from typing import Any, List, Sequence
 
+import numpy as np  # pip install numpy
+
+from ..analysis import DETECTION_THRESHOLD, SPA_MAX_ERROR, StreamStats
+from ..containers import riff_chunk
+from ..fileio import Sink, open_sink
+from ..framing import HEADER_SIZE, parse_header, verify
+from ..lsb import (
+    LSB_ALGOS,
+    bits_for_algo,
+    embed_symbols,
+    extract_symbols,
+    find_header,
+    framed_symbols,
+    header_symbols,
+    payload_capacity,
+    symbols_needed,
+    symbols_to_payload,
+)
+from ..permutation import KeyedPermutation
 from ..plugin_base import BasePlugin, FileInfo, ScanResult
 
 
+# frames per read/write block; bounds memory regardless of file length
+BLOCK_FRAMES = 65536
+
+# scan() reports LSB statistics per segment of this many seconds
+SEGMENT_SECONDS = 10.0
+MAX_SEGMENT_FINDINGS = 20
+# per-segment estimates are noisier than whole-file ones, so flag them higher
+SEGMENT_THRESHOLD = 2 * DETECTION_THRESHOLD
+
+_SAMPLE_DTYPES = {1: np.dtype(np.uint8), 2: np.dtype("<i2"), 4: np.dtype("<i4")}
+
+
+def _parse_channels(channels: Any, nchannels: int) -> List[int]:
+    if channels is None:
+        return list(range(nchannels))
+    if isinstance(channels, str):
+        channels = [c for c in channels.split(",") if c.strip()]
+    selected = [int(c) for c in channels]
+    if not selected or any(c < 0 or c >= nchannels for c in selected):
+        raise ValueError(f"Invalid channels {channels!r} for {nchannels}-channel audio")
+    return selected
+
+
+def _sample_view(frames: bytearray, sampwidth: int, nchannels: int) -> np.ndarray:
+    """View raw PCM frames as a (frames, channels) array of samples."""
+    raw = np.frombuffer(frames, dtype=np.uint8)
+    if sampwidth == 3:
+        # no 24-bit dtype; the low bits live in the first byte of each LE sample
+        samples = raw.reshape(-1, 3)[:, 0]
+    elif sampwidth in _SAMPLE_DTYPES:
+        samples = raw.view(_SAMPLE_DTYPES[sampwidth])
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {sampwidth} bytes")
+    return samples.reshape(-1, nchannels)
+
+
+def _full_samples(frames: bytes, sampwidth: int, nchannels: int) -> np.ndarray:
+    """Decode PCM frames to a (frames, channels) int32 array of sample values."""
+    raw = np.frombuffer(frames, dtype=np.uint8)
+    if sampwidth == 3:
+        b = raw.reshape(-1, 3).astype(np.int32)
+        values = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        values = (values ^ 0x800000) - 0x800000  # sign-extend
+    elif sampwidth in _SAMPLE_DTYPES:
+        values = raw.view(_SAMPLE_DTYPES[sampwidth]).astype(np.int32)
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {sampwidth} bytes")
+    return values.reshape(-1, nchannels)
+
+
+def _timestamp(frame: int, framerate: int) -> str:
+    seconds = frame // max(1, framerate)
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def _spa_finding(stats: StreamStats) -> str:
+    error = stats.spa_error
+    if error > SPA_MAX_ERROR:
+        # typically loud 16/24-bit audio, whose LSBs are noise with or without a payload
+        return f"payload fraction not measurable by SPA (standard error above {SPA_MAX_ERROR})"
+    return f"estimated payload fraction {stats.spa:.3f} +/- {error:.3f} (SPA)"
+
+
+def _statistics(stats: StreamStats) -> str:
+    return (
+        f"{_spa_finding(stats)}, embedding probability {stats.chi_square:.3f} (low-byte pairs of values), "
+        f"LSB entropy {stats.lsb_entropy:.3f}"
+    )
+
+
+def _carrier(samples: np.ndarray, channels: Sequence[int]) -> np.ndarray:
+    if list(channels) == list(range(samples.shape[1])):
+        return samples.reshape(-1)
+    return samples[:, channels].reshape(-1)
+
+
+class _SymbolReader:
+    """Sequentially decode carrier symbols from a wave stream, block by block."""
+
+    def __init__(self, song: wave.Wave_read, channels: Sequence[int], nbits: int, block_frames: int):
+        self._song = song
+        self._params = song.getparams()
+        self._channels = channels
+        self._nbits = nbits
+        self._block_frames = block_frames
+        self._pending = np.empty(0, dtype=np.uint8)
+
+    def read(self, count: int) -> np.ndarray:
+        parts = [self._pending[:count]]
+        self._pending = self._pending[count:]
+        got = parts[0].size
+        while got < count:
+            wanted = -(-(count - got) // len(self._channels))
+            frames = bytearray(self._song.readframes(min(self._block_frames, wanted)))
+            if not frames:
+                raise ValueError("Requested length exceeds audio capacity")
+            samples = _sample_view(frames, self._params.sampwidth, self._params.nchannels)
+            carrier = _carrier(samples, self._channels)
+            symbols = extract_symbols(carrier, carrier.size, self._nbits)
+            parts.append(symbols[: count - got])
+            self._pending = symbols[count - got :]
+            got += parts[-1].size
+        return np.concatenate(parts)
+
+    def read_bytes(self, length: int) -> bytes:
+        return symbols_to_payload(self.read(symbols_needed(length, self._nbits)), self._nbits, length)
+
+
+class _KeyedReader:
+    """Decode symbols at keyed positions straight from the mapped data chunk.
+
+    Only the bytes holding the requested symbols are touched, so reading costs
+    O(payload). LSB embedding never changes more than the low byte of a sample,
+    which comes first in little-endian PCM, whatever the sample width.
+    """
+
+    def __init__(self, info: FileInfo, params: Any, channels: Sequence[int], nbits: int, key: Any):
+        span = riff_chunk(info, b"data")
+        if span is None:
+            raise ValueError("WAV file has no data chunk")
+        offset, size = span
+        buffer = info.buffer()
+        self._raw = np.frombuffer(buffer, dtype=np.uint8, count=min(size, max(0, len(buffer) - offset)), offset=offset)
+        self._stride = params.nchannels * params.sampwidth
+        self._frames = self._raw.size // self._stride
+        self._channel_offsets = np.asarray(channels, dtype=np.int64) * params.sampwidth
+        self._nbits = nbits
+        # the domain must match the one embedding used, which is the header's frame count
+        self._perm = KeyedPermutation(key, params.nframes * len(channels))
+        self._next = 0
+
+    def read_bytes(self, length: int) -> bytes:
+        count = symbols_needed(length, self._nbits)
+        positions = self._perm.positions(self._next, count)
+        self._next += count
+        frames, lanes = np.divmod(positions, self._channel_offsets.size)
+        if frames.size and int(frames.max()) >= self._frames:
+            raise ValueError("WAV data chunk is shorter than its header's frame count")
+        values = self._raw[frames * self._stride + self._channel_offsets[lanes]]
+        symbols = values & ((1 << self._nbits) - 1)
+        return symbols_to_payload(symbols, self._nbits, length)
+
+
 class AudioLSBPlugin(BasePlugin):
     name = "audio_lsb"
     supported_mimetypes = ["audio/wav"]
+    algos = list(LSB_ALGOS)
+    records_flags = True
+    version = "3"
+
+    def capacity(self, info: FileInfo, *, algo: str = "lsb1", channels: Any = None, **options: Any) -> int:
+        """Payload bytes that fit, from the fmt and data chunk headers alone."""
+        nbits = bits_for_algo(self.name, algo)
+        with wave.open(info.path, "rb") as song:
+            params = song.getparams()
+        return payload_capacity(params.nframes * len(_parse_channels(channels, params.nchannels)), nbits)
 
     def scan(self, info: FileInfo) -> ScanResult:
-        findings: List[str] = [
-            "WAV audio is commonly used for LSB steganography; no detailed LSB analysis implemented."
-        ]
+        findings: List[str] = []
+
+        with wave.open(info.path, "rb") as song:
+            params = song.getparams()
+            channels = list(range(params.nchannels))
+            # enough leading values for a header at the shallowest depth
+            count = header_symbols(min(LSB_ALGOS.values()))
+            frames = bytearray(song.readframes(-(-count // params.nchannels)))
+            carrier = _carrier(_sample_view(frames, params.sampwidth, params.nchannels), channels)
+
+            found = find_header(carrier)
+            if found is not None:
+                algo, header = found
+                findings.append(
+                    f"Found unisteg {algo} payload header: {header.length} bytes, flags 0x{header.flags:02x}."
+                )
+
+            song.rewind()
+            findings.extend(self._analyze(song))
         return ScanResult(file=info.path, findings=findings)
 
-    def embed(
+    def _analyze(self, song: wave.Wave_read) -> List[str]:
+        """Single streaming pass of per-channel, per-segment LSB statistics."""
+        params = song.getparams()
+        segment_frames = max(1, int(params.framerate * SEGMENT_SECONDS))
+        totals = [StreamStats() for _ in range(params.nchannels)]
+        flagged: List[str] = []
+        start = 0
+        while True:
+            # each segment continues from the last sample of the previous one
+            segment = [StreamStats(last=total.last) for total in totals]
+            got = 0
+            while got < segment_frames:
+                frames = song.readframes(min(BLOCK_FRAMES, segment_frames - got))
+                if not frames:
+                    break
+                samples = _full_samples(frames, params.sampwidth, params.nchannels)
+                for ch, stats in enumerate(segment):
+                    stats.update(samples[:, ch])
+                got += samples.shape[0]
+            if got == 0:
+                break
+            span = f"{_timestamp(start, params.framerate)}-{_timestamp(start + got, params.framerate)}"
+            for ch, stats in enumerate(segment):
+                totals[ch].merge(stats)
+                if stats.spa > SEGMENT_THRESHOLD and stats.spa_error <= SPA_MAX_ERROR:
+                    flagged.append(f"Segment {span} channel {ch}: {_statistics(stats)}.")
+            start += got
+
+        findings = [f"Channel {ch}: {_statistics(stats)}." for ch, stats in enumerate(totals)]
+        if not flagged:
+            findings.append(
+                f"No {SEGMENT_SECONDS:g}s segment exceeds an estimated payload fraction of {SEGMENT_THRESHOLD}."
+            )
+        findings.extend(flagged[:MAX_SEGMENT_FINDINGS])
+        if len(flagged) > MAX_SEGMENT_FINDINGS:
+            findings.append(f"... and {len(flagged) - MAX_SEGMENT_FINDINGS} more suspicious segments.")
+        return findings
+
+    def embed_to(
         self,
         info: FileInfo,
         payload: bytes,
+        dest: Sink,
         *,
         algo: str = "lsb1",
+        channels: Any = None,
+        block_frames: int = BLOCK_FRAMES,
+        key: str | bytes | None = None,
+        flags: int = 0,
         **options: Any,
-    ) -> bytes:
-        if algo != "lsb1":
-            raise ValueError("Unknown algo for audio_lsb")
-
-        in_path = info.path
-        out_path = str(Path(in_path).with_suffix(".lsb.wav"))
+    ) -> None:
+        nbits = bits_for_algo(self.name, algo)
+        symbols = framed_symbols(payload, nbits, flags)
 
-        with wave.open(in_path, "rb") as song:
+        with wave.open(info.path, "rb") as song, open_sink(dest) as sink:
             params = song.getparams()
-            frames = bytearray(song.readframes(song.getnframes()))
+            selected = _parse_channels(channels, params.nchannels)
+            capacity = params.nframes * len(selected)
+            if symbols.size > capacity:
+                raise ValueError("Payload too large for this audio file")
 
-        bits = "".join(f"{b:08b}" for b in payload)
-        if len(bits) > len(frames):
-            raise ValueError("Payload too large for this audio file")
+            # with a key, symbols go to keyed positions, sorted so each block takes a slice
+            positions = None
+            if key is not None:
+                positions = KeyedPermutation(key, capacity).positions(0, symbols.size)
+                order = np.argsort(positions)
+                positions, symbols = positions[order], symbols[order]
 
-        for i, bit in enumerate(bits):
-            frames[i] = (frames[i] & 0b11111110) | int(bit)
+            with wave.open(sink, "wb") as out:
+                out.setparams(params)
 
-        with wave.open(out_path, "wb") as out:
-            out.setparams(params)
-            out.writeframes(bytes(frames))
+                done = base = 0
+                while done < symbols.size:
+                    frames = bytearray(song.readframes(block_frames))
+                    if not frames or len(frames) % (params.sampwidth * params.nchannels):
+                        raise ValueError("WAV data chunk is shorter than its header's frame count")
+                    samples = _sample_view(frames, params.sampwidth, params.nchannels)
+                    carrier = _carrier(samples, selected)
+                    if positions is None:
+                        end = done + carrier.size
+                        embed_symbols(carrier, symbols[done:end], nbits)
+                    else:
+                        end = int(np.searchsorted(positions, base + carrier.size))
+                        embed_symbols(carrier, symbols[done:end], nbits, positions[done:end] - base)
+                    if not np.shares_memory(carrier, samples):
+                        samples[:, selected] = carrier.reshape(-1, len(selected))
+                    out.writeframesraw(frames)
+                    done = min(end, symbols.size)
+                    base += carrier.size
 
-        return Path(out_path).read_bytes()
+                # the rest of the stream is copied through untouched
+                while True:
+                    frames = song.readframes(block_frames)
+                    if not frames:
+                        break
+                    out.writeframesraw(frames)
 
     def extract(
         self,
@@ -55,20 +308,28 @@ class AudioLSBPlugin(BasePlugin):
         *,
         algo: str = "lsb1",
         length: int | None = None,
+        channels: Any = None,
+        block_frames: int = BLOCK_FRAMES,
+        key: str | bytes | None = None,
         **options: Any,
     ) -> bytes:
-        if algo != "lsb1":
-            raise ValueError("Unknown algo for audio_lsb")
-        if length is None:
-            raise ValueError("Pass payload length (bytes) for audio_lsb extract")
+        nbits = bits_for_algo(self.name, algo)
 
         with wave.open(info.path, "rb") as song:
-            frames = bytearray(song.readframes(song.getnframes()))
-
-        bits_needed = length * 8
-        bits = [str(frames[i] & 1) for i in range(bits_needed)]
-        data = bytearray()
-        for i in range(0, len(bits), 8):
-            byte_bits = "".join(bits[i : i + 8])
-            data.append(int(byte_bits, 2))
-        return bytes(data)
+            params = song.getparams()
+            selected = _parse_channels(channels, params.nchannels)
+            if key is not None:
+                reader: Any = _KeyedReader(info, params, selected, nbits, key)
+            else:
+                reader = _SymbolReader(song, selected, nbits, block_frames)
+
+            # an explicit length means a raw payload without a unisteg header
+            if length is not None:
+                return reader.read_bytes(length)
+
+            header = parse_header(reader.read_bytes(HEADER_SIZE))
+            if header is None:
+                if key is not None:
+                    raise ValueError("No unisteg payload header found at the keyed positions; check the key")
+                raise ValueError("No unisteg payload header found; pass length for raw payloads")
+            return verify(header, reader.read_bytes(header.length))
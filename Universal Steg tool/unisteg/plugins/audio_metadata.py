@@ -1,34 +1,161 @@
 # unisteg/plugins/audio_metadata.py
 
 from __future__ import annotations
-from typing import List
+import struct
+from typing import List, Optional
 
+from ..containers import (
+    ID3_FOOTER,
+    ID3_HEADER_SIZE,
+    ID3_UNSYNCHRONISED,
+    Chunk,
+    ID3Tag,
+    id3_frames,
+    id3v2_tag,
+    riff_chunks,
+    riff_end,
+    syncsafe,
+)
+from ..fileio import Sink, copy_into, open_sink
+from ..framing import HEADER_SIZE, pack_header, parse_header, verify
 from ..plugin_base import BasePlugin, FileInfo, ScanResult
 
+# WAV: the payload goes into a chunk of this id, which players skip
+PAYLOAD_CHUNK = b"ustg"
+# MP3: the payload goes into an ID3v2 PRIV frame with this owner identifier
+PRIV_OWNER = b"unisteg\0"
+
+# chunks holding the audio itself; every other chunk is reported
+_AUDIO_CHUNKS = {b"fmt ", b"fact", b"data"}
+
+MAX_CHUNK_FINDINGS = 50
+
+# the tag header and a v2.3/v2.4 extended header size
+_ID3_HEAD = ID3_HEADER_SIZE + 4
+
+
+def _priv_frame(version: int, data: bytes) -> bytes:
+    body = PRIV_OWNER + data
+    size = syncsafe(len(body)) if version == 4 else struct.pack(">I", len(body))
+    return b"PRIV" + size + b"\0\0" + body
+
 
 class AudioMetadataPlugin(BasePlugin):
     name = "audio_metadata"
     supported_mimetypes = ["audio/wav", "audio/mpeg"]
+    algos = ["tag"]
+    records_flags = True
+    version = "2"
+
+    def _chunks(self, info: FileInfo) -> List[Chunk]:
+        """RIFF chunks of a WAV or frames of an MP3's ID3v2 tag; only their headers are read."""
+        with open(info.path, "rb") as f:
+            if info.mimetype == "audio/wav":
+                return list(riff_chunks(f, info.size))
+            tag = id3v2_tag(info.head(_ID3_HEAD))
+            return list(id3_frames(f, tag)) if tag is not None else []
+
+    def _payload_chunk(self, info: FileInfo, chunks: List[Chunk]) -> Optional[Chunk]:
+        """The last chunk or PRIV frame holding a payload, with offset and size narrowed to it."""
+        for chunk in reversed(chunks):
+            if chunk.id == PAYLOAD_CHUNK:
+                return chunk
+            if chunk.id == b"PRIV" and info.read_at(chunk.body, len(PRIV_OWNER)) == PRIV_OWNER:
+                return Chunk(chunk.id, chunk.offset, chunk.size - len(PRIV_OWNER), chunk.header_size + len(PRIV_OWNER))
+        return None
 
     def scan(self, info: FileInfo) -> ScanResult:
         findings: List[str] = []
 
-        with open(info.path, "rb") as f:
-            data = f.read()
+        chunks = self._chunks(info)
+        found = self._payload_chunk(info, chunks)
+        header = parse_header(info.read_at(found.body, HEADER_SIZE)) if found is not None else None
+        if header is not None:
+            findings.append(
+                f"Found unisteg payload in {found.id.decode()} at offset {found.offset}: {header.length} bytes."
+            )
 
         if info.mimetype == "audio/wav":
-            if data.startswith(b"RIFF") and b"LIST" in data:
-                findings.append("Found RIFF LIST/INFO chunks (metadata present, may hide data).")
-        elif info.mimetype == "audio/mpeg":
-            if data[-128:-125] == b"TAG":
-                findings.append("Detected ID3v1-style tag at end of MP3 (metadata present).")
+            extra = [c for c in chunks if c.id not in _AUDIO_CHUNKS]
+            kind = "RIFF chunk"
+        else:
+            extra = chunks
+            tag = id3v2_tag(info.head(_ID3_HEAD))
+            kind = f"ID3v2.{tag.version} frame" if tag is not None else ""
+        for c in extra[:MAX_CHUNK_FINDINGS]:
+            name = c.id.decode("latin-1") + (f"/{c.list_type.decode('latin-1')}" if c.list_type else "")
+            findings.append(f"{kind} {name} at offset {c.offset}: {c.size} bytes (metadata, may hide data).")
+        if len(extra) > MAX_CHUNK_FINDINGS:
+            findings.append(f"... and {len(extra) - MAX_CHUNK_FINDINGS} more.")
+
+        if info.mimetype == "audio/mpeg" and info.tail(128)[:3] == b"TAG":
+            findings.append("Detected ID3v1-style tag at end of MP3 (metadata present).")
 
         if not findings:
             findings.append("No obvious audio metadata markers detected.")
         return ScanResult(file=info.path, findings=findings)
 
-    def embed(self, info: FileInfo, payload: bytes, *, algo: str = "tag", **_) -> bytes:
-        raise NotImplementedError("Audio metadata embedding not implemented yet")
+    def embed_to(
+        self, info: FileInfo, payload: bytes, dest: Sink, *, algo: str = "tag", flags: int = 0, **_
+    ) -> None:
+        """Add the payload as a RIFF chunk (WAV) or ID3v2 PRIV frame (MP3).
+
+        Only the container headers change; the rest of the file is copied as is.
+        """
+        data = pack_header(payload, flags) + payload
+        if info.mimetype == "audio/wav":
+            self._embed_riff(info, data, dest)
+        elif info.mimetype == "audio/mpeg":
+            self._embed_id3(info, data, dest)
+        else:
+            raise ValueError(f"audio_metadata cannot embed into {info.mimetype}")
+
+    def _embed_riff(self, info: FileInfo, data: bytes, dest: Sink) -> None:
+        head = info.head(12)
+        if len(head) < 12 or head[:4] != b"RIFF":
+            raise ValueError("Not a RIFF file")
+        end = riff_end(head, info.size)
+        pad = end & 1  # the chunk must start word aligned
+        size = end - 8 + pad + 8 + len(data) + (len(data) & 1)
+        if size > 0xFFFFFFFF:
+            raise ValueError("Payload too large for a RIFF file")
+        with open_sink(dest) as out:
+            out.write(head[:4] + struct.pack("<I", size) + head[8:12])
+            copy_into(info.path, out, offset=12, count=end - 12)
+            out.write(b"\0" * pad + PAYLOAD_CHUNK + struct.pack("<I", len(data)) + data + b"\0" * (len(data) & 1))
+            copy_into(info.path, out, offset=end)  # anything after the RIFF chunk, e.g. an appended payload
+
+    def _embed_id3(self, info: FileInfo, data: bytes, dest: Sink) -> None:
+        head = info.head(_ID3_HEAD)
+        tag = id3v2_tag(head)
+        if tag is None:
+            # a new v2.3 tag holding just the frame, in front of the whole file
+            tag, head = ID3Tag(3, 0, 0, ID3_HEADER_SIZE), b"ID3\x03\x00\x00"
+            insert = body_start = 0
+        else:
+            if tag.version == 2:
+                raise ValueError("ID3v2.2 tags have no PRIV frame")
+            if tag.flags & (ID3_UNSYNCHRONISED | ID3_FOOTER):
+                raise ValueError("Unsynchronised ID3v2 tags and tags with a footer are not supported")
+            frames = self._chunks(info)
+            insert = frames[-1].end if frames else tag.frames_offset
+            body_start = ID3_HEADER_SIZE
+        frame = _priv_frame(tag.version, data)
+        size = tag.size + len(frame)
+        if size >= 1 << 28:
+            raise ValueError("Payload too large for an ID3v2 tag")
+        with open_sink(dest) as out:
+            out.write(head[:6] + syncsafe(size))
+            copy_into(info.path, out, offset=body_start, count=insert - body_start)
+            out.write(frame)
+            copy_into(info.path, out, offset=insert)
 
     def extract(self, info: FileInfo, *, algo: str = "tag", **_) -> bytes:
-        raise NotImplementedError("Audio metadata extraction not implemented yet")
+        found = self._payload_chunk(info, self._chunks(info))
+        if found is None:
+            raise ValueError("No unisteg metadata chunk or PRIV frame found")
+        data = info.read_at(found.body, found.size)
+        header = parse_header(data)
+        if header is None:
+            raise ValueError("Metadata payload has no unisteg header")
+        return verify(header, data[HEADER_SIZE : HEADER_SIZE + header.length])
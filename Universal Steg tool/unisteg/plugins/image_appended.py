@@ -3,55 +3,58 @@
 from __future__ import annotations
 from typing import List
 
+from ..containers import container_end
+from ..fileio import Sink, copy_into, open_sink
+from ..framing import HEADER_SIZE, pack_header, parse_trailer, trailer_offset, verify
 from ..plugin_base import BasePlugin, FileInfo, ScanResult
 
+_CONTAINER_NAMES = {"image/png": "PNG IEND chunk", "image/jpeg": "JPEG EOI marker", "image/bmp": "BMP declared size"}
+
 
 class ImageAppendedPlugin(BasePlugin):
     name = "image_appended"
     supported_mimetypes = ["image/png", "image/jpeg", "image/bmp"]
+    algos = ["append"]
+    records_flags = True
 
     def scan(self, info: FileInfo) -> ScanResult:
         findings: List[str] = []
-        with open(info.path, "rb") as f:
-            data = f.read()
-
-        if info.mimetype == "image/png":
-            marker = b"IEND"
-            idx = data.rfind(marker)
-            if idx != -1:
-                end_pos = idx + 8  # heuristic: 'IEND'(4) + CRC(4)
-                if end_pos < len(data):
-                    extra_len = len(data) - end_pos
-                    findings.append(
-                        f"Detected {extra_len} extra bytes after PNG IEND (possible appended payload)."
-                    )
-                else:
-                    findings.append("No extra data after PNG IEND.")
-            else:
-                findings.append("Could not locate PNG IEND; file may be malformed.")
+
+        header = parse_trailer(info.tail(HEADER_SIZE), info.size)
+        if header is not None:
+            findings.append(f"Found unisteg appended payload trailer: {header.length} bytes.")
+
+        kind = _CONTAINER_NAMES.get(info.mimetype, "image")
+        end = container_end(info)
+        if end is None:
+            findings.append(f"Could not locate {kind}; file may be malformed.")
+        elif end < info.size:
+            findings.append(
+                f"Detected {info.size - end} extra bytes after {kind} at offset {end} "
+                "(possible appended payload)."
+            )
         else:
-            tail = data[-2048:] if len(data) > 2048 else data
-            if any(b != 0x00 for b in tail):
-                findings.append(
-                    "Non-zero tail data detected; may indicate appended payload or normal padding."
-                )
-            else:
-                findings.append("Tail mostly zero; no obvious appended data.")
+            findings.append(f"No extra data after {kind}.")
 
         return ScanResult(file=info.path, findings=findings)
 
-    def embed(self, info: FileInfo, payload: bytes, *, algo: str = "append", **_) -> bytes:
-        with open(info.path, "rb") as f:
-            original = f.read()
-        out_data = original + payload
-        out_path = info.path + ".appended"
-        with open(out_path, "wb") as f:
-            f.write(out_data)
-        return out_data
+    def embed_to(
+        self, info: FileInfo, payload: bytes, dest: Sink, *, algo: str = "append", flags: int = 0, **_
+    ) -> None:
+        with open_sink(dest) as out:
+            copy_into(info.path, out)
+            out.write(payload)
+            out.write(pack_header(payload, flags))
 
     def extract(self, info: FileInfo, *, algo: str = "append", length: int | None = None, **_) -> bytes:
-        if length is None:
-            raise ValueError("Pass payload length (bytes) for appended-data extraction.")
-        with open(info.path, "rb") as f:
-            data = f.read()
-        return data[-length:]
+        # an explicit length means a raw payload without a unisteg trailer
+        if length is not None:
+            return info.tail(length)
+        header = parse_trailer(info.tail(HEADER_SIZE), info.size)
+        if header is not None:
+            return verify(header, info.read_at(trailer_offset(header, info.size), header.length))
+        # no trailer: return whatever follows the end of the image structure
+        end = container_end(info)
+        if end is None or end >= info.size:
+            raise ValueError("No appended data found after the image structure.")
+        return info.read_at(end, info.size - end)
@@ -1,65 +1,252 @@
 # unisteg/plugins/image_lsb.py
 
 from __future__ import annotations
-from pathlib import Path
-from typing import Any, List
+import zlib
+from typing import Any, BinaryIO, Callable, List, Optional, Sequence, Tuple
 
-from PIL import Image  # pip install pillow
+import numpy as np  # pip install numpy
+from PIL import Image, ImageMode  # pip install pillow
 
+from .. import pngstream
+from ..analysis import analyze_image
+from ..containers import BMP_HEADER_SIZE, bmp_header
+from ..fileio import Sink, open_sink
+from ..framing import HEADER_SIZE, parse_header, verify
+from ..lsb import (
+    LSB_ALGOS,
+    bits_for_algo,
+    embed_symbols,
+    extract_bytes,
+    find_header,
+    framed_symbols,
+    header_symbols,
+    payload_capacity,
+    symbols_needed,
+    symbols_to_payload,
+)
+from ..permutation import KeyedPermutation
 from ..plugin_base import BasePlugin, FileInfo, ScanResult
 
+# modes whose pixel buffer is embedded into as is; others are converted to RGB(A) first
+NATIVE_MODES = {"L", "LA", "P", "RGB", "RGBA", "I;16"}
+
+# bits per pixel of an uncompressed BMP -> bands of the mode Pillow decodes it to
+_BMP_BANDS = {16: "RGB", 24: "RGB", 32: "RGB"}
+
+
+def _native_mode(img: Image.Image) -> str:
+    if img.mode in NATIVE_MODES:
+        return img.mode
+    return "RGBA" if "A" in img.getbands() else "RGB"
+
+
+def _native(img: Image.Image) -> Image.Image:
+    mode = _native_mode(img)
+    return img if mode == img.mode else img.convert(mode)
+
+
+def _parse_channels(channels: Any, bands: Sequence[str]) -> List[int]:
+    """Band indices to embed into, given by name (R, A, ...) or index; default: all but alpha."""
+    if channels is None:
+        return [i for i, band in enumerate(bands) if band != "A"]
+    if isinstance(channels, str):
+        channels = [c.strip() for c in channels.split(",") if c.strip()]
+    selected = []
+    for c in channels:
+        c = str(c).upper()
+        if c in bands:
+            selected.append(bands.index(c))
+        elif c.isdigit() and int(c) < len(bands):
+            selected.append(int(c))
+        else:
+            raise ValueError(f"Invalid channels {channels!r} for image bands {''.join(bands)}")
+    return selected
+
+
+def _carrier(planes: np.ndarray, selected: Sequence[int]) -> np.ndarray:
+    if list(selected) == list(range(planes.shape[1])):
+        return planes.reshape(-1)
+    return planes[:, selected].reshape(-1)
+
+
+def _read_framed(read: Callable[[int, int], bytes], nbits: int, length: Optional[int], keyed: bool) -> bytes:
+    """Payload through read(start_symbol, length): raw if `length` is given, else after a header."""
+    if length is not None:
+        return read(0, length)
+    header = parse_header(read(0, HEADER_SIZE))
+    if header is None:
+        if keyed:
+            raise ValueError("No unisteg payload header found at the keyed positions; check the key")
+        raise ValueError("No unisteg payload header found; pass length for raw payloads")
+    return verify(header, read(header_symbols(nbits), header.length))
+
 
 class ImageLSBPlugin(BasePlugin):
     name = "image_lsb"
     supported_mimetypes = ["image/png", "image/bmp"]
+    algos = list(LSB_ALGOS)
+    records_flags = True
+    version = "3"
+
+    def _decode(self, info: FileInfo, writable: bool = False) -> Tuple[Image.Image, np.ndarray]:
+        """The image in a native mode and its pixels, (height, width[, bands])."""
+        with self.phase("decode", info):
+            img = _native(Image.open(info.stream()))
+            pixels = np.array(img) if writable else np.asarray(img)
+        return img, pixels
+
+    def _png_header(self, info: FileInfo) -> Optional[pngstream.PNGHeader]:
+        """Header of a PNG cover that pngstream can process in strips, else None."""
+        if info.mimetype != "image/png":
+            return None
+        try:
+            with open(info.path, "rb") as f:
+                header = pngstream.read_header(f)
+        except (OSError, ValueError):
+            return None
+        return header if header.streamable else None
+
+    def capacity(self, info: FileInfo, *, algo: str = "lsb1", channels: Any = None, **options: Any) -> int:
+        """Payload bytes that fit, from the image header alone."""
+        nbits = bits_for_algo(self.name, algo)
+        png = self._png_header(info)
+        if png is not None:
+            return payload_capacity(png.capacity(_parse_channels(channels, png.bands)), nbits)
+        bmp = bmp_header(info.read_at(0, BMP_HEADER_SIZE)) if info.mimetype == "image/bmp" else None
+        if bmp is not None and bmp[3] == 0 and bmp[2] in _BMP_BANDS:
+            width, height, bits, _ = bmp
+            return payload_capacity(width * height * len(_parse_channels(channels, _BMP_BANDS[bits])), nbits)
+        with Image.open(info.path) as img:  # reads the header; pixels are decoded on demand
+            bands = list(ImageMode.getmode(_native_mode(img)).bands)
+            values = img.width * img.height * len(_parse_channels(channels, bands))
+        return payload_capacity(values, nbits)
 
     def scan(self, info: FileInfo) -> ScanResult:
-        findings: List[str] = [
-            "LSB steganography is commonly used with this image type; statistical analysis not implemented."
-        ]
+        findings: List[str] = []
+
+        img, pixels = self._decode(info)
+        bands = list(img.getbands())
+        selected = _parse_channels(None, bands)
+        found = find_header(_carrier(pixels.reshape(-1, len(bands)), selected))
+        if found is not None:
+            algo, header = found
+            findings.append(
+                f"Found unisteg {algo} payload header: {header.length} bytes, flags 0x{header.flags:02x}."
+            )
+
+        planes = pixels.reshape(*pixels.shape[:2], len(bands))
+        if len(selected) < len(bands):
+            planes = planes[:, :, selected]
+        report = analyze_image(planes, [bands[i] for i in selected])
+        verdict = "likely LSB embedding" if report.suspicious else "no significant LSB embedding"
+        findings.append(
+            f"LSB analysis ({report.sampled_fraction:.1%} of pixels sampled): estimated embedding rate "
+            f"{report.estimate:.3f}, confidence {report.confidence:.2f} ({verdict})."
+        )
+        for ch in report.channels:
+            findings.append(
+                f"Channel {ch.name}: RS {ch.rs:.3f}, SPA {ch.spa:.3f}, chi-square p {ch.chi_square:.3f}."
+            )
         return ScanResult(file=info.path, findings=findings)
 
-    def embed(
+    def output_suffix(self, info: FileInfo) -> str:
+        return ".png"
+
+    def embed_to(
         self,
         info: FileInfo,
         payload: bytes,
+        dest: Sink,
         *,
         algo: str = "lsb1",
+        channels: Any = None,
+        key: str | bytes | None = None,
+        compress_level: int | None = None,
+        flags: int = 0,
         **options: Any,
-    ) -> bytes:
-        if algo != "lsb1":
-            raise ValueError(f"Unknown algo for image_lsb: {algo}")
+    ) -> None:
+        """Embed into the image's own pixel buffer and write it as PNG in the same mode.
+
+        PNG covers are streamed strip by strip where pngstream supports them.
+        `compress_level` is the zlib level of the PNG (0-9; 1 is fastest, Pillow's default is 6).
+        """
+        nbits = bits_for_algo(self.name, algo)
 
-        img = Image.open(info.path).convert("RGB")
-        pixels = img.load()
+        png = self._png_header(info)
+        if png is not None:
+            self._embed_png(info, png, payload, dest, nbits, channels, key, compress_level, flags)
+            return
 
-        bits = "".join(f"{b:08b}" for b in payload)
-        width, height = img.size
-        max_capacity = width * height * 3
+        img, pixels = self._decode(info, writable=True)
+        bands = list(img.getbands())
+        selected = _parse_channels(channels, bands)
+        planes = pixels.reshape(-1, len(bands))
+        carrier = _carrier(planes, selected)
 
-        if len(bits) > max_capacity:
+        symbols = framed_symbols(payload, nbits, flags)
+        if symbols.size > carrier.size:
             raise ValueError("Payload too large for this cover image")
 
-        bit_idx = 0
-        for y in range(height):
-            for x in range(width):
-                if bit_idx >= len(bits):
-                    break
-                r, g, b = pixels[x, y]
-                channels = [r, g, b]
-                for c in range(3):
-                    if bit_idx >= len(bits):
-                        break
-                    ch_bits = f"{channels[c]:08b}"
-                    channels[c] = int(ch_bits[:-1] + bits[bit_idx], 2)
-                    bit_idx += 1
-                pixels[x, y] = tuple(channels)
-            if bit_idx >= len(bits):
-                break
-
-        out_path = Path(info.path).with_suffix(".lsb.png")
-        img.save(out_path)
-        return out_path.read_bytes()
+        # with a key the symbols go to keyed pseudo-random positions instead of the leading ones
+        positions = KeyedPermutation(key, carrier.size).positions(0, symbols.size) if key is not None else None
+        embed_symbols(carrier, symbols, nbits, positions)
+        if not np.shares_memory(carrier, planes):
+            planes[:, selected] = carrier.reshape(-1, len(selected))
+
+        # writing back into the decoded image keeps its palette, transparency and ICC profile
+        img.frombytes(pixels)
+        save_options = {"compress_level": compress_level} if compress_level is not None else {}
+        with self.phase("encode", info), open_sink(dest) as out:
+            img.save(out, format="PNG", **save_options)
+
+    def _embed_png(
+        self,
+        info: FileInfo,
+        png: pngstream.PNGHeader,
+        payload: bytes,
+        dest: Sink,
+        nbits: int,
+        channels: Any,
+        key: str | bytes | None,
+        compress_level: int | None,
+        flags: int,
+    ) -> None:
+        selected = _parse_channels(channels, png.bands)
+        capacity = png.capacity(selected)
+        symbols = framed_symbols(payload, nbits, flags)
+        if symbols.size > capacity:
+            raise ValueError("Payload too large for this cover image")
+
+        # the stream is written in order, so keyed positions are sorted with their symbols
+        positions = None
+        if key is not None:
+            positions = KeyedPermutation(key, capacity).positions(0, symbols.size)
+            order = np.argsort(positions)
+            positions, symbols = positions[order], symbols[order]
+
+        level = compress_level if compress_level is not None else zlib.Z_DEFAULT_COMPRESSION
+        with open(info.path, "rb") as src, open_sink(dest) as out:
+            pngstream.embed(src, out, symbols, nbits, selected, positions, level)
+
+    def _png_reader(
+        self, f: BinaryIO, png: pngstream.PNGHeader, nbits: int, channels: Any, key: str | bytes | None
+    ) -> Callable[[int, int], bytes]:
+        selected = _parse_channels(channels, png.bands)
+        if key is None:
+            # reads are consecutive, so the next symbol is always where the last read stopped
+            reader = pngstream.SymbolReader(f, selected, nbits)
+            return lambda start, length: symbols_to_payload(
+                reader.read(symbols_needed(length, nbits)), nbits, length
+            )
+
+        perm = KeyedPermutation(key, png.capacity(selected))
+
+        def read(start: int, length: int) -> bytes:
+            f.seek(0)
+            positions = perm.positions(start, symbols_needed(length, nbits))
+            return symbols_to_payload(pngstream.symbols_at(f, selected, nbits, positions), nbits, length)
+
+        return read
 
     def extract(
         self,
@@ -67,34 +254,25 @@ class ImageLSBPlugin(BasePlugin):
         *,
         algo: str = "lsb1",
         length: int | None = None,
+        channels: Any = None,
+        key: str | bytes | None = None,
         **options: Any,
     ) -> bytes:
-        if algo != "lsb1":
-            raise ValueError(f"Unknown algo for image_lsb: {algo}")
-        if length is None:
-            raise ValueError("Pass payload length (bytes) for image_lsb extract")
-
-        img = Image.open(info.path).convert("RGB")
-        pixels = img.load()
-        width, height = img.size
-
-        bits_needed = length * 8
-        bits_collected: List[str] = []
-
-        for y in range(height):
-            for x in range(width):
-                if len(bits_collected) >= bits_needed:
-                    break
-                r, g, b = pixels[x, y]
-                for ch in (r, g, b):
-                    if len(bits_collected) >= bits_needed:
-                        break
-                    bits_collected.append(f"{ch:08b}"[-1])
-            if len(bits_collected) >= bits_needed:
-                break
-
-        data = bytearray()
-        for i in range(0, len(bits_collected), 8):
-            byte_bits = "".join(bits_collected[i : i + 8])
-            data.append(int(byte_bits, 2))
-        return bytes(data)
+        nbits = bits_for_algo(self.name, algo)
+
+        png = self._png_header(info)
+        if png is not None:
+            with open(info.path, "rb") as f:
+                read = self._png_reader(f, png, nbits, channels, key)
+                return _read_framed(read, nbits, length, key is not None)
+
+        img, pixels = self._decode(info)
+        bands = list(img.getbands())
+        carrier = _carrier(pixels.reshape(-1, len(bands)), _parse_channels(channels, bands))
+        perm = KeyedPermutation(key, carrier.size) if key is not None else None
+        return _read_framed(
+            lambda start, size: extract_bytes(carrier, nbits, size, start=start, perm=perm),
+            nbits,
+            length,
+            perm is not None,
+        )
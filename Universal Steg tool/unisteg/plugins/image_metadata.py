@@ -14,7 +14,8 @@ class ImageMetadataPlugin(BasePlugin):
 
     def scan(self, info: FileInfo) -> ScanResult:
         findings: List[str] = []
-        img = Image.open(info.path)
+        with self.phase("decode", info):
+            img = Image.open(info.stream())
 
         # EXIF
         try:
@@ -3,20 +3,28 @@
 from __future__ import annotations
 from typing import List
 
+from ..fileio import Sink, copy_into, open_sink
+from ..framing import HEADER_SIZE, pack_header, parse_trailer, trailer_offset, verify
 from ..plugin_base import BasePlugin, FileInfo, ScanResult
 
+MARKER = b"\n---STEG-END---\n"
+
 
 class TextAppendedPlugin(BasePlugin):
     name = "text_appended"
     supported_mimetypes = ["text/plain"]
+    algos = ["append"]
+    records_flags = True
 
     def scan(self, info: FileInfo) -> ScanResult:
         findings: List[str] = []
-        with open(info.path, "rb") as f:
-            data = f.read()
+        header = parse_trailer(info.tail(HEADER_SIZE), info.size)
+        if header is not None:
+            findings.append(f"Found unisteg appended payload trailer: {header.length} bytes.")
+            return ScanResult(file=info.path, findings=findings)
 
         # look at last 1 KB for non-printable junk
-        tail = data[-1024:] if len(data) > 1024 else data
+        tail = info.tail(1024)
         non_printable = sum(1 for b in tail if b < 9 or (13 < b < 32))
         if non_printable:
             findings.append(
@@ -26,21 +34,22 @@ class TextAppendedPlugin(BasePlugin):
             findings.append("No obvious binary trailer in text tail.")
         return ScanResult(file=info.path, findings=findings)
 
-    def embed(self, info: FileInfo, payload: bytes, *, algo: str = "append", **_) -> bytes:
-        with open(info.path, "rb") as f:
-            original = f.read()
-        marker = b"\n---STEG-END---\n"
-        out_data = original + marker + payload
-        out_path = info.path + ".tapp"
-        with open(out_path, "wb") as f:
-            f.write(out_data)
-        return out_data
+    def embed_to(
+        self, info: FileInfo, payload: bytes, dest: Sink, *, algo: str = "append", flags: int = 0, **_
+    ) -> None:
+        with open_sink(dest) as out:
+            copy_into(info.path, out)
+            out.write(MARKER)
+            out.write(payload)
+            out.write(pack_header(payload, flags))
 
     def extract(self, info: FileInfo, *, algo: str = "append", **_) -> bytes:
-        with open(info.path, "rb") as f:
-            data = f.read()
-        marker = b"\n---STEG-END---\n"
-        idx = data.rfind(marker)
+        header = parse_trailer(info.tail(HEADER_SIZE), info.size)
+        if header is not None:
+            return verify(header, info.read_at(trailer_offset(header, info.size), header.length))
+        # older payloads carry only the marker
+        data = info.buffer()
+        idx = data.rfind(MARKER)
         if idx == -1:
             raise ValueError("Marker not found; no appended payload in text.")
-        return data[idx + len(marker) :]
+        return data[idx + len(MARKER) :]
@@ -1,25 +1,168 @@
 # unisteg/plugins/text_lsb.py
 
 from __future__ import annotations
-from typing import List
+import re
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
 
+from ..fileio import Sink, copy_into, open_sink
+from ..framing import HEADER_SIZE, pack_header, parse_header, verify
 from ..plugin_base import BasePlugin, FileInfo, ScanResult
 
 
-ZERO_WIDTH = {"\u200b", "\u200c", "\u200d", "\u200e", "\u200f"}
+ZERO_WIDTH = {"\u200b", "\u200c", "\u200d", "\u200e", "\u200f", "\u2060", "\ufeff"}
+
+# scan() reads the file in blocks of about this size, cut at line ends
+SCAN_BLOCK = 1 << 20
+
+# zw: each payload byte becomes four base-4 digits written as these characters
+ZW_DIGITS = "\u200b\u200c\u200d\u2060"
+_ZW_RUN = re.compile(("(?:%s)+\\Z" % "|".join(ZW_DIGITS)).encode("utf-8"))
+# digit characters are three UTF-8 bytes each and differ in the last one
+_ZW_BYTE = [
+    "".join(ZW_DIGITS[(b >> shift) & 3] for shift in (6, 4, 2, 0)).encode("utf-8") for b in range(256)
+]
+_ZW_DECODE = bytes.maketrans(bytes(ch.encode("utf-8")[2] for ch in ZW_DIGITS), b"0123")
+
+# ws: each payload bit becomes a trailing space (0) or tab (1)
+_WS_ENCODE = bytes.maketrans(b"01", b" \t")
+_WS_DECODE = bytes.maketrans(b" \t", b"01")
+# line ends preceded by trailing whitespace, counted by scan()
+_TRAILING_WS = (b" \n", b"\t\n", b" \r\n", b"\t\r\n")
+
+# payload bytes carried per line; the last line of the cover takes any remainder
+LINE_BYTES = {"zw": 16, "ws": 2}
+
+_ZW_ENCODED = [ch.encode("utf-8") for ch in sorted(ZERO_WIDTH)]
+
+
+def _split_eol(line: bytes) -> Tuple[bytes, bytes]:
+    if line.endswith(b"\r\n"):
+        return line[:-2], b"\r\n"
+    if line.endswith(b"\n"):
+        return line[:-1], b"\n"
+    return line, b""
+
+
+def _encode(algo: str, body: bytes, chunk: bytes) -> bytes:
+    """`body` with any old trailing run replaced by `chunk` encoded with `algo`."""
+    if algo == "zw":
+        match = _ZW_RUN.search(body)
+        if match is not None:
+            body = body[: match.start()]
+        return body + b"".join(map(_ZW_BYTE.__getitem__, chunk))
+    bits = format(int.from_bytes(chunk, "big"), f"0{8 * len(chunk)}b").encode("ascii")
+    return body.rstrip(b" \t") + bits.translate(_WS_ENCODE)
+
+
+def _decode(algo: str, body: bytes) -> bytes:
+    """Payload bytes carried by the trailing run of one line (EOL removed).
+
+    Runs too short for a whole byte carry nothing; digits past the last whole
+    byte (e.g. a stray zero-width joiner in the cover) are ignored.
+    """
+    if algo == "zw":
+        match = _ZW_RUN.search(body)
+        if match is None:
+            return b""
+        digits = match.group()[2::3].translate(_ZW_DECODE)
+        if len(digits) < 4:
+            return b""
+        digits = digits[: len(digits) // 4 * 4]
+        return int(digits, 4).to_bytes(len(digits) // 4, "big")
+    run = body[len(body.rstrip(b" \t")) :]
+    if len(run) < 8:
+        return b""
+    bits = run[: len(run) // 8 * 8].translate(_WS_DECODE)
+    return int(bits, 2).to_bytes(len(bits) // 8, "big")
+
+
+def _check_algo(algo: str) -> str:
+    if algo not in LINE_BYTES:
+        raise ValueError(f"Unknown algo for text_lsb: {algo} (expected one of {', '.join(LINE_BYTES)})")
+    return algo
+
+
+class _LineReader:
+    """Collect payload bytes from the trailing runs of consecutive lines."""
+
+    def __init__(self, lines: Iterator[bytes], algo: str):
+        self._lines = lines
+        self._algo = algo
+        self._buffer = bytearray()
+
+    def read(self, length: int) -> Optional[bytes]:
+        """The next `length` payload bytes, or None if a line without a run comes first."""
+        while len(self._buffer) < length:
+            line = next(self._lines, None)
+            if line is None:
+                return None
+            chunk = _decode(self._algo, _split_eol(line)[0])
+            if not chunk:
+                return None
+            self._buffer += chunk
+        data = bytes(self._buffer[:length])
+        del self._buffer[:length]
+        return data
+
+
+def _blocks(f: BinaryIO) -> Iterator[bytes]:
+    """Blocks of about SCAN_BLOCK bytes that end on a line boundary."""
+    rest = b""
+    while True:
+        block = f.read(SCAN_BLOCK)
+        if not block:
+            if rest:
+                yield rest
+            return
+        block = rest + block
+        cut = block.rfind(b"\n") + 1
+        if cut == 0:
+            rest = block
+            continue
+        rest = block[cut:]
+        yield block[:cut]
 
 
 class TextLSBPlugin(BasePlugin):
     name = "text_lsb"
     supported_mimetypes = ["text/plain"]
+    algos = list(LINE_BYTES)
+    records_flags = True
+
+    def capacity(
+        self, info: FileInfo, *, algo: str = "zw", line_bytes: Optional[int] = None, **_
+    ) -> int:
+        """Payload bytes that fit at `line_bytes` per line.
+
+        embed_to() accepts more by putting the remainder on the last line, which
+        then stands out.
+        """
+        per_line = line_bytes or LINE_BYTES[_check_algo(algo)]
+        lines = 0
+        with open(info.path, "rb") as f:
+            for block in _blocks(f):
+                lines += block.count(b"\n") + (not block.endswith(b"\n"))
+        return max(0, lines * per_line - HEADER_SIZE)
 
     def scan(self, info: FileInfo) -> ScanResult:
         findings: List[str] = []
-        with open(info.path, "r", encoding="utf-8", errors="ignore") as f:
-            text = f.read()
 
-        zw_count = sum(1 for ch in text if ch in ZERO_WIDTH)
-        trailing_spaces = sum(1 for line in text.splitlines() if line.rstrip() != line)
+        for algo in LINE_BYTES:
+            with open(info.path, "rb") as f:
+                header = parse_header(_LineReader(iter(f), algo).read(HEADER_SIZE) or b"")
+            if header is not None:
+                findings.append(f"Found unisteg {algo} payload header: {header.length} bytes.")
+
+        counts: Dict[bytes, int] = dict.fromkeys(_ZW_ENCODED, 0)
+        trailing_spaces = 0
+        with open(info.path, "rb") as f:
+            for block in _blocks(f):
+                for seq in counts:
+                    counts[seq] += block.count(seq)
+                trailing_spaces += sum(map(block.count, _TRAILING_WS))
+                if not block.endswith(b"\n") and block[-1:] in (b" ", b"\t"):
+                    trailing_spaces += 1
+        zw_count = sum(counts.values())
 
         if zw_count:
             findings.append(f"Detected {zw_count} zero-width characters (possible unicode stego).")
@@ -29,8 +172,47 @@ class TextLSBPlugin(BasePlugin):
             findings.append("No obvious zero-width or whitespace stego indicators.")
         return ScanResult(file=info.path, findings=findings)
 
-    def embed(self, info: FileInfo, payload: bytes, *, algo: str = "zw", **_) -> bytes:
-        raise NotImplementedError("Text embedding not implemented yet")
+    def embed_to(
+        self,
+        info: FileInfo,
+        payload: bytes,
+        dest: Sink,
+        *,
+        algo: str = "zw",
+        line_bytes: Optional[int] = None,
+        flags: int = 0,
+        **_,
+    ) -> None:
+        """Write the cover with header and payload spread over the trailing runs of its lines.
+
+        Only the lines that carry data pass through Python; the rest of the file
+        is copied as is.
+        """
+        _check_algo(algo)
+        per_line = line_bytes or LINE_BYTES[algo]
+        data = pack_header(payload, flags) + payload
+        pos = 0
+        with open(info.path, "rb") as src, open_sink(dest) as out:
+            line = src.readline()
+            while line and pos < len(data):
+                following = src.readline()
+                # the last line of the cover takes whatever is left
+                end = pos + per_line if following else len(data)
+                body, eol = _split_eol(line)
+                out.write(_encode(algo, body, data[pos:end]) + eol)
+                pos = end
+                line = following
+            if pos < len(data):  # empty cover
+                out.write(_encode(algo, b"", data[pos:]))
+                return
+            out.write(line)
+            copy_into(info.path, out, offset=src.tell())
 
     def extract(self, info: FileInfo, *, algo: str = "zw", **_) -> bytes:
-        raise NotImplementedError("Text extraction not implemented yet")
+        _check_algo(algo)
+        with open(info.path, "rb") as f:
+            reader = _LineReader(iter(f), algo)
+            header = parse_header(reader.read(HEADER_SIZE) or b"")
+            if header is None:
+                raise ValueError(f"No unisteg {algo} payload header found in this text")
+            return verify(header, reader.read(header.length) or b"")
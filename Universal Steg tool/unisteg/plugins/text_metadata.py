@@ -12,12 +12,11 @@ class TextMetadataPlugin(BasePlugin):
 
     def scan(self, info: FileInfo) -> ScanResult:
         findings: List[str] = []
-        with open(info.path, "r", encoding="utf-8", errors="ignore") as f:
-            lines = f.readlines()
+        head = info.head(16)
 
-        if lines and lines[0].startswith("---"):
+        if head.startswith(b"---"):
             findings.append("YAML-style front matter detected at top of file (metadata region).")
-        if lines and lines[0].startswith("#!"):
+        if head.startswith(b"#!"):
             findings.append("Shebang/header line present (metadata-like; not necessarily stego).")
         if not findings:
             findings.append("No obvious structured text metadata at file start.")
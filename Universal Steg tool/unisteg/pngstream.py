@@ -0,0 +1,379 @@
+# unisteg/pngstream.py
+"""LSB embedding and extraction on PNG image data, one strip of scanlines at a time.
+
+The IDAT stream is read READ_SIZE bytes at a time and inflated only as far as
+the current strip needs, so memory is bounded by a strip (about STRIP_BYTES of
+pixels) instead of the whole image, even when all the image data is in one
+IDAT chunk, and extraction stops reading once it has the symbols it needs. Rows that carry payload are
+unfiltered, modified and re-filtered. The first row after them is re-filtered
+too, since its filter refers to the changed row above, and later rows keep
+their original filtered bytes. All image data is recompressed, as one deflate
+stream cannot be spliced.
+
+Carrier values follow the same order as image_lsb's in-memory path: pixels
+row by row, then the selected bands. Interlaced images and bit depths other
+than 8 (and 16 for grayscale) are not handled here.
+"""
+
+from __future__ import annotations
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np  # pip install numpy
+from PIL import Image  # pip install pillow
+
+from .containers import PNG_SIGNATURE
+from .lsb import embed_symbols, extract_symbols
+
+# target size of the unfiltered pixels of one strip
+STRIP_BYTES = 1 << 20
+
+# compressed image data is read this many bytes at a time
+READ_SIZE = 1 << 16
+
+# compressed image data is written in IDAT chunks of up to this size
+IDAT_SIZE = 1 << 18
+
+# (color type, bit depth) -> (Pillow mode, Pillow raw mode, bands)
+_FORMATS = {
+    (0, 8): ("L", "L", "L"),
+    (0, 16): ("I;16", "I;16B", "I"),
+    (2, 8): ("RGB", "RGB", "RGB"),
+    (3, 8): ("P", "P", "P"),
+    (4, 8): ("LA", "LA", "LA"),
+    (6, 8): ("RGBA", "RGBA", "RGBA"),
+}
+
+
+@dataclass
+class PNGHeader:
+    width: int
+    height: int
+    bit_depth: int
+    color_type: int
+    interlace: int
+
+    @property
+    def streamable(self) -> bool:
+        return self.interlace == 0 and (self.color_type, self.bit_depth) in _FORMATS
+
+    @property
+    def bands(self) -> List[str]:
+        return list(_FORMATS[self.color_type, self.bit_depth][2])
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(">u2" if self.bit_depth == 16 else "u1")
+
+    @property
+    def pixel_bytes(self) -> int:
+        return len(self.bands) * self.dtype.itemsize
+
+    @property
+    def stride(self) -> int:
+        return self.width * self.pixel_bytes
+
+    def capacity(self, channels: Sequence[int]) -> int:
+        return self.width * self.height * len(channels)
+
+
+def _chunk_head(f: BinaryIO) -> Tuple[int, bytes]:
+    head = f.read(8)
+    if len(head) < 8:
+        raise ValueError("Truncated PNG: no IEND chunk")
+    return struct.unpack(">I4s", head)
+
+
+def _chunk_rest(f: BinaryIO, length: int, ctype: bytes) -> bytes:
+    """The data of a chunk whose head was just read; its CRC is skipped."""
+    data = f.read(length)
+    if len(data) < length or len(f.read(4)) < 4:
+        raise ValueError(f"Truncated PNG {ctype.decode('latin-1')} chunk")
+    return data
+
+
+def _chunks(f: BinaryIO) -> Iterator[Tuple[bytes, bytes]]:
+    """(type, data) of each chunk after the signature, up to and including IEND."""
+    while True:
+        length, ctype = _chunk_head(f)
+        yield ctype, _chunk_rest(f, length, ctype)
+        if ctype == b"IEND":
+            return
+
+
+def read_header(f: BinaryIO) -> PNGHeader:
+    if f.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+        raise ValueError("Not a PNG file")
+    ctype, data = next(_chunks(f))
+    if ctype != b"IHDR" or len(data) < 13:
+        raise ValueError("PNG does not start with an IHDR chunk")
+    width, height, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", data[:13])
+    return PNGHeader(width, height, bit_depth, color_type, interlace)
+
+
+class _Reader:
+    """Filtered scanlines of a PNG, inflated from its IDAT chunks on demand."""
+
+    def __init__(self, f: BinaryIO) -> None:
+        self.header = read_header(f)
+        if not self.header.streamable:
+            raise ValueError("PNG is interlaced or has an unsupported bit depth for streaming")
+        self._f = f
+        self._inflate = zlib.decompressobj()
+        self._data = bytearray()
+        # chunks before and after the image data, passed through by embed()
+        self.leading: List[Tuple[bytes, bytes]] = []
+        self.trailing: List[Tuple[bytes, bytes]] = []
+        # bytes of the current IDAT chunk not read yet, None once past the image data
+        self._left: Optional[int] = None
+        while True:
+            length, ctype = _chunk_head(f)
+            if ctype == b"IDAT":
+                self._open_idat(length)
+                break
+            self.leading.append((ctype, _chunk_rest(f, length, ctype)))
+            if ctype == b"IEND":
+                break
+
+    def _open_idat(self, length: int) -> None:
+        self._left = length
+        if length == 0:
+            self._end_idat()
+
+    def _end_idat(self) -> None:
+        if len(self._f.read(4)) < 4:
+            raise ValueError("Truncated PNG IDAT chunk")
+
+    def _compressed(self) -> bytes:
+        """Up to READ_SIZE bytes of compressed image data, b"" after the last IDAT chunk."""
+        while self._left == 0:
+            length, ctype = _chunk_head(self._f)
+            if ctype == b"IDAT":
+                self._open_idat(length)
+                continue
+            self._left = None
+            self.trailing.append((ctype, _chunk_rest(self._f, length, ctype)))
+            if ctype != b"IEND":
+                self.trailing.extend(_chunks(self._f))
+        if self._left is None:
+            return b""
+        data = self._f.read(min(READ_SIZE, self._left))
+        if not data:
+            raise ValueError("Truncated PNG IDAT chunk")
+        self._left -= len(data)
+        if self._left == 0:
+            self._end_idat()
+        return data
+
+    def rows(self, count: int) -> bytes:
+        """The next `count` filtered rows, filter type bytes included."""
+        size = count * (self.header.stride + 1)
+        while len(self._data) < size:
+            data = self._inflate.unconsumed_tail or self._compressed()
+            if not data:
+                self._data += self._inflate.flush()
+                break
+            # inflate no further than this strip; the rest of the input waits in unconsumed_tail
+            self._data += self._inflate.decompress(data, size - len(self._data))
+        if len(self._data) < size:
+            raise ValueError("Truncated PNG image data")
+        rows = bytes(self._data[:size])
+        del self._data[:size]
+        return rows
+
+    def finish(self) -> None:
+        """Skip any image data left and collect the chunks after it."""
+        while self._compressed():
+            pass
+
+
+def _unfilter(header: PNGHeader, filtered: bytes, prior: bytes) -> np.ndarray:
+    """Raw rows, (rows, stride) uint8, of filtered rows whose preceding raw row is `prior`.
+
+    Pillow's PNG decoder undoes the filters; `prior` is fed to it as an
+    unfiltered first row so the first real row can refer to it.
+    """
+    rows = len(filtered) // (header.stride + 1)
+    mode, rawmode, _ = _FORMATS[header.color_type, header.bit_depth]
+    data = zlib.compress(b"\0" + prior + filtered, 0)
+    pixels = np.asarray(Image.frombytes(mode, (header.width, rows + 1), data, "zip", rawmode))[1:]
+    if header.bit_depth == 16:
+        pixels = pixels.astype(">u2")
+    else:
+        pixels = pixels.copy()
+    return pixels.reshape(rows, -1).view(np.uint8)
+
+
+def _refilter(raw: np.ndarray, prior: bytes, pixel_bytes: int) -> bytes:
+    """Filter rows with None, Sub or Up, whichever has the smallest sum of absolute values."""
+    above = np.vstack([np.frombuffer(prior, dtype=np.uint8), raw[:-1]])
+    sub = raw.copy()
+    sub[:, pixel_bytes:] -= raw[:, :-pixel_bytes]
+    candidates = np.stack([raw, sub, raw - above])
+    cost = np.abs(candidates.view(np.int8).astype(np.int16)).sum(axis=2, dtype=np.int64)
+    choice = cost.argmin(axis=0)
+    out = np.empty((raw.shape[0], raw.shape[1] + 1), dtype=np.uint8)
+    out[:, 0] = choice
+    out[:, 1:] = candidates[choice, np.arange(raw.shape[0])]
+    return out.tobytes()
+
+
+def _carrier(header: PNGHeader, raw: np.ndarray, channels: Sequence[int]) -> np.ndarray:
+    samples = raw.view(header.dtype).reshape(-1, len(header.bands))
+    if list(channels) == list(range(samples.shape[1])):
+        return samples.reshape(-1)
+    return samples[:, channels].reshape(-1)
+
+
+def _strip_rows(header: PNGHeader) -> int:
+    return max(1, STRIP_BYTES // max(1, header.stride))
+
+
+class _Writer:
+    def __init__(self, out: BinaryIO, compress_level: int) -> None:
+        self._out = out
+        self._deflate = zlib.compressobj(compress_level)
+        self._pending = bytearray()
+        out.write(PNG_SIGNATURE)
+
+    def chunk(self, ctype: bytes, data: bytes) -> None:
+        self._out.write(struct.pack(">I4s", len(data), ctype))
+        self._out.write(data)
+        self._out.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(ctype))))
+
+    def rows(self, filtered: bytes) -> None:
+        self._pending += self._deflate.compress(filtered)
+        while len(self._pending) >= IDAT_SIZE:
+            self.chunk(b"IDAT", bytes(self._pending[:IDAT_SIZE]))
+            del self._pending[:IDAT_SIZE]
+
+    def finish_rows(self) -> None:
+        self._pending += self._deflate.flush()
+        self.chunk(b"IDAT", bytes(self._pending))
+        self._pending.clear()
+
+
+def _ihdr(header: PNGHeader) -> bytes:
+    return struct.pack(
+        ">IIBBBBB", header.width, header.height, header.bit_depth, header.color_type, 0, 0, header.interlace
+    )
+
+
+def embed(
+    src: BinaryIO,
+    out: BinaryIO,
+    symbols: np.ndarray,
+    nbits: int,
+    channels: Sequence[int],
+    positions: Optional[np.ndarray] = None,
+    compress_level: int = zlib.Z_DEFAULT_COMPRESSION,
+) -> None:
+    """Copy the PNG in `src` to `out` with `symbols` in the low bits of the carrier.
+
+    Symbols go to the leading carrier values, or to `positions` (sorted ascending)
+    if given.
+    """
+    reader = _Reader(src)
+    header = reader.header
+    if symbols.size > header.capacity(channels):
+        raise ValueError("Payload too large for this cover image")
+    writer = _Writer(out, compress_level)
+    writer.chunk(b"IHDR", _ihdr(header))
+    for ctype, data in reader.leading:
+        writer.chunk(ctype, data)
+
+    row_values = header.width * len(channels)
+    step = _strip_rows(header)
+    # last raw row of the cover (to unfilter the next) and of the output (to re-filter it)
+    prior = bytes(header.stride)
+    written: Optional[bytes] = prior
+    done = row = 0
+    while row < header.height:
+        count = min(step, header.height - row)
+        filtered = reader.rows(count)
+        if done < symbols.size:
+            raw = _unfilter(header, filtered, prior)
+            prior = raw[-1].tobytes()
+            carrier = _carrier(header, raw, channels)
+            base = row * row_values
+            if positions is None:
+                end = done + carrier.size
+                embed_symbols(carrier, symbols[done:end], nbits)
+            else:
+                end = int(np.searchsorted(positions, base + carrier.size))
+                embed_symbols(carrier, symbols[done:end], nbits, positions[done:end] - base)
+            if not np.shares_memory(carrier, raw):
+                samples = raw.view(header.dtype).reshape(-1, len(header.bands))
+                samples[:, channels] = carrier.reshape(-1, len(channels))
+            writer.rows(_refilter(raw, written, header.pixel_bytes))
+            written = raw[-1].tobytes()
+            done = min(end, symbols.size)
+        elif written is not None:
+            # the first untouched row is filtered against the changed row above it
+            first = filtered[: header.stride + 1]
+            writer.rows(_refilter(_unfilter(header, first, prior), written, header.pixel_bytes))
+            writer.rows(filtered[header.stride + 1 :])
+            written = None
+        else:
+            writer.rows(filtered)
+        row += count
+    writer.finish_rows()
+
+    reader.finish()
+    for ctype, data in reader.trailing:
+        writer.chunk(ctype, data)
+
+
+class SymbolReader:
+    """Sequentially decode carrier symbols from a PNG, one strip at a time."""
+
+    def __init__(self, src: BinaryIO, channels: Sequence[int], nbits: int) -> None:
+        self._reader = _Reader(src)
+        self.header = self._reader.header
+        self._channels = channels
+        self._nbits = nbits
+        self._prior = bytes(self.header.stride)
+        self._row = 0
+        self._pending = np.empty(0, dtype=np.uint8)
+
+    def _strip(self) -> np.ndarray:
+        """Symbols of the next strip."""
+        if self._row >= self.header.height:
+            raise ValueError("Requested length exceeds carrier capacity")
+        count = min(_strip_rows(self.header), self.header.height - self._row)
+        raw = _unfilter(self.header, self._reader.rows(count), self._prior)
+        self._prior = raw[-1].tobytes()
+        self._row += count
+        carrier = _carrier(self.header, raw, self._channels)
+        return extract_symbols(carrier, carrier.size, self._nbits)
+
+    def read(self, count: int) -> np.ndarray:
+        parts = [self._pending[:count]]
+        self._pending = self._pending[count:]
+        got = parts[0].size
+        while got < count:
+            symbols = self._strip()
+            parts.append(symbols[: count - got])
+            self._pending = symbols[count - got :]
+            got += parts[-1].size
+        return np.concatenate(parts)
+
+
+def symbols_at(src: BinaryIO, channels: Sequence[int], nbits: int, positions: np.ndarray) -> np.ndarray:
+    """Symbols at carrier `positions` (any order), reading up to the strip of the largest one."""
+    reader = SymbolReader(src, channels, nbits)
+    order = np.argsort(positions)
+    wanted = positions[order]
+    found = np.empty(positions.size, dtype=np.uint8)
+    base = done = 0
+    while done < wanted.size:
+        symbols = reader._strip()
+        end = int(np.searchsorted(wanted, base + symbols.size))
+        found[done:end] = symbols[wanted[done:end] - base]
+        done = end
+        base += symbols.size
+    out = np.empty_like(found)
+    out[order] = found
+    return out
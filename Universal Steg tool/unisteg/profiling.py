@@ -0,0 +1,203 @@
+# unisteg/profiling.py
+
+from __future__ import annotations
+import os
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+@dataclass
+class PhaseMetrics:
+    """Resources used by one phase (e.g. "detect", "decode", "scan") of a command.
+
+    `bytes_read` counts read() system calls; data reached through memory maps
+    only shows up in `disk_read`, and only when it was not already cached.
+    Both are None where /proc/self/io is unavailable. `peak_memory` is the peak
+    above the phase's starting point: traced Python allocations if tracemalloc
+    is running, otherwise resident set size (Linux only, else None). The RSS
+    high-water mark belongs to the whole process and is never reset, so a phase
+    that stays below an earlier peak only reports how far its RSS grew.
+    """
+
+    phase: str
+    plugin: Optional[str] = None
+    path: Optional[str] = None
+    wall: float = 0.0
+    cpu: float = 0.0
+    bytes_read: Optional[int] = None
+    disk_read: Optional[int] = None
+    peak_memory: Optional[int] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+Hook = Callable[[PhaseMetrics], None]
+
+_HOOKS: List[Hook] = []
+
+
+def add_hook(hook: Hook) -> None:
+    """Call `hook` with the metrics of every finished phase."""
+    _HOOKS.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:
+    _HOOKS.remove(hook)
+
+
+def enabled() -> bool:
+    return bool(_HOOKS)
+
+
+def emit(metrics: PhaseMetrics) -> None:
+    """Pass metrics measured elsewhere (e.g. in a worker process) to the hooks."""
+    for hook in list(_HOOKS):
+        hook(metrics)
+
+
+def _io_counters() -> Tuple[Optional[int], Optional[int]]:
+    try:
+        with open("/proc/self/io", "rb") as f:
+            fields = dict(line.split(b":", 1) for line in f.read().splitlines())
+        return int(fields[b"rchar"]), int(fields[b"read_bytes"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _delta(end: Optional[int], start: Optional[int]) -> Optional[int]:
+    return end - start if end is not None and start is not None else None
+
+
+def _rss() -> Optional[Tuple[int, int]]:
+    """(current, peak) resident set size in bytes, from /proc/self/status."""
+    try:
+        with open("/proc/self/status", "rb") as f:
+            fields = dict(line.split(b":", 1) for line in f.read().splitlines() if b":" in line)
+        return int(fields[b"VmRSS"].split()[0]) * 1024, int(fields[b"VmHWM"].split()[0]) * 1024
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _memory() -> Optional[Tuple[int, int]]:
+    """(current, peak) memory use, if measurable; see PhaseMetrics."""
+    if tracemalloc.is_tracing():
+        return tracemalloc.get_traced_memory()
+    return _rss()
+
+
+# peaks of the phases currently open, innermost last; see phase.__exit__
+_open_peaks: List[Optional[int]] = []
+
+
+class phase:
+    """Context manager measuring one phase; free when no hook is installed.
+
+    Phases nest: an outer phase's figures include its inner phases.
+    """
+
+    __slots__ = ("metrics", "_start")
+
+    def __init__(self, name: str, plugin: Optional[str] = None, path: Optional[str] = None) -> None:
+        self.metrics = PhaseMetrics(phase=name, plugin=plugin, path=os.fspath(path) if path else None)
+        self._start: Optional[Tuple[Any, ...]] = None
+
+    def __enter__(self) -> PhaseMetrics:
+        if not _HOOKS:
+            return self.metrics
+        memory = _memory()
+        base = peak = None
+        if memory is not None:
+            base, peak = memory
+            if tracemalloc.is_tracing():
+                # the traced peak is shared, so hand what it saw so far to the outer phase
+                # before resetting it; __exit__ hands this phase's peak back the same way
+                if _open_peaks and _open_peaks[-1] is not None:
+                    _open_peaks[-1] = max(_open_peaks[-1], peak)
+                tracemalloc.reset_peak()
+                peak = base
+        _open_peaks.append(peak)
+        self._start = (time.perf_counter(), time.process_time(), *_io_counters(), base)
+        return self.metrics
+
+    def __exit__(self, *exc: Any) -> None:
+        if self._start is None:
+            return
+        wall, cpu, rchar, read_bytes, base = self._start
+        m = self.metrics
+        m.wall = time.perf_counter() - wall
+        m.cpu = time.process_time() - cpu
+        end_rchar, end_read = _io_counters()
+        m.bytes_read = _delta(end_rchar, rchar)
+        m.disk_read = _delta(end_read, read_bytes)
+        start_peak = _open_peaks.pop()
+        memory = _memory()
+        if start_peak is not None and memory is not None:
+            current, peak = memory
+            if tracemalloc.is_tracing():
+                peak = max(start_peak, peak)
+                if _open_peaks and _open_peaks[-1] is not None:
+                    _open_peaks[-1] = max(_open_peaks[-1], peak)
+            elif peak <= start_peak:
+                # the high-water mark was set before this phase; all that is known is its growth
+                peak = max(base, current)
+            m.peak_memory = max(0, peak - base)
+        emit(m)
+
+
+@dataclass
+class _Totals:
+    count: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+    bytes_read: Optional[int] = None
+    disk_read: Optional[int] = None
+    peak_memory: Optional[int] = None
+
+
+def _add(total: Optional[int], value: Optional[int]) -> Optional[int]:
+    return value if total is None else total + (value or 0)
+
+
+@dataclass
+class Recorder:
+    """Hook that keeps every PhaseMetrics and summarises them per (phase, plugin)."""
+
+    metrics: List[PhaseMetrics] = field(default_factory=list)
+
+    def __call__(self, metrics: PhaseMetrics) -> None:
+        self.metrics.append(metrics)
+
+    def drain(self) -> List[PhaseMetrics]:
+        taken, self.metrics = self.metrics, []
+        return taken
+
+    def totals(self) -> Dict[Tuple[str, Optional[str]], _Totals]:
+        totals: Dict[Tuple[str, Optional[str]], _Totals] = {}
+        for m in self.metrics:
+            t = totals.setdefault((m.phase, m.plugin), _Totals())
+            t.count += 1
+            t.wall += m.wall
+            t.cpu += m.cpu
+            t.bytes_read = _add(t.bytes_read, m.bytes_read)
+            t.disk_read = _add(t.disk_read, m.disk_read)
+            if m.peak_memory is not None:
+                t.peak_memory = max(t.peak_memory or 0, m.peak_memory)
+        return totals
+
+    def format_table(self) -> str:
+        def mb(value: Optional[int]) -> str:
+            return f"{value / 1e6:9.2f}" if value is not None else f"{'-':>9}"
+
+        lines = [
+            f"{'phase':10} {'plugin':16} {'calls':>6} {'wall s':>9} {'cpu s':>9} "
+            f"{'read MB':>9} {'disk MB':>9} {'peak MB':>9}"
+        ]
+        for (name, plugin), t in sorted(self.totals().items(), key=lambda kv: -kv[1].wall):
+            lines.append(
+                f"{name:10} {plugin or '-':16} {t.count:6d} {t.wall:9.4f} {t.cpu:9.4f} "
+                f"{mb(t.bytes_read)} {mb(t.disk_read)} {mb(t.peak_memory)}"
+            )
+        return "\n".join(lines)
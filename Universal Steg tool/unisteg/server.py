@@ -0,0 +1,485 @@
+# unisteg/server.py
+"""`unisteg serve`: a long-running daemon answering scan/embed/extract jobs.
+
+Clients connect over a Unix socket or localhost TCP and either send one JSON
+job per line (responses come back as JSON lines, tagged with the job's "id"
+and possibly out of order) or POST a job as an HTTP request body. `GET /stats`,
+or a {"op": "stats"} job, reports queue depth and latencies.
+
+Jobs:
+    {"op": "scan", "path": "x.png"}
+    {"op": "embed", "plugin": "image_lsb", "path": "x.png", "payload": "<base64>",
+     "output": "y.png", "options": {"algo": "lsb2"}}
+    {"op": "extract", "plugin": "image_lsb", "path": "y.png"}
+
+Instead of "path", a job can carry the file itself as base64 "data" (with an
+optional "name" whose extension helps type detection), and embed accepts
+"payload_path" instead of "payload", and a "compress" option ("auto", "zlib",
+...) as for `unisteg embed --compress`. Without "output", embed and extract
+return the result as base64 "data".
+
+Plugin work runs in a process pool whose workers import every plugin once at
+start-up. Queued jobs are handed to idle workers in small batches; when the
+queue is full, connections are not read until it drains. A job that exceeds
+its timeout is answered with an error, but a worker already running it
+finishes it.
+
+Jobs name files the server reads and writes, so TCP is only served on a
+loopback address and every "path", "output" and "payload_path" must resolve
+inside `root` (the working directory unless given; relative paths are taken
+from it). Browsers can reach loopback too, so HTTP requests carrying an Origin
+header or a non-loopback Host (DNS rebinding) are refused, and jobs must be
+posted as application/json, which a page cannot send cross-origin without a
+preflight.
+"""
+
+from __future__ import annotations
+import asyncio
+import base64
+import ipaddress
+import json
+import os
+import signal
+import tempfile
+import time
+from asyncio import StreamReader, StreamWriter
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from . import cli
+from .plugin_base import FileInfo, all_plugins, get_plugin
+
+DEFAULT_QUEUE_SIZE = 256
+DEFAULT_BATCH_SIZE = 8
+DEFAULT_TIMEOUT = 60.0
+
+# longest request line or HTTP body accepted; inline files are base64 encoded
+MAX_REQUEST = 256 * 1024 * 1024
+
+# latencies kept per operation for the percentiles in the stats
+LATENCY_WINDOW = 1000
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _host_name(host: str) -> str:
+    """The name in a Host header, without its port or IPv6 brackets."""
+    if host.startswith("["):
+        return host[1:].partition("]")[0]
+    return host.partition(":")[0] if host.count(":") == 1 else host
+
+
+def _http_rejection(method: str, headers: Dict[str, str]) -> Optional[Tuple[str, str]]:
+    """Status and reason for an HTTP request that must not reach the job queue, or None."""
+    if "origin" in headers:
+        return "403 Forbidden", f"Cross-origin requests are refused: {headers['origin']}"
+    host = headers.get("host")
+    if host is not None and not _is_loopback(_host_name(host)):
+        return "403 Forbidden", f"Host is not a loopback name: {host}"
+    if method == "POST":
+        ctype = headers.get("content-type", "").partition(";")[0].strip().lower()
+        if ctype != "application/json":
+            return "415 Unsupported Media Type", "Jobs must be posted as application/json"
+    return None
+
+
+def _confine(job: Dict[str, Any], root: str) -> Dict[str, Any]:
+    """`job` with its file paths resolved under `root`; ValueError for paths outside it."""
+    job = dict(job)
+    for key in ("path", "output", "payload_path"):
+        if job.get(key) is None:
+            continue
+        if not isinstance(job[key], str):
+            raise ValueError(f"'{key}' must be a string")
+        path = os.path.realpath(os.path.join(root, job[key]))
+        if os.path.commonpath([root, path]) != root:
+            raise ValueError(f"'{key}' is outside the server root: {job[key]}")
+        job[key] = path
+    return job
+
+
+def _init_worker(cache_options: Optional[Dict[str, Any]]) -> None:
+    cli._init_worker(cache_options)
+    all_plugins()  # import plugins (and numpy, Pillow) before the first job
+
+
+def _input_file(job: Dict[str, Any], tmpdir: str) -> str:
+    if "path" in job:
+        return job["path"]
+    if "data" not in job:
+        raise ValueError("Job needs a 'path' or inline 'data'")
+    path = os.path.join(tmpdir, os.path.basename(job.get("name") or "input"))
+    with open(path, "wb") as f:
+        f.write(base64.b64decode(job["data"]))
+    return path
+
+
+def _plugin(job: Dict[str, Any]) -> Any:
+    plugin = get_plugin(job.get("plugin", "image_lsb"))
+    if plugin is None:
+        raise ValueError(f"Unknown plugin: {job.get('plugin')}")
+    return plugin
+
+
+def _run_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one job inside a worker; the result is the response without id and timing."""
+    op = job.get("op")
+    with tempfile.TemporaryDirectory(prefix="unisteg-") as tmpdir:
+        path = _input_file(job, tmpdir)
+        if op == "scan":
+            if "path" in job:
+                record, update, _ = cli._scan_file(path)
+                return {"ok": "error" not in record, **record, "update": update}
+            # inline files are not worth caching
+            mtype, results, _ = cli._scan_plugins(path, None, None)
+            return {
+                "ok": True,
+                "file": job.get("name"),
+                "size": os.path.getsize(path),
+                "mimetype": mtype,
+                "results": {plugin.name: findings for plugin, findings in results},
+            }
+
+        if op not in ("embed", "extract"):
+            raise ValueError(f"Unknown op: {op!r}")
+        plugin = _plugin(job)
+        options = dict(job.get("options") or {})
+        with FileInfo.detect(path) as info:
+            if op == "embed":
+                codec = options.pop("compress", None)
+                if "payload" in job:
+                    payload = base64.b64decode(job["payload"])
+                elif codec is not None:
+                    payload = job["payload_path"]  # compressed as it is read
+                else:
+                    with open(job["payload_path"], "rb") as f:
+                        payload = f.read()
+                if codec is not None:
+                    from .compression import compress
+
+                    if not plugin.records_flags:
+                        raise ValueError(f"Plugin {plugin.name} cannot record the codec of a compressed payload")
+                    payload, flags, _ = compress(payload, codec)
+                    options["flags"] = flags
+                if job.get("output"):
+                    plugin.embed_to(info, payload, job["output"], **options)
+                    return {"ok": True, "output": job["output"]}
+                return {"ok": True, "data": base64.b64encode(plugin.embed(info, payload, **options)).decode()}
+
+            data = plugin.extract(info, **options)
+        if job.get("output"):
+            with open(job["output"], "wb") as f:
+                f.write(data)
+            return {"ok": True, "output": job["output"], "size": len(data)}
+        return {"ok": True, "data": base64.b64encode(data).decode()}
+
+
+def _run_batch(jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    results = []
+    for job in jobs:
+        try:
+            results.append(_run_job(job))
+        except Exception as exc:  # one bad job must not fail the batch
+            results.append({"ok": False, "error": f"{type(exc).__name__}: {exc}"})
+    return results
+
+
+def _percentiles(values: Deque[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {"count": len(ordered), "p50": pick(0.5), "p90": pick(0.9), "p99": pick(0.99), "max": pick(1.0)}
+
+
+@dataclass
+class Stats:
+    started: float = field(default_factory=time.monotonic)
+    requests: int = 0
+    completed: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    running: int = 0
+    batches: int = 0
+    latencies: Dict[str, Deque[float]] = field(default_factory=dict)
+
+    def record(self, op: str, seconds: float) -> None:
+        self.latencies.setdefault(op, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+class Server:
+    def __init__(
+        self,
+        workers: int,
+        *,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        timeout: float = DEFAULT_TIMEOUT,
+        cache: Any = None,
+        root: Optional[str] = None,
+    ) -> None:
+        self.workers = workers
+        self.root = os.path.realpath(root if root is not None else os.getcwd())
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.cache = cache
+        self.stats = Stats()
+        cache_options = None
+        if cache is not None:
+            cache.db.commit()  # creates the database before read-only workers open it
+            cache_options = {"path": cache.path, "refresh": cache.refresh, "hash_content": cache.hash_content}
+        self.executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(cache_options,))
+        # start the workers now, before the event loop runs, rather than on the first job
+        for future in [self.executor.submit(_run_batch, []) for _ in range(workers)]:
+            future.result()
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def stats_dict(self) -> Dict[str, Any]:
+        s = self.stats
+        return {
+            "ok": True,
+            "uptime": round(time.monotonic() - s.started, 3),
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.queue_size,
+            "running": s.running,
+            "requests": s.requests,
+            "completed": s.completed,
+            "errors": s.errors,
+            "timeouts": s.timeouts,
+            "batches": s.batches,
+            "latency_ms": {op: _percentiles(values) for op, values in s.latencies.items()},
+        }
+
+    async def _dispatch(self) -> None:
+        """Feed one worker: take a batch of queued jobs, run it, resolve their futures."""
+        loop = asyncio.get_running_loop()
+        assert self._queue is not None
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            batch = [(job, future) for job, future in batch if not future.done()]  # skip timed out
+            if not batch:
+                continue
+            self.stats.running += len(batch)
+            self.stats.batches += 1
+            try:
+                results = await loop.run_in_executor(self.executor, _run_batch, [job for job, _ in batch])
+            except Exception as exc:  # e.g. a worker died
+                results = [{"ok": False, "error": f"{type(exc).__name__}: {exc}"}] * len(batch)
+            finally:
+                self.stats.running -= len(batch)
+            updated = False
+            for (_, future), result in zip(batch, results):
+                update = result.pop("update", None)
+                if update is not None and self.cache is not None:
+                    self.cache.put(*update)
+                    updated = True
+                if not future.done():
+                    future.set_result(result)
+            if updated:
+                self.cache.db.commit()  # make new entries visible to the workers
+
+    async def handle(self, job: Any) -> Dict[str, Any]:
+        """Answer one job; callers hold one of the queue's slots while it runs."""
+        start = time.monotonic()
+        self.stats.requests += 1
+        if not isinstance(job, dict):
+            self.stats.errors += 1
+            return {"ok": False, "error": "Job must be a JSON object"}
+        op = str(job.get("op"))
+        if op == "stats":
+            return {"id": job.get("id"), **self.stats_dict()}
+
+        try:
+            timeout = self.timeout if job.get("timeout") is None else float(job["timeout"])
+            job = _confine(job, self.root)
+        except (TypeError, ValueError) as exc:
+            self.stats.errors += 1
+            return {"id": job.get("id"), "ok": False, "error": f"{type(exc).__name__}: {exc}"}
+
+        assert self._queue is not None
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((job, future))
+        try:
+            result = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.stats.timeouts += 1
+            result = {"ok": False, "error": f"Timed out after {timeout:g}s"}
+        elapsed = time.monotonic() - start
+        self.stats.completed += 1
+        self.stats.errors += not result.get("ok")
+        self.stats.record(op, elapsed)
+        return {"id": job.get("id"), **result, "elapsed": round(elapsed, 6)}
+
+    async def _serve_lines(self, first: bytes, reader: StreamReader, writer: StreamWriter) -> None:
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(line: bytes) -> None:
+            try:
+                response = await self.handle(json.loads(line))
+            except json.JSONDecodeError as exc:
+                response = {"ok": False, "error": f"Invalid JSON: {exc}"}
+            except Exception as exc:  # one bad job must not end the connection
+                response = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+            finally:
+                self._slots.release()
+            async with lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+
+        assert self._slots is not None
+        line = first
+        while line:
+            if line.strip():
+                # with every slot taken this connection is not read further (backpressure)
+                await self._slots.acquire()
+                task = asyncio.create_task(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            line = await reader.readline()
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _serve_http(self, first: bytes, reader: StreamReader, writer: StreamWriter) -> None:
+        assert self._slots is not None
+        request = first
+        response: Dict[str, Any]
+        while request:
+            method, target, version = (request.decode("latin-1").split() + ["", "", ""])[:3]
+            headers: Dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+            try:
+                length = int(headers.get("content-length", 0))
+            except ValueError:
+                length = -1
+            if not 0 <= length <= MAX_REQUEST:
+                # the body cannot be skipped, so the connection ends here
+                status = "400 Bad Request" if length < 0 else "413 Payload Too Large"
+                error = f"Invalid Content-Length: {headers['content-length']}"
+                await self._http_reply(writer, version, status, {"ok": False, "error": error}, False)
+                return
+            body = await reader.readexactly(length)
+
+            status = "200 OK"
+            rejection = _http_rejection(method, headers)
+            if rejection is not None:
+                status, response = rejection[0], {"ok": False, "error": rejection[1]}
+            elif method == "GET" and target.rstrip("/") == "/stats":
+                response = self.stats_dict()
+            elif method == "POST":
+                try:
+                    async with self._slots:
+                        response = await self.handle(json.loads(body))
+                except json.JSONDecodeError as exc:
+                    status, response = "400 Bad Request", {"ok": False, "error": f"Invalid JSON: {exc}"}
+                except Exception as exc:
+                    error = f"{type(exc).__name__}: {exc}"
+                    status, response = "500 Internal Server Error", {"ok": False, "error": error}
+            else:
+                status, response = "404 Not Found", {"ok": False, "error": f"No route for {method} {target}"}
+
+            await self._http_reply(writer, version, status, response, keep_alive)
+            if not keep_alive:
+                return
+            request = await reader.readline()
+
+    @staticmethod
+    async def _http_reply(
+        writer: StreamWriter, version: str, status: str, response: Dict[str, Any], keep_alive: bool
+    ) -> None:
+        data = json.dumps(response).encode()
+        head = (
+            f"{version or 'HTTP/1.0'} {status}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + data)
+        await writer.drain()
+
+    async def _client(self, reader: StreamReader, writer: StreamWriter) -> None:
+        try:
+            first = await reader.readline()
+            if first.split(b" ", 1)[0] in (b"GET", b"POST"):
+                await self._serve_http(first, reader, writer)
+            else:
+                await self._serve_lines(first, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError) as exc:
+            try:
+                error = {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+                writer.write(json.dumps(error).encode() + b"\n")
+                await writer.drain()
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def run(self, socket_path: Optional[str] = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        # the slots bound queued plus running jobs; the queue itself never fills
+        self._slots = asyncio.Semaphore(self.queue_size)
+        self._queue = asyncio.Queue()
+        dispatchers = [asyncio.create_task(self._dispatch()) for _ in range(self.workers)]
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)  # left over from a previous run
+            server = await asyncio.start_unix_server(self._client, socket_path, limit=MAX_REQUEST)
+            where = socket_path
+        else:
+            server = await asyncio.start_server(self._client, host, port, limit=MAX_REQUEST)
+            where = "%s:%d" % server.sockets[0].getsockname()[:2]
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        print(f"unisteg serving on {where} with {self.workers} workers", flush=True)
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            for task in dispatchers:
+                task.cancel()
+            if socket_path is not None and os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.cache is not None:
+            self.cache.close()
+
+
+def serve(
+    workers: int,
+    socket_path: Optional[str] = None,
+    host: str = "127.0.0.1",
+    port: int = 0,
+    **options: Any,
+) -> None:
+    if socket_path is None and not _is_loopback(host):
+        raise ValueError(f"Refusing to serve on non-loopback address {host}: jobs can read and write files")
+    server = Server(workers, **options)
+    try:
+        asyncio.run(server.run(socket_path, host, port))
+    finally:
+        server.close()
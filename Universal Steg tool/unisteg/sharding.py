@@ -0,0 +1,310 @@
+# unisteg/sharding.py
+"""Spread one payload over several covers and put it back together.
+
+The payload is cut into equal blocks, and each block is embedded as a shard
+with its own small header (payload id, index, geometry, and the flags, length
+and checksum of the whole payload), so the shards can be gathered in any order.
+A payload compressed before splitting has its codec in the flags, as in a
+framing header, and join() decompresses it. Covers get
+blocks in proportion to their capacity. With parity, every stripe of up to
+STRIPE_WIDTH data blocks also gets an XOR parity block, and the blocks of a
+stripe go to distinct covers, so the payload survives losing any one cover.
+"""
+
+from __future__ import annotations
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .framing import FLAG_CODEC_MASK
+from .plugin_base import BasePlugin, FileInfo, get_plugin, plugins_for_mimetype
+
+SHARD_MAGIC = b"USHD"
+SHARD_VERSION = 2
+
+# magic, version, payload flags, payload id, shard index, data blocks, stripe width
+# (0: no parity), block size, shard data size, payload length, crc32 of payload
+_SHARD = struct.Struct(">4sBB8sIIHIIQI")
+SHARD_HEADER_SIZE = _SHARD.size
+
+# data blocks per parity block; fewer when there are fewer covers
+STRIPE_WIDTH = 8
+
+# blocks aimed for per cover, so the split can follow capacities closely,
+# unless that makes blocks smaller than MIN_BLOCK
+BLOCKS_PER_COVER = 16
+MIN_BLOCK = 4096
+
+
+@dataclass
+class Shard:
+    payload_id: bytes
+    index: int
+    data_blocks: int
+    stripe: int
+    block_size: int
+    length: int
+    crc: int
+    data: bytes
+    flags: int = 0
+
+    def pack(self) -> bytes:
+        header = _SHARD.pack(
+            SHARD_MAGIC,
+            SHARD_VERSION,
+            self.flags,
+            self.payload_id,
+            self.index,
+            self.data_blocks,
+            self.stripe,
+            self.block_size,
+            len(self.data),
+            self.length,
+            self.crc,
+        )
+        return header + self.data
+
+
+def parse_shards(data: bytes) -> List[Shard]:
+    """The shards packed one after another in a cover's payload."""
+    shards: List[Shard] = []
+    pos = 0
+    while pos < len(data):
+        if len(data) - pos < SHARD_HEADER_SIZE:
+            raise ValueError("Truncated shard header")
+        magic, version, flags, payload_id, index, blocks, stripe, block_size, size, length, crc = (
+            _SHARD.unpack_from(data, pos)
+        )
+        if magic != SHARD_MAGIC or version != SHARD_VERSION:
+            raise ValueError("Not a unisteg shard")
+        pos += SHARD_HEADER_SIZE
+        if pos + size > len(data):
+            raise ValueError("Truncated shard data")
+        shards.append(Shard(payload_id, index, blocks, stripe, block_size, length, crc, data[pos : pos + size], flags))
+        pos += size
+    return shards
+
+
+def _xor(blocks: Iterable[bytes], size: int) -> bytes:
+    acc = 0
+    for block in blocks:
+        acc ^= int.from_bytes(block.ljust(size, b"\0"), "big")
+    return acc.to_bytes(size, "big")
+
+
+def _block_size(length: int, covers: int) -> int:
+    target = -(-length // (BLOCKS_PER_COVER * covers))
+    return max(1, min(length, max(MIN_BLOCK, target)))
+
+
+def split(payload: bytes, capacities: Sequence[int], parity: bool = False, flags: int = 0) -> List[bytes]:
+    """Per-cover payloads holding the shards of `payload`, filled in proportion to `capacities`.
+
+    `flags` are the payload's header flags (see framing.py), e.g. its compression codec.
+    """
+    covers = len(capacities)
+    if covers == 0:
+        raise ValueError("No covers given")
+    if parity and covers < 2:
+        raise ValueError("Parity needs at least two covers")
+    stripe = min(STRIPE_WIDTH, covers - 1) if parity else 0
+    block_size = _block_size(len(payload), covers)
+    data_blocks = max(1, -(-len(payload) // block_size))
+
+    # blocks each cover can take, shard header included
+    room = [max(0, cap) // (SHARD_HEADER_SIZE + block_size) for cap in capacities]
+    used = [0] * covers
+    placed: List[List[int]] = [[] for _ in range(covers)]
+    width = stripe or 1
+    groups = [list(range(s, min(s + width, data_blocks))) for s in range(0, data_blocks, width)]
+    for number, group in enumerate(groups):
+        if stripe:
+            group.append(data_blocks + number)
+        # the least full covers, by share of their own capacity, each take one block
+        free = sorted((i for i in range(covers) if used[i] < room[i]), key=lambda i: (used[i] + 1) / room[i])
+        if len(free) < len(group):
+            needed = data_blocks + (len(groups) if stripe else 0)
+            raise ValueError(
+                f"Payload too large for these covers: needs {needed} shards of {block_size} bytes, "
+                f"room for {sum(room)}" + (" (a stripe's shards must go to distinct covers)" if stripe else "")
+            )
+        for index, cover in zip(group, free):
+            placed[cover].append(index)
+            used[cover] += 1
+
+    payload_id = os.urandom(8)
+    crc = zlib.crc32(payload)
+
+    def block(index: int) -> bytes:
+        if index < data_blocks:
+            return payload[index * block_size : (index + 1) * block_size]
+        first = (index - data_blocks) * stripe
+        return _xor((block(i) for i in range(first, min(first + stripe, data_blocks))), block_size)
+
+    def shard(index: int) -> bytes:
+        return Shard(payload_id, index, data_blocks, stripe, block_size, len(payload), crc, block(index), flags).pack()
+
+    return [b"".join(shard(index) for index in sorted(indices)) for indices in placed]
+
+
+def join(shards: Iterable[Shard]) -> bytes:
+    """Reassemble a payload from its shards in any order, rebuilding missing blocks from parity.
+
+    A compressed payload is returned decompressed.
+    """
+    by_id: Dict[bytes, Dict[int, Shard]] = {}
+    for shard in shards:
+        by_id.setdefault(shard.payload_id, {})[shard.index] = shard
+    if not by_id:
+        raise ValueError("No shards found")
+    if len(by_id) > 1:
+        raise ValueError(f"Shards of {len(by_id)} different payloads found; extract each set separately")
+    found = next(iter(by_id.values()))
+    first = next(iter(found.values()))
+    blocks, stripe, block_size = first.data_blocks, first.stripe, first.block_size
+
+    def expected(index: int) -> int:
+        return max(0, min(block_size, first.length - index * block_size))
+
+    data = {i: s.data for i, s in found.items() if i < blocks}
+    missing = [i for i in range(blocks) if i not in data]
+    for i in list(missing):
+        if not stripe:
+            break
+        number = i // stripe
+        members = range(number * stripe, min((number + 1) * stripe, blocks))
+        parity = found.get(blocks + number)
+        if parity is None or any(j != i and j not in data for j in members):
+            continue
+        rebuilt = _xor([parity.data, *(data[j] for j in members if j != i)], block_size)
+        data[i] = rebuilt[: expected(i)]
+        missing.remove(i)
+    if missing:
+        raise ValueError(f"Cannot rebuild the payload: data shards {missing} of {blocks} are missing")
+
+    payload = b"".join(data[i] for i in range(blocks))[: first.length]
+    if len(payload) != first.length or zlib.crc32(payload) != first.crc:
+        raise ValueError("Reassembled payload checksum mismatch; shards are corrupted")
+    if first.flags & FLAG_CODEC_MASK:
+        from .compression import decompress
+
+        return decompress(first.flags, payload)
+    return payload
+
+
+def _cover_plugin(info: FileInfo, name: Optional[str], options: Dict[str, Any]) -> Tuple[BasePlugin, int]:
+    """The plugin for a cover (named, or the first that knows its capacity) and that capacity."""
+    if name is not None:
+        plugin = get_plugin(name)
+        if plugin is None:
+            raise ValueError(f"Unknown plugin: {name}")
+        candidates = [plugin]
+    else:
+        candidates = plugins_for_mimetype(info.mimetype)
+    for plugin in candidates:
+        capacity = plugin.capacity(info, **options)
+        if capacity is not None:
+            return plugin, capacity
+    if name is not None:
+        raise ValueError(f"Plugin {name} cannot tell the capacity of {info.path}")
+    raise ValueError(f"No plugin can tell the capacity of {info.path} ({info.mimetype})")
+
+
+def _embed_cover(task: Tuple[str, str, str, str, bytes, Dict[str, Any]]) -> Tuple[str, str, int]:
+    cover, mimetype, plugin_name, output, data, options = task
+    plugin = get_plugin(plugin_name)
+    with FileInfo(path=cover, mimetype=mimetype) as info:
+        plugin.embed_to(info, data, output, **options)
+    return cover, output, len(data)
+
+
+def _extract_cover(task: Tuple[str, Optional[str], Dict[str, Any]]) -> Tuple[str, List[Shard], Optional[str]]:
+    """Shards found in one stego file, or the error that stopped it; runs inside pool workers."""
+    path, name, options = task
+    errors = []
+    try:
+        info = FileInfo.detect(path)
+        candidates = [get_plugin(name)] if name is not None else plugins_for_mimetype(info.mimetype)
+        with info:
+            for plugin in candidates:
+                if plugin is None:
+                    return path, [], f"Unknown plugin: {name}"
+                try:
+                    return path, parse_shards(plugin.extract(info, **options)), None
+                except (ValueError, NotImplementedError) as exc:
+                    errors.append(f"{plugin.name}: {exc}")
+    except Exception as exc:  # one unreadable cover must not stop the others
+        errors.append(f"{type(exc).__name__}: {exc}")
+    return path, [], "; ".join(errors) or "no plugin for this file type"
+
+
+def _pool_map(func: Any, tasks: List[Any], workers: int) -> Iterator[Any]:
+    """func over tasks, in a process pool when there is more than one of each; unordered."""
+    if workers <= 1 or len(tasks) <= 1:
+        yield from map(func, tasks)
+        return
+    import multiprocessing
+
+    pool = multiprocessing.Pool(min(workers, len(tasks)))
+    try:
+        yield from pool.imap_unordered(func, tasks)
+    finally:
+        pool.terminate()
+
+
+def embed_multi(
+    payload: bytes,
+    covers: Sequence[str],
+    out_dir: str,
+    *,
+    plugin: Optional[str] = None,
+    parity: bool = False,
+    workers: int = 1,
+    flags: int = 0,
+    **options: Any,
+) -> List[Tuple[str, str, int]]:
+    """Embed the shards of `payload` into `covers`, writing stego files to `out_dir` in parallel.
+
+    Outputs are named like their covers, with the extension of the format the
+    plugin writes (e.g. .png for image_lsb). `flags` go into every shard (e.g.
+    the codec of a payload compressed with compression.compress()), so any
+    plugin can carry a compressed payload. Returns (cover, output, bytes
+    embedded) for each cover used, in completion order.
+    """
+    plans = []
+    for cover in covers:
+        with FileInfo.detect(cover) as info:
+            chosen, capacity = _cover_plugin(info, plugin, options)
+            name = os.path.splitext(os.path.basename(cover))[0] + chosen.output_suffix(info)
+            plans.append((info.mimetype, chosen.name, capacity, name))
+    names = [name for *_, name in plans]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Output file names must be distinct; outputs share one directory: {', '.join(names)}")
+
+    parts = split(payload, [capacity for _, _, capacity, _ in plans], parity, flags)
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [
+        (cover, mimetype, plugin_name, os.path.join(out_dir, name), data, options)
+        for cover, (mimetype, plugin_name, _, name), data in zip(covers, plans, parts)
+        if data
+    ]
+    return list(_pool_map(_embed_cover, tasks, workers))
+
+
+def extract_multi(
+    files: Sequence[str], *, plugin: Optional[str] = None, workers: int = 1, **options: Any
+) -> Tuple[bytes, Dict[str, str]]:
+    """Gather shards from `files` in parallel and reassemble the payload.
+
+    Returns the payload and {path: error} for files that gave no shards, which
+    only matters if parity could make up for them.
+    """
+    shards: List[Shard] = []
+    errors: Dict[str, str] = {}
+    for path, found, error in _pool_map(_extract_cover, [(f, plugin, options) for f in files], workers):
+        shards.extend(found)
+        if error is not None:
+            errors[path] = error
+    return join(shards), errors